@@ -0,0 +1,57 @@
+"""Serial vs. parallel PDF extraction on a generated course book.
+
+Usage (from backend/):
+    python benchmarks/bench_extraction.py --pages 400 --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf import PdfReader  # noqa: E402
+
+from benchmate_common import extraction  # noqa: E402
+from benchmarks.pdfgen import write_pdf  # noqa: E402
+
+
+def serial_baseline(path):
+    """The loop the upload endpoints used before the extraction engine."""
+    text = ""
+    for page in PdfReader(path).pages:
+        text += page.extract_text() + "\n"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    extraction.MAX_WORKERS = args.workers
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_pdf(os.path.join(tmp, "book.pdf"), pages=args.pages)
+        print(f"{args.pages} pages, {os.path.getsize(path) / 1024 / 1024:.1f} MB, {args.workers} workers")
+
+        started = time.perf_counter()
+        baseline = serial_baseline(path)
+        serial = time.perf_counter() - started
+        print(f"serial loop:      {serial:6.2f}s")
+
+        # Warm the pool so process start-up is not billed to the first upload.
+        extraction.extract_pdf(path)
+        result = extraction.extract_pdf(path)
+        print(f"parallel engine:  {result.elapsed:6.2f}s  ({serial / result.elapsed:.1f}x)")
+        slowest = max(range(result.page_count), key=result.page_times.__getitem__)
+        print(f"slowest page:     #{slowest + 1} {result.page_times[slowest] * 1000:.1f}ms, "
+              f"mean {sum(result.page_times) / result.page_count * 1000:.1f}ms")
+
+        assert result.text == baseline, "parallel output differs from the serial loop"
+        extraction.shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Concurrency of the LLM client against the offline stub backend.
+
+Compares the old pattern (a blocking model call inside ``async def``) with
+``LLMClient.agenerate`` at several concurrency caps.
+
+Usage (from backend/):
+    python benchmarks/bench_llm_client.py --requests 64 --latency 0.2 --failure-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmate_common.llm_client import LLMClient, StubBackend  # noqa: E402
+
+
+async def blocking_in_async(backend, requests):
+    async def endpoint():
+        return backend.generate("prompt", timeout=60)  # stalls the event loop
+
+    return await asyncio.gather(*(endpoint() for _ in range(requests)), return_exceptions=True)
+
+
+async def with_client(client, requests):
+    return await asyncio.gather(*(client.agenerate("prompt") for _ in range(requests)), return_exceptions=True)
+
+
+def report(label, started, results, stats=None):
+    elapsed = time.perf_counter() - started
+    ok = sum(isinstance(result, str) for result in results)
+    line = f"{label:<28} {elapsed:6.2f}s  {ok / elapsed:7.1f} req/s  ok={ok}/{len(results)}"
+    if stats:
+        line += f"  peak_in_flight={stats['peak_in_flight']} retries={stats['retries']} timeouts={stats['timeouts']}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--caps", default="1,8,32")
+    args = parser.parse_args()
+
+    def backend():
+        return StubBackend(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=0)
+
+    started = time.perf_counter()
+    results = asyncio.run(blocking_in_async(backend(), args.requests))
+    report("blocking call in async def", started, results)
+
+    for cap in (int(value) for value in args.caps.split(",")):
+        client = LLMClient(backend(), max_concurrency=cap, timeout=30, backoff_base=0.05)
+        started = time.perf_counter()
+        results = asyncio.run(with_client(client, args.requests))
+        report(f"LLMClient cap={cap}", started, results, client.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Peak memory of receiving an upload: streamed to disk vs. read whole.
+
+Feeds synthetic multipart bodies of growing size through ``receive_pdf`` and
+through the old ``await file.read()`` + ``BytesIO`` path, measuring the peak
+with tracemalloc. The streamed peak should stay flat as uploads grow.
+
+Usage (from backend/):
+    python benchmarks/bench_upload_memory.py --sizes 10 50 200
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uploads import receive_pdf  # noqa: E402
+
+BOUNDARY = b"benchboundary"
+CHUNK = 64 * 1024  # what the ASGI server hands over per receive()
+
+
+class FakeRequest:
+    """The parts of a Starlette request ``receive_pdf`` uses, producing the body lazily."""
+
+    def __init__(self, size):
+        self.size = size
+        self.head = (
+            b"--" + BOUNDARY + b"\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="book.pdf"\r\n'
+            b"Content-Type: application/pdf\r\n\r\n%PDF-1.7\n"
+        )
+        self.tail = b"\r\n--" + BOUNDARY + b"--\r\n"
+        self.headers = {
+            "content-type": "multipart/form-data; boundary=" + BOUNDARY.decode(),
+            "content-length": str(len(self.head) + size + len(self.tail)),
+        }
+
+    async def stream(self):
+        yield self.head
+        filler = b"0 0 obj stream data " * (CHUNK // 20)
+        for offset in range(0, self.size, len(filler)):
+            yield filler[:self.size - offset]
+        yield self.tail
+
+
+async def read_whole(request):
+    """The previous path: the whole body in memory, then a BytesIO copy for the parser."""
+    body = b"".join([chunk async for chunk in request.stream()])
+    return io.BytesIO(body[len(request.head):len(body) - len(request.tail)])
+
+
+def peak_mb(coroutine):
+    tracemalloc.start()
+    result = asyncio.run(coroutine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="upload sizes in MB")
+    args = parser.parse_args()
+
+    print(f"{'upload':>8}  {'streamed peak':>14}  {'read-whole peak':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes:
+            size = size_mb * 1024 * 1024
+            upload, streamed = peak_mb(receive_pdf(FakeRequest(size), max_bytes=size + 1024, directory=tmp))
+            assert os.path.getsize(upload.path) == upload.size
+            os.unlink(upload.path)
+            _, whole = peak_mb(read_whole(FakeRequest(size)))
+            print(f"{size_mb:>6}MB  {streamed:>12.2f}MB  {whole:>14.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
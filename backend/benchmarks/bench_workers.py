@@ -0,0 +1,118 @@
+"""Throughput of the FastAPI service with 1, 2, 4... uvicorn workers.
+
+Starts ``uvicorn main:app --workers N`` with the shared document store and the
+stub LLM, then has ``--concurrency`` clients loop for ``--duration`` seconds:
+upload a small PDF (text extraction is CPU-bound, so one process tops out at
+one core) and immediately ask for a quiz on it. Requests land on whichever
+worker accepts the connection, so a quiz answered 404 means the worker never
+saw the upload; with the shared store that count must stay 0. Expect upload
+throughput to grow with workers up to the number of cores.
+
+Usage (from backend/):
+    python benchmarks/bench_workers.py --workers 1 2 4 --concurrency 16 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pdfgen import write_pdf  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, port, data_dir, latency):
+    env = dict(
+        os.environ,
+        LLM_BACKEND="stub",
+        LLM_STUB_LATENCY=str(latency),
+        WEB_CONCURRENCY=str(workers),
+        DOCUMENT_STORE_MODE="shared",
+        DOCUMENT_STORE_DIR=os.path.join(data_dir, "document_store"),
+        GENERATION_CACHE_BACKEND="sqlite",
+        GENERATION_CACHE_PATH=os.path.join(data_dir, "generation_cache.sqlite3"),
+        SINGLE_FLIGHT="file",
+        SINGLE_FLIGHT_LOCK_DIR=os.path.join(data_dir, "locks"),
+        PDF_EXTRACT_PARALLEL_MIN_PAGES="100000",  # extract in the worker, not the shared pool
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+async def load(port, pdf_bytes, concurrency, duration):
+    counts = {"uploads": 0, "quizzes": 0, "not_found": 0, "errors": 0}
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)  # spread over workers
+
+    async def client_loop(client):
+        while time.monotonic() < deadline:
+            response = await client.post("/upload", files={"file": ("bench.pdf", pdf_bytes, "application/pdf")})
+            if response.status_code != 200:
+                counts["errors"] += 1
+                continue
+            counts["uploads"] += 1
+            response = await client.post("/generate/quiz", json={"pdf_id": response.json()["pdf_id"], "fresh": True})
+            counts["not_found" if response.status_code == 404 else "quizzes"] += 1
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        return counts, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = write_pdf(os.path.join(tmp, "bench.pdf"), pages=args.pages)
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+        print(f"{os.cpu_count()} CPUs, {args.pages}-page PDF, concurrency {args.concurrency}")
+        print(f"{'workers':>7}  {'uploads/s':>9}  {'quizzes/s':>9}  {'404s':>5}  {'errors':>6}")
+        for workers in args.workers:
+            data_dir = tempfile.mkdtemp(dir=tmp)
+            port = free_port()
+            server = start_server(workers, port, data_dir, args.latency)
+            try:
+                counts, elapsed = asyncio.run(load(port, pdf_bytes, args.concurrency, args.duration))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{workers:>7}  {counts['uploads'] / elapsed:>9.1f}  {counts['quizzes'] / elapsed:>9.1f}  "
+                  f"{counts['not_found']:>5}  {counts['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Tiny dependency-free PDF writer for benchmarks.
+
+Generates a text-only PDF with ``pages`` pages of lorem-style prose so the
+extraction benchmarks do not need fpdf/reportlab or checked-in fixtures.
+"""
+import random
+
+WORDS = (
+    "cell energy matter force motion atom molecule reaction element compound "
+    "photosynthesis respiration gravity velocity acceleration circuit current "
+    "voltage resistance magnet wave frequency light sound heat temperature "
+    "pressure density volume mass weight organism tissue organ system ecology"
+).split()
+
+
+def _page_stream(rng, page_number, lines):
+    ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td", f"(Chapter {page_number // 20 + 1} - page {page_number + 1}) Tj"]
+    for _ in range(lines):
+        sentence = " ".join(rng.choice(WORDS) for _ in range(12))
+        ops.append(f"T* ({sentence}.) Tj")
+    ops.append("ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def write_pdf(path, pages=400, lines=55, seed=0):
+    """Write a ``pages``-page PDF to ``path`` and return ``path``."""
+    rng = random.Random(seed)
+    objects = []  # object bodies, 1-indexed by position + 1
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    page_tree = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for number in range(pages):
+        stream = _page_stream(rng, number, lines)
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (page_tree, font, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+
+    with open(path, "wb") as fh:
+        fh.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(fh.tell())
+            fh.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = fh.tell()
+        fh.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            fh.write(b"%010d 00000 n \n" % offset)
+        fh.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objects) + 1, catalog, xref))
+    return path
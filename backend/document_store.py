@@ -0,0 +1,280 @@
+"""Extracted PDF text for the FastAPI backend, bounded in memory.
+
+Documents are kept in an in-process LRU until their text exceeds
+``memory_budget`` bytes; the least recently used ones are then spilled to
+``directory`` as UTF-8 text files, with a small SQLite index holding their
+metadata. Reading a spilled document promotes it back into memory.
+Documents larger than ``max_item_fraction`` of the budget never enter
+memory, so one huge textbook cannot flush every other document; their
+files are memory-mapped on each read, and a prefix read (``limit``) only
+touches the pages it needs. IDs are random, so they never collide with
+removed ones. With a ``disk_budget`` the oldest files are deleted once the
+directory holds more text than that; their IDs then read as missing.
+
+The lock only guards the in-memory LRU and the counters: files are read
+and written outside it, so one slow disk read does not stall every other
+request. A document being spilled or promoted stays readable from
+``_spilling`` until its file has been written or deleted.
+
+Without ``shared``, the directory belongs to this process, as the
+documents did when they only lived in memory: it is emptied when the
+store opens and by ``close``. With ``shared=True`` several worker
+processes use the same directory: every document is written through to
+disk when it is added, the SQLite index runs in WAL mode, and the
+in-memory LRU is only a per-process read cache, so an upload handled by
+one worker can be read by any other. Documents are immutable once added;
+``remove`` only drops the calling process's cached copy along with the
+file, so other workers may keep serving theirs until it is evicted.
+"""
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+# Per-entry bookkeeping (dict slot, dataclass, str header) counted against the budget
+ENTRY_OVERHEAD = 256
+# Reads that lose a race with a promotion or removal of the same file look it up again
+READ_ATTEMPTS = 3
+
+
+@dataclass
+class StoredDocument:
+    pdf_id: str
+    filename: str
+    content_hash: str
+    text: str
+    text_length: int
+
+
+class DocumentStore:
+    def __init__(self, directory, memory_budget=256 * 1024 * 1024, max_item_fraction=0.25, shared=False,
+                 disk_budget=None):
+        self.directory = Path(directory)
+        self.shared = shared
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.memory_budget = memory_budget
+        self.max_item_bytes = int(memory_budget * max_item_fraction)
+        self.disk_budget = disk_budget
+        self.memory_bytes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "spills": 0, "promotions": 0,
+                      "disk_evictions": 0}
+        self._memory = OrderedDict()  # pdf_id -> (StoredDocument, size), least recently used first
+        self._spilling = {}  # pdf_id -> StoredDocument moving between memory and disk
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        if not shared:
+            self._clear_directory()
+        with self._connect() as conn:
+            if shared:
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "id TEXT PRIMARY KEY, filename TEXT NOT NULL, content_hash TEXT NOT NULL, "
+                "text_length INTEGER NOT NULL, text_bytes INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not thread-safe.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.directory / "index.sqlite3", timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _text_path(self, pdf_id):
+        return self.directory / f"{pdf_id}.txt"
+
+    def add(self, filename, text, content_hash):
+        """Store a document and return its new ID."""
+        pdf_id = uuid.uuid4().hex
+        document = StoredDocument(pdf_id, filename, content_hash, text, len(text))
+        size = len(text.encode()) + ENTRY_OVERHEAD
+        if self.shared or size > self.max_item_bytes:
+            self._spill(document)  # before it is visible, so other workers can read it
+        if size <= self.max_item_bytes:
+            self._spill_all(self._remember(document, size))
+        return pdf_id
+
+    def get(self, pdf_id, limit=None):
+        """The document with at most ``limit`` characters of its text, or None."""
+        for attempt in range(READ_ATTEMPTS):
+            with self._lock:
+                entry = self._memory.get(pdf_id)
+                if entry is not None:
+                    self._memory.move_to_end(pdf_id)
+                    self.stats["memory_hits"] += 1
+                    return self._limited(entry[0], limit)
+                spilling = self._spilling.get(pdf_id)
+                if spilling is not None:
+                    self.stats["memory_hits"] += 1
+                    return self._limited(spilling, limit)
+
+            row = self._connect().execute(
+                "SELECT filename, content_hash, text_length, text_bytes FROM documents WHERE id = ?", (pdf_id,)
+            ).fetchone()
+            if row is None:
+                break
+            filename, content_hash, text_length, text_bytes = row
+            promote = text_bytes + ENTRY_OVERHEAD <= self.max_item_bytes
+            # UTF-8 needs at most 4 bytes a character, so this prefix holds the first ``limit`` of them
+            length = text_bytes if promote or limit is None else min(text_bytes, 4 * limit)
+            try:
+                text = self._read_text(pdf_id, length)
+            except FileNotFoundError:
+                continue  # promoted or removed by another thread meanwhile
+            document = StoredDocument(pdf_id, filename, content_hash, text, text_length)
+            size = text_bytes + ENTRY_OVERHEAD
+            victims = []
+            with self._lock:
+                self.stats["disk_hits"] += 1
+                # Another thread may have promoted it while we read
+                promote = promote and pdf_id not in self._memory and pdf_id not in self._spilling
+                if promote:
+                    self.stats["promotions"] += 1
+                    if self.shared:
+                        victims = self._remember(document, size)
+                    else:
+                        self._spilling[pdf_id] = document  # stays readable while its file is deleted
+            if promote and not self.shared:
+                self._unspill(pdf_id)
+                with self._lock:
+                    self._spilling.pop(pdf_id, None)
+                    victims = self._remember(document, size)
+            self._spill_all(victims)
+            return self._limited(document, limit)
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def __contains__(self, pdf_id):
+        with self._lock:
+            if pdf_id in self._memory or pdf_id in self._spilling:
+                return True
+        return self._connect().execute("SELECT 1 FROM documents WHERE id = ?", (pdf_id,)).fetchone() is not None
+
+    def remove(self, pdf_id):
+        with self._lock:
+            entry = self._memory.pop(pdf_id, None)
+            if entry is not None:
+                self.memory_bytes -= entry[1]
+            self._spilling.pop(pdf_id, None)
+        self._unspill(pdf_id)
+
+    def close(self):
+        """Release this process's copy; a store that is not shared also deletes its files."""
+        with self._lock:
+            self._memory.clear()
+            self.memory_bytes = 0
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        if not self.shared:
+            self._clear_directory()
+
+    def __len__(self):
+        with self._lock:
+            in_memory = 0 if self.shared else len(self._memory) + len(self._spilling)
+        return in_memory + self._connect().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def info(self):
+        with self._lock:
+            info = {
+                **self.stats,
+                "in_memory": len(self._memory),
+                "memory_bytes": self.memory_bytes,
+                "memory_budget": self.memory_budget,
+            }
+        return {**info, "on_disk": self._connect().execute("SELECT COUNT(*) FROM documents").fetchone()[0]}
+
+    @staticmethod
+    def _limited(document, limit):
+        if limit is None or len(document.text) <= limit:
+            return document
+        return StoredDocument(document.pdf_id, document.filename, document.content_hash,
+                              document.text[:limit], document.text_length)
+
+    def _remember(self, document, size):
+        """Add ``document`` to the LRU; returns the evicted documents the caller must spill (lock held)."""
+        self._memory[document.pdf_id] = (document, size)
+        self.memory_bytes += size
+        victims = []
+        while self.memory_bytes > self.memory_budget:
+            _, (victim, victim_size) = self._memory.popitem(last=False)
+            self.memory_bytes -= victim_size
+            if not self.shared:
+                self._spilling[victim.pdf_id] = victim
+                victims.append(victim)
+        return victims
+
+    def _spill_all(self, victims):
+        for victim in victims:
+            try:
+                self._spill(victim)
+            finally:
+                with self._lock:
+                    self._spilling.pop(victim.pdf_id, None)
+
+    def _spill(self, document):
+        data = document.text.encode()
+        path = self._text_path(document.pdf_id)
+        partial = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(partial, "wb") as f:
+                f.write(data)
+            os.replace(partial, path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (id, filename, content_hash, text_length, text_bytes, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (document.pdf_id, document.filename, document.content_hash, document.text_length, len(data),
+                 time.time()),
+            )
+        with self._lock:
+            self.stats["spills"] += 1
+        if self.disk_budget is not None:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        # Oldest files first, until the directory holds at most ``disk_budget`` bytes of text
+        conn = self._connect()
+        excess = conn.execute("SELECT COALESCE(SUM(text_bytes), 0) FROM documents").fetchone()[0] - self.disk_budget
+        if excess <= 0:
+            return
+        for pdf_id, text_bytes in conn.execute("SELECT id, text_bytes FROM documents ORDER BY created_at").fetchall():
+            if excess <= 0:
+                break
+            self._unspill(pdf_id)
+            excess -= text_bytes
+            with self._lock:
+                self.stats["disk_evictions"] += 1
+
+    def _unspill(self, pdf_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM documents WHERE id = ?", (pdf_id,))
+        try:
+            os.unlink(self._text_path(pdf_id))
+        except FileNotFoundError:
+            pass
+
+    def _clear_directory(self):
+        for path in self.directory.iterdir():
+            if path.suffix in (".txt", ".tmp") or path.name.startswith("index.sqlite3"):
+                path.unlink(missing_ok=True)
+
+    def _read_text(self, pdf_id, length):
+        if length == 0:
+            # Still fails like a non-empty read if the file is gone
+            self._text_path(pdf_id).stat()
+            return ""
+        with open(self._text_path(pdf_id), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # A prefix may end inside a character; drop the partial bytes
+            return mm[:length].decode(errors="ignore")
@@ -1,25 +1,51 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import os
+from contextlib import asynccontextmanager
+import json
 from dotenv import load_dotenv
-import google.generativeai as genai
-from pypdf import PdfReader
-import io
 from typing import List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from document_store import DocumentStore
+from benchmate_common.extraction import extract_pdf
+from benchmate_common.generation_cache import create_cache
+from benchmate_common.singleflight import create_flight
+from benchmate_common.structured import (
+    FLASHCARD_SCHEMA, QUIZ_SCHEMA, MalformedOutput, parse_items, validate_card, validate_question,
+)
+from benchmate_common.llm_client import LLMTimeout, create_client
+from uploads import UploadRejected, receive_pdf
 
 load_dotenv()
 
-# Configure Gemini
+# Configure Gemini; LLM_BACKEND=stub runs offline with a fake model for load tests
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if not GEMINI_API_KEY and LLM_BACKEND == "gemini":
     raise ValueError("GEMINI_API_KEY not found in environment variables")
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel("models/gemini-2.5-flash")
+llm = create_client(
+    backend=LLM_BACKEND,
+    api_key=GEMINI_API_KEY,
+    model_name=os.getenv("LLM_MODEL", "models/gemini-2.5-flash"),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+    async_concurrency=int(os.getenv("LLM_ASYNC_CONCURRENCY", 256)),
+    timeout=float(os.getenv("LLM_TIMEOUT", 60)),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", 3)),
+    stub_latency=float(os.getenv("LLM_STUB_LATENCY", 0.5)),
+    stub_failure_rate=float(os.getenv("LLM_STUB_FAILURE_RATE", 0)),
+)
+
 
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # In process mode the spilled files die with the process, as in-memory documents would
+    pdf_storage.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,60 +55,110 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage for uploaded PDFs
-pdf_storage = {}
+# Extracted text of uploaded PDFs: up to DOCUMENT_MEMORY_BUDGET_MB in memory, the least
+# recently used rest spilled to DOCUMENT_STORE_DIR. DOCUMENT_STORE_MODE="shared" writes every
+# document to DOCUMENT_STORE_DIR so all uvicorn workers (WEB_CONCURRENCY) can serve it.
+# DOCUMENT_STORE_DISK_BUDGET_MB, if set, deletes the oldest spilled documents beyond it.
+DOCUMENT_STORE_MODE = os.getenv("DOCUMENT_STORE_MODE", "process")
+if DOCUMENT_STORE_MODE not in ("process", "shared"):
+    raise ValueError(f"Unknown DOCUMENT_STORE_MODE: {DOCUMENT_STORE_MODE}")
+if int(os.getenv("WEB_CONCURRENCY", 1)) > 1 and DOCUMENT_STORE_MODE != "shared":
+    raise ValueError("Several workers need DOCUMENT_STORE_MODE=shared, or uploads 404 on the other workers")
+pdf_storage = DocumentStore(
+    os.getenv("DOCUMENT_STORE_DIR", "document_store"),
+    memory_budget=int(os.getenv("DOCUMENT_MEMORY_BUDGET_MB", 256)) * 1024 * 1024,
+    shared=DOCUMENT_STORE_MODE == "shared",
+    disk_budget=int(os.environ["DOCUMENT_STORE_DISK_BUDGET_MB"]) * 1024 * 1024
+    if os.getenv("DOCUMENT_STORE_DISK_BUDGET_MB") else None,
+)
+
+# Characters of a document's text put into a generation prompt
+PROMPT_TEXT_CHARS = 4000
+
+# Largest PDF accepted, in bytes
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+
+# Cache for generated quizzes/flashcards; GENERATION_CACHE_BACKEND is "memory" or "sqlite".
+# Identical concurrent misses share one generation; SINGLE_FLIGHT="file" extends this across
+# worker processes (use with the sqlite cache backend).
+generation_cache = create_cache(
+    backend=os.getenv("GENERATION_CACHE_BACKEND", "memory"),
+    path=os.getenv("GENERATION_CACHE_PATH", "generation_cache.sqlite3"),
+    max_entries=int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", 1024)),
+    ttl=int(os.getenv("GENERATION_CACHE_TTL", 7 * 24 * 3600)),
+    flight=create_flight(
+        mode=os.getenv("SINGLE_FLIGHT", "process"),
+        lock_dir=os.getenv("SINGLE_FLIGHT_LOCK_DIR", "locks"),
+    ),
+)
+
+# Most questions or cards one request may ask for, as in the Django backend
+MAX_GENERATED_ITEMS = 50
 
 class QuizRequest(BaseModel):
     pdf_id: str
-    num_questions: int = 5
+    num_questions: int = Field(5, ge=1, le=MAX_GENERATED_ITEMS)
+    fresh: bool = False  # bypass the generation cache
 
 class FlashcardRequest(BaseModel):
     pdf_id: str
-    num_cards: int = 10
+    num_cards: int = Field(10, ge=1, le=MAX_GENERATED_ITEMS)
+    fresh: bool = False
 
 @app.get("/")
 def read_root():
     return {"message": "NotebookLM Clone API"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Generation cache hit/miss counters"""
+    return generation_cache.stats()
+
+@app.get("/documents/stats")
+def document_stats():
+    """Document store occupancy and hit counters"""
+    return pdf_storage.info()
+
 @app.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
-    """Upload a PDF file and extract its text content"""
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-    
+async def upload_pdf(request: Request):
+    """Upload a PDF file (multipart field "file") and extract its text content"""
+    # Streamed to a temp file; size and PDF header are checked while it arrives
     try:
-        # Read the PDF file
-        contents = await file.read()
-        pdf_reader = PdfReader(io.BytesIO(contents))
-        
-        # Extract text from all pages
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        upload = await receive_pdf(request, max_bytes=MAX_UPLOAD_BYTES)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    try:
+        if not upload.filename.endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+        # The extraction workers open the file from disk, off the event loop
+        result = await run_in_threadpool(extract_pdf, upload.path)
+        text = result.text
         
-        # Store the text with a simple ID
-        pdf_id = str(len(pdf_storage) + 1)
-        pdf_storage[pdf_id] = {
-            "filename": file.filename,
-            "text": text
-        }
+        # Spilling evicted documents writes files, so keep it off the event loop too
+        pdf_id = await run_in_threadpool(pdf_storage.add, upload.filename, text, upload.sha256)
         
         return {
             "pdf_id": pdf_id,
-            "filename": file.filename,
-            "pages": len(pdf_reader.pages),
+            "filename": upload.filename,
+            "pages": result.page_count,
             "text_length": len(text)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    finally:
+        os.unlink(upload.path)
 
 @app.post("/generate/quiz")
 async def generate_quiz(request: QuizRequest):
     """Generate quiz questions from uploaded PDF"""
-    if request.pdf_id not in pdf_storage:
+    document = await run_in_threadpool(pdf_storage.get, request.pdf_id, PROMPT_TEXT_CHARS)
+    if document is None:
         raise HTTPException(status_code=404, detail="PDF not found")
     
-    text = pdf_storage[request.pdf_id]["text"]
+    text = document.text  # limited to PROMPT_TEXT_CHARS to avoid token limits
     
     prompt = f"""Based on the following text, generate {request.num_questions} multiple-choice quiz questions.
 Each question should have 4 options (A, B, C, D) with only one correct answer.
@@ -103,18 +179,24 @@ Return the response in JSON format with the following structure:
 }}
 
 Text:
-{text[:4000]}"""  # Limit text to avoid token limits
+{text}"""
     
+    async def generate():
+        # Validated questions only; malformed output fails here rather than in the client
+        return json.dumps(parse_items(await llm.agenerate(prompt, schema=QUIZ_SCHEMA), validate_question))
+
     try:
-        response = model.generate_content(prompt)
-        # Extract JSON from markdown code blocks if present
-        result_text = response.text
-        if "```json" in result_text:
-            result_text = result_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in result_text:
-            result_text = result_text.split("```")[1].split("```")[0].strip()
-        
-        return {"quiz": result_text}
+        result_text, cached = await generation_cache.aget_or_generate(
+            document.content_hash,
+            "quiz_questions",
+            {"num_questions": request.num_questions},
+            generate,
+            fresh=request.fresh,
+        )
+    except LLMTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except MalformedOutput as e:
+        raise HTTPException(status_code=502, detail=f"Model returned an invalid quiz: {str(e)}")
     except Exception as e:
         print(f"Error generating quiz: {str(e)}")
         print(f"Error type: {type(e)}")
@@ -122,13 +204,19 @@ Text:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
 
+    questions = json.loads(result_text)
+    if not questions:
+        raise HTTPException(status_code=502, detail="Model returned no usable questions")
+    return {"quiz": {"questions": questions}, "cached": cached}
+
 @app.post("/generate/flashcards")
 async def generate_flashcards(request: FlashcardRequest):
     """Generate flashcards from uploaded PDF"""
-    if request.pdf_id not in pdf_storage:
+    document = await run_in_threadpool(pdf_storage.get, request.pdf_id, PROMPT_TEXT_CHARS)
+    if document is None:
         raise HTTPException(status_code=404, detail="PDF not found")
     
-    text = pdf_storage[request.pdf_id]["text"]
+    text = document.text  # limited to PROMPT_TEXT_CHARS to avoid token limits
     
     prompt = f"""Based on the following text, generate {request.num_cards} flashcards for studying.
 Each flashcard should have a front (question or concept) and back (answer or explanation).
@@ -143,17 +231,27 @@ Return the response in JSON format with the following structure:
 }}
 
 Text:
-{text[:4000]}"""  # Limit text to avoid token limits
+{text}"""
     
+    async def generate():
+        return json.dumps(parse_items(await llm.agenerate(prompt, schema=FLASHCARD_SCHEMA), validate_card))
+
     try:
-        response = model.generate_content(prompt)
-        # Extract JSON from markdown code blocks if present
-        result_text = response.text
-        if "```json" in result_text:
-            result_text = result_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in result_text:
-            result_text = result_text.split("```")[1].split("```")[0].strip()
-        
-        return {"flashcards": result_text}
+        result_text, cached = await generation_cache.aget_or_generate(
+            document.content_hash,
+            "flashcard_deck",
+            {"num_cards": request.num_cards},
+            generate,
+            fresh=request.fresh,
+        )
+    except LLMTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except MalformedOutput as e:
+        raise HTTPException(status_code=502, detail=f"Model returned invalid flashcards: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating flashcards: {str(e)}")
+
+    flashcards = json.loads(result_text)
+    if not flashcards:
+        raise HTTPException(status_code=502, detail="Model returned no usable flashcards")
+    return {"flashcards": {"flashcards": flashcards}, "cached": cached}
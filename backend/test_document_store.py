@@ -0,0 +1,154 @@
+"""Unit tests for the bounded document store (run from backend/: python -m unittest test_document_store)."""
+import multiprocessing
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from document_store import ENTRY_OVERHEAD, DocumentStore
+
+
+def add_documents(directory, worker, count):
+    store = DocumentStore(directory, memory_budget=64 * 1024, shared=True)
+    return [(store.add(f"w{worker}-{n}.pdf", f"worker {worker} document {n} " * 50, f"{worker}-{n}"), worker, n)
+            for n in range(count)]
+
+
+class DocumentStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def store(self, budget, **kwargs):
+        return DocumentStore(self.directory, memory_budget=budget, **kwargs)
+
+    def test_synthetic_workload_stays_within_budget(self):
+        rng = random.Random(0)
+        store = self.store(512 * 1024)
+        texts = {}
+        for n in range(3000):
+            # Mostly small documents, a few close to the per-item limit
+            size = rng.choice([200, 1_000, 5_000, 20_000, 120_000])
+            pdf_id = store.add(f"doc{n}.pdf", f"doc{n} " + "é" * size, f"hash{n}")
+            texts[pdf_id] = f"doc{n} " + "é" * size
+            self.assertLessEqual(store.memory_bytes, store.memory_budget)
+            if rng.random() < 0.3:  # read back a random earlier document
+                pdf_id = rng.choice(list(texts))
+                self.assertEqual(store.get(pdf_id).text, texts[pdf_id])
+                self.assertLessEqual(store.memory_bytes, store.memory_budget)
+
+        self.assertEqual(len(texts), 3000)  # no ID was handed out twice
+        self.assertEqual(len(store), 3000)
+        info = store.info()
+        self.assertGreater(info["spills"], 0)
+        self.assertGreater(info["promotions"], 0)
+        for pdf_id in rng.sample(list(texts), 200):
+            document = store.get(pdf_id, limit=50)
+            self.assertEqual(document.text, texts[pdf_id][:50])
+            self.assertEqual(document.text_length, len(texts[pdf_id]))
+
+    def test_least_recently_used_is_spilled_first(self):
+        store = self.store(3 * (1000 + ENTRY_OVERHEAD), max_item_fraction=1)
+        first, second, third = (store.add(f"{n}.pdf", str(n) * 1000, str(n)) for n in range(3))
+        store.get(first)
+        store.add("3.pdf", "3" * 1000, "3")
+        self.assertEqual(store.info()["on_disk"], 1)
+        self.assertEqual(store.get(first).text, "0" * 1000)
+        self.assertEqual(store.info()["memory_hits"], 2)  # the first document never left memory
+        self.assertEqual(store.get(second).text, "1" * 1000)
+        self.assertEqual(store.info()["disk_hits"], 1)
+        self.assertIsNotNone(store.get(third))
+
+    def test_oversized_documents_bypass_memory(self):
+        store = self.store(40_000)
+        small = store.add("small.pdf", "s" * 1000, "s")
+        big = store.add("big.pdf", "b" * 20_000, "b")
+        self.assertEqual(store.memory_bytes, 1000 + ENTRY_OVERHEAD)
+        self.assertEqual(store.get(big, limit=10).text, "b" * 10)
+        self.assertEqual(len(store.get(big).text), 20_000)
+        self.assertEqual(store.info()["in_memory"], 1)
+        self.assertIn(small, store)
+
+    def text_files(self):
+        return sorted(path.name for path in Path(self.directory).iterdir() if path.suffix in (".txt", ".tmp"))
+
+    def test_shared_documents_survive_a_restart_and_can_be_removed(self):
+        store = self.store(10_000, shared=True)
+        kept = store.add("big.pdf", "x" * 5000, "x")
+        gone = store.add("gone.pdf", "y" * 5000, "y")
+        store.remove(gone)
+        store.close()
+        reopened = self.store(10_000, shared=True)
+        self.assertEqual(reopened.get(kept).content_hash, "x")
+        self.assertIsNone(reopened.get(gone))
+        self.assertNotIn("missing", reopened)
+        self.assertEqual(self.text_files(), [f"{kept}.txt"])
+
+    def test_process_store_deletes_its_files_on_close_and_restart(self):
+        store = self.store(10_000)
+        store.add("big.pdf", "x" * 5000, "x")
+        store.close()
+        self.assertEqual(self.text_files(), [])
+        store = self.store(10_000)
+        stale = store.add("big.pdf", "x" * 5000, "x")  # left behind by a process that was killed
+        reopened = self.store(10_000)
+        self.assertIsNone(reopened.get(stale))
+        self.assertEqual(self.text_files(), [])
+
+    def test_promotion_and_removal_delete_spill_files(self):
+        store = self.store(2 * (1000 + ENTRY_OVERHEAD), max_item_fraction=1)
+        first, second, third = (store.add(f"{n}.pdf", str(n) * 1000, str(n)) for n in range(3))
+        self.assertEqual(self.text_files(), [f"{first}.txt"])
+        store.get(first)  # promoted, which spills the second document
+        self.assertEqual(self.text_files(), [f"{second}.txt"])
+        store.remove(second)
+        self.assertEqual(self.text_files(), [])
+        self.assertEqual(len(store), 2)
+        self.assertIsNotNone(store.get(third))
+
+    def test_disk_budget_deletes_the_oldest_files(self):
+        store = self.store(20_000, disk_budget=12_000)
+        first, second, third = (store.add(f"{n}.pdf", str(n) * 5000, str(n)) for n in range(3))
+        self.assertEqual(self.text_files(), sorted([f"{second}.txt", f"{third}.txt"]))
+        self.assertIsNone(store.get(first))
+        self.assertEqual(store.get(third).text, "2" * 5000)
+        self.assertEqual(store.info()["disk_evictions"], 1)
+
+    def test_reads_run_outside_the_lock(self):
+        store = self.store(10_000)
+        big = store.add("big.pdf", "b" * 5000, "b")
+        small = store.add("small.pdf", "s" * 100, "s")
+        read_text = store._read_text
+        results = []
+
+        def slow_read(pdf_id, length):
+            # Another thread reads from memory while this one is on disk
+            thread = threading.Thread(target=lambda: results.append(store.get(small).text))
+            thread.start()
+            thread.join(timeout=5)
+            return read_text(pdf_id, length)
+
+        store._read_text = slow_read
+        self.assertEqual(store.get(big).text, "b" * 5000)
+        self.assertEqual(results, ["s" * 100])
+
+    def test_shared_store_serves_documents_added_by_other_processes(self):
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(4) as pool:
+            batches = pool.starmap(add_documents, [(self.directory, worker, 100) for worker in range(4)])
+        added = [entry for batch in batches for entry in batch]
+        store = self.store(64 * 1024, shared=True)
+        self.assertEqual(len({pdf_id for pdf_id, _, _ in added}), 400)
+        self.assertEqual(len(store), 400)
+        for pdf_id, worker, n in added:
+            self.assertEqual(store.get(pdf_id, limit=30).text, (f"worker {worker} document {n} " * 50)[:30])
+
+        # Eviction in a shared store only drops the cached copy
+        self.assertLessEqual(store.memory_bytes, store.memory_budget)
+        self.assertEqual(store.info()["on_disk"], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+"""Request validation tests for the API (run from backend/: python -m unittest test_main)."""
+import os
+import shutil
+import tempfile
+import unittest
+
+DOCUMENT_STORE_DIR = tempfile.mkdtemp()
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ["DOCUMENT_STORE_DIR"] = DOCUMENT_STORE_DIR
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+
+def tearDownModule():
+    main.pdf_storage.close()
+    shutil.rmtree(DOCUMENT_STORE_DIR, ignore_errors=True)
+
+
+class GenerationRequestTests(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def test_counts_outside_the_allowed_range_are_rejected(self):
+        for path, field in (("/generate/quiz", "num_questions"), ("/generate/flashcards", "num_cards")):
+            for count in (0, -3, main.MAX_GENERATED_ITEMS + 1, 10_000):
+                response = self.client.post(path, json={"pdf_id": "missing", field: count})
+                self.assertEqual(response.status_code, 422, (path, count))
+                self.assertEqual(response.json()["detail"][0]["loc"], ["body", field])
+
+    def test_counts_within_the_range_reach_the_document_lookup(self):
+        for path, field in (("/generate/quiz", "num_questions"), ("/generate/flashcards", "num_cards")):
+            for count in (1, main.MAX_GENERATED_ITEMS):
+                response = self.client.post(path, json={"pdf_id": "missing", field: count})
+                self.assertEqual(response.status_code, 404, (path, count))
+
+
+if __name__ == "__main__":
+    unittest.main()
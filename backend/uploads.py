@@ -0,0 +1,129 @@
+"""Streaming PDF uploads for the FastAPI backend.
+
+``receive_pdf`` parses the multipart body as it arrives and writes the file
+part straight to a temp file, so an upload never sits in memory whole. The
+request is refused from its Content-Length when that is already too big;
+otherwise the file is stopped as soon as it passes ``max_bytes`` or when its
+first bytes do not contain the ``%PDF-`` header.
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+PDF_MAGIC = b"%PDF-"
+# The PDF header may follow a little junk; readers look this far for it
+PDF_MAGIC_WINDOW = 1024
+# Room for multipart boundaries and the other form fields in Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadRejected(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class ReceivedPdf:
+    path: str
+    filename: str
+    size: int
+    sha256: str
+
+
+class _PdfSpool:
+    """Temp file for one upload, checking size and magic bytes on every write."""
+
+    def __init__(self, filename, max_bytes, directory=None):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.head = b""
+        self.sha256 = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadRejected(413, f"File is larger than {self.max_bytes} bytes")
+        if self.head is not None:
+            self.head += data[:PDF_MAGIC_WINDOW]
+            if PDF_MAGIC in self.head[:PDF_MAGIC_WINDOW]:
+                self.head = None
+            elif len(self.head) >= PDF_MAGIC_WINDOW:
+                raise UploadRejected(400, "File is not a PDF")
+        self.sha256.update(data)
+        self.file.write(data)
+
+    def finish(self):
+        self.file.close()
+        if self.head is not None:
+            raise UploadRejected(400, "File is not a PDF")
+        return ReceivedPdf(self.path, self.filename, self.size, self.sha256.hexdigest())
+
+    def discard(self):
+        self.file.close()
+        os.unlink(self.path)
+
+
+async def receive_pdf(request, max_bytes, field="file", directory=None):
+    """Stream the ``field`` file of a multipart request to disk; the caller deletes ``path``."""
+    content_length = request.headers.get("content-length")
+    if content_length and int(content_length) > max_bytes + MULTIPART_OVERHEAD:
+        raise UploadRejected(413, f"File is larger than {max_bytes} bytes")
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected(400, "Expected a multipart/form-data upload")
+
+    state = {"header": b"", "headers": {}, "spool": None}
+    spools = []
+
+    def on_header_field(data, start, end):
+        state["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        name = state["header"].lower()
+        state["headers"][name] = state["headers"].get(name, b"") + data[start:end]
+
+    def on_header_end():
+        state["header"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["headers"] = {}
+        filename = disposition.get(b"filename")
+        if disposition.get(b"name") == field.encode() and filename is not None and not spools:
+            state["spool"] = _PdfSpool(filename.decode(errors="replace"), max_bytes, directory)
+            spools.append(state["spool"])
+
+    def on_part_data(data, start, end):
+        if state["spool"] is not None:
+            state["spool"].write(data[start:end])
+
+    def on_part_end():
+        state["spool"] = None
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+        if not spools:
+            raise UploadRejected(400, "No file provided")
+        return spools[0].finish()
+    except BaseException:
+        for spool in spools:
+            spool.discard()
+        raise
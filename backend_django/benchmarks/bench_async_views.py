@@ -0,0 +1,128 @@
+"""Concurrent chat generations: async views vs. the DRF sync views, both under uvicorn.
+
+Prepares a throwaway SQLite database with one user and one ready document,
+then starts ``uvicorn werter_backend.asgi:application`` (one process) with
+the stub LLM at ``--latency`` seconds per call, once with LLM_VIEWS=sync and
+once with LLM_VIEWS=async. At each concurrency level it sends that many chat
+requests at once and reports throughput and latency. The sync views are
+bounded by LLM_MAX_CONCURRENCY threads in the model call; the async ones keep
+up to LLM_ASYNC_CONCURRENCY calls in flight on the event loop.
+
+Usage (from backend_django/):
+    python benchmarks/bench_async_views.py --concurrency 8 64 256 --latency 1
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+
+def prepare(env):
+    """Create the database and a ready document; returns ``(token, document_id)``."""
+    os.environ.update(env)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'werter_backend.settings')
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from core.chunking import save_chunks
+    from core.models import Document
+    from users.models import User
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user('bench', password='bench')
+    document = Document.objects.create(user=user, file='pdfs/bench.pdf', content_hash='bench')
+    save_chunks(document, [f"Page {n}: cells, membranes and mitochondria. " * 40 for n in range(20)])
+    return str(RefreshToken.for_user(user).access_token), document.id
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(env, port, token):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "werter_backend.asgi:application", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=PROJECT_DIR, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/core/cache/stats/",
+                      headers={"Authorization": f"Bearer {token}"}, timeout=1)
+            return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+async def burst(port, token, document_id, concurrency):
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async def one(client, n):
+        started = time.monotonic()
+        response = await client.post("/api/core/chat/", json={"pdf_id": document_id, "message": f"Question {n}?"})
+        return response.status_code, time.monotonic() - started
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", headers=headers, limits=limits,
+                                 timeout=600) as client:
+        started = time.monotonic()
+        results = await asyncio.gather(*(one(client, n) for n in range(concurrency)))
+        return results, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 64, 256])
+    parser.add_argument("--latency", type=float, default=1.0, help="stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            DATABASE_PROFILE="sqlite-tuned",
+            SQLITE_PATH=os.path.join(tmp, "bench.sqlite3"),
+            INDEX_ROOT=os.path.join(tmp, "indexes"),
+            GENERATION_CACHE_PATH=os.path.join(tmp, "generation_cache.sqlite3"),
+            LLM_BACKEND="stub",
+            LLM_STUB_LATENCY=str(args.latency),
+        )
+        token, document_id = prepare(env)
+
+        print(f"stub latency {args.latency}s, one uvicorn process")
+        print(f"{'views':>5}  {'concurrency':>11}  {'req/s':>7}  {'p50':>7}  {'p95':>7}  {'ok':>9}")
+        for views in ("sync", "async"):
+            port = free_port()
+            server = start_server(dict(env, LLM_VIEWS=views), port, token)
+            try:
+                for concurrency in args.concurrency:
+                    results, elapsed = asyncio.run(burst(port, token, document_id, concurrency))
+                    latencies = sorted(latency for _, latency in results)
+                    ok = sum(status == 200 for status, _ in results)
+                    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+                    print(f"{views:>5}  {concurrency:>11}  {len(results) / elapsed:>7.1f}  "
+                          f"{statistics.median(latencies):>6.2f}s  {p95:>6.2f}s  {ok:>4}/{len(results):<4}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
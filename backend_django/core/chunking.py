@@ -0,0 +1,67 @@
+"""Splitting extracted text into ``DocumentChunk`` rows.
+
+Chunks follow page boundaries and pages longer than ``DOCUMENT_CHUNK_SIZE``
+characters are split at whitespace. Offsets refer to the full document text,
+i.e. every page followed by a newline, so joining the chunks in order gives
+back exactly what the extraction engine produced.
+"""
+from django.conf import settings
+from django.db.models import Max
+
+from .models import DocumentChunk
+
+
+def _split(text, chunk_size):
+    pieces = []
+    start = 0
+    while len(text) - start > chunk_size:
+        end = start + chunk_size
+        # Prefer cutting at whitespace in the second half of the window
+        cut = max(text.rfind(' ', start + chunk_size // 2, end), text.rfind('\n', start + chunk_size // 2, end))
+        end = cut + 1 if cut != -1 else end
+        pieces.append(text[start:end])
+        start = end
+    pieces.append(text[start:])
+    return pieces
+
+
+def split_pages(pages, chunk_size=None):
+    """Yield ``(page_number, start_offset, end_offset, text)`` for each chunk of ``pages``."""
+    chunk_size = chunk_size or settings.DOCUMENT_CHUNK_SIZE
+    offset = 0
+    for page_number, page in enumerate(pages, start=1):
+        for piece in _split(page + "\n", chunk_size):
+            yield page_number, offset, offset + len(piece), piece
+            offset += len(piece)
+
+
+def save_chunks(document, pages):
+    """Store ``pages`` split into chunks for the document's content and return the chunks.
+
+    Chunks are keyed by ``document.content_key``, so every document with the
+    same bytes reads the same rows; if another document already stored them
+    they are returned as they are.
+    """
+    existing = list(document.chunks)
+    if existing:
+        return existing
+    return DocumentChunk.objects.bulk_create(
+        [
+            DocumentChunk(
+                content_key=document.content_key,
+                index=index,
+                page_number=page_number,
+                start_offset=start,
+                end_offset=end,
+                text=text,
+            )
+            for index, (page_number, start, end, text) in enumerate(split_pages(pages))
+        ],
+        batch_size=500,
+        # Two uploads of the same bytes extracted at once write identical rows
+        ignore_conflicts=True,
+    )
+
+
+def text_length(document):
+    return document.chunks.aggregate(length=Max('end_offset'))['length'] or 0
@@ -0,0 +1,78 @@
+"""Background document ingestion.
+
+Jobs are persisted in ``IngestionJob`` and run on a small in-process thread
+pool; the heavy lifting happens in the extraction process pool. Jobs left
+queued or running by a restart are picked up by the
+``process_ingestion_jobs`` management command.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from benchmate_common.extraction import extract_pdf
+
+from .chunking import save_chunks
+from .models import Document, IngestionJob
+from .retrieval import build_index
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.INGESTION_WORKERS, thread_name_prefix='ingestion')
+
+
+def enqueue(job):
+    """Schedule ``job`` on the worker pool once the current transaction commits."""
+    transaction.on_commit(lambda: _executor.submit(_run_in_thread, job.pk))
+
+
+def _run_in_thread(job_id):
+    try:
+        process_job(job_id)
+    except Exception:
+        logger.exception("Ingestion job %s crashed", job_id)
+    finally:
+        connections.close_all()
+
+
+def _update_job(job_id, **fields):
+    IngestionJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def process_job(job_id):
+    """Extract, store and index the job's document and mark both the job and document as finished.
+
+    A failure in any step marks both as failed, so the document does not stay
+    "processing" forever.
+    """
+    job = IngestionJob.objects.select_related('document').get(pk=job_id)
+    if job.state == IngestionJob.State.DONE:
+        return job
+    document = job.document
+    _update_job(job.pk, state=IngestionJob.State.RUNNING, pages_done=0, error='')
+
+    def on_progress(pages_done, pages_total):
+        _update_job(job.pk, pages_done=pages_done, pages_total=pages_total)
+
+    try:
+        result = extract_pdf(document.file.path, on_progress=on_progress)
+        with transaction.atomic():
+            chunks = save_chunks(document, result.pages)
+            build_index(document, [chunk.text for chunk in chunks])
+            document.page_count = result.page_count
+            document.status = Document.Status.READY
+            document.save(update_fields=['page_count', 'status', 'updated_at'])
+            _update_job(
+                job.pk,
+                state=IngestionJob.State.DONE,
+                pages_done=result.page_count,
+                pages_total=result.page_count,
+            )
+    except Exception as e:
+        logger.exception("Ingestion failed for document %s", document.pk)
+        _update_job(job.pk, state=IngestionJob.State.FAILED, error=str(e))
+        Document.objects.filter(pk=document.pk).update(status=Document.Status.FAILED, updated_at=timezone.now())
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.models import UploadSession
+from core.upload_sessions import remove_stale
+
+
+class Command(BaseCommand):
+    help = "Delete resumable uploads that have been idle longer than UPLOAD_SESSION_TTL_HOURS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=None)
+
+    def handle(self, *args, **options):
+        count = remove_stale(UploadSession.objects.all(), options['hours'])
+        self.stdout.write(f"{count} upload sessions removed")
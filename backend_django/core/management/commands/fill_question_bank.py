@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from benchmate_common.llm_client import create_client
+from core.models import BankQuestion, Document
+from core.questionbank import fill_bank, topic_sections
+from core.ranking import get_ranker
+
+
+class Command(BaseCommand):
+    help = "Pre-generate quiz questions for ready documents whose bank holds fewer than --target questions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', type=int, default=20)
+        parser.add_argument('--document', type=int, help="Only fill the bank of this document id")
+
+    def handle(self, *args, **options):
+        llm = create_client(**settings.LLM)
+        documents = Document.objects.filter(status=Document.Status.READY)
+        if options['document']:
+            documents = documents.filter(pk=options['document'])
+        seen = set()
+        for document in documents.iterator():
+            if document.content_key in seen:
+                continue
+            seen.add(document.content_key)
+            have = BankQuestion.objects.filter(content_key=document.content_key).count()
+            if have >= options['target']:
+                continue
+            ranker = get_ranker(document)
+            added = fill_bank(document, llm, ranker, topic_sections(ranker, ''), options['target'] - have)
+            self.stdout.write(f"Document {document.pk}: {have} -> {have + added} questions")
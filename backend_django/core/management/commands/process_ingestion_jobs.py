@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import process_job
+from core.models import IngestionJob
+
+
+class Command(BaseCommand):
+    help = "Run ingestion jobs left queued or running, e.g. after a server restart."
+
+    def handle(self, *args, **options):
+        pending = IngestionJob.objects.filter(
+            state__in=[IngestionJob.State.QUEUED, IngestionJob.State.RUNNING]
+        ).values_list('pk', flat=True)
+        for job_id in list(pending):
+            job = process_job(job_id)
+            self.stdout.write(f"Job {job.pk}: {job.state} ({job.pages_done}/{job.pages_total} pages)")
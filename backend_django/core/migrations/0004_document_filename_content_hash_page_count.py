@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:40
+
+import os
+
+from django.db import migrations, models
+
+
+def fill_filename(apps, schema_editor):
+    Document = apps.get_model('core', 'Document')
+    for document in Document.objects.filter(filename='').only('file'):
+        document.filename = os.path.basename(document.file.name)
+        document.save(update_fields=['filename'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_rename_created_at_document_uploaded_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='filename',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='page_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_filename, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Fixed at the value used when this migration was written, not read from settings
+CHUNK_SIZE = 2000
+
+
+def backfill_chunks(apps, schema_editor):
+    # Page boundaries were not kept in extracted_text, so backfilled chunks are
+    # fixed-size and have no page number.
+    Document = apps.get_model('core', 'Document')
+    DocumentChunk = apps.get_model('core', 'DocumentChunk')
+    for document in Document.objects.exclude(extracted_text='').iterator(chunk_size=50):
+        text = document.extracted_text
+        DocumentChunk.objects.bulk_create(
+            [
+                DocumentChunk(
+                    document=document,
+                    index=index,
+                    start_offset=start,
+                    end_offset=min(start + CHUNK_SIZE, len(text)),
+                    text=text[start:start + CHUNK_SIZE],
+                )
+                for index, start in enumerate(range(0, len(text), CHUNK_SIZE))
+            ],
+            batch_size=500,
+        )
+
+
+def restore_extracted_text(apps, schema_editor):
+    Document = apps.get_model('core', 'Document')
+    for document in Document.objects.iterator(chunk_size=50):
+        document.extracted_text = "".join(document.chunks.order_by('index').values_list('text', flat=True))
+        document.save(update_fields=['extracted_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_ingestionjob_document_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('page_number', models.IntegerField(blank=True, null=True)),
+                ('start_offset', models.IntegerField()),
+                ('end_offset', models.IntegerField()),
+                ('text', models.TextField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='core.document')),
+            ],
+            options={
+                'ordering': ['index'],
+                'unique_together': {('document', 'index')},
+            },
+        ),
+        migrations.RunPython(backfill_chunks, restore_extracted_text),
+        migrations.RemoveField(
+            model_name='document',
+            name='extracted_text',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_chatsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_key', models.CharField(db_index=True, max_length=80)),
+                ('first_chunk', models.IntegerField()),
+                ('last_chunk', models.IntegerField()),
+                ('question', models.TextField()),
+                ('options', models.JSONField()),
+                ('correct_answer', models.CharField(max_length=1)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_key', 'first_chunk'], name='core_bankqu_content_1730bc_idx')],
+                'unique_together': {('content_key', 'fingerprint')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_sizes(apps, schema_editor):
+    Document = apps.get_model('core', 'Document')
+    Document.objects.update(updated_at=F('uploaded_at'))
+    for document in Document.objects.only('file').iterator(chunk_size=200):
+        try:
+            size = document.file.size
+        except (OSError, ValueError):
+            continue  # blob missing on this machine
+        Document.objects.filter(pk=document.pk).update(file_size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='file_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(fill_sizes, migrations.RunPython.noop),
+    ]
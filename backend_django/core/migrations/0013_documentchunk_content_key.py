@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def content_key(document):
+    # Document.content_key, which historical models do not have
+    return document.content_hash or f"document-{document.pk}"
+
+
+def key_chunks(apps, schema_editor):
+    # Documents with the same bytes hold identical copies; keep the first one
+    Document = apps.get_model('core', 'Document')
+    DocumentChunk = apps.get_model('core', 'DocumentChunk')
+    seen = set()
+    for document in Document.objects.order_by('id').iterator(chunk_size=200):
+        key = content_key(document)
+        chunks = DocumentChunk.objects.filter(document=document)
+        if key in seen:
+            chunks.delete()
+        elif chunks.update(content_key=key):
+            seen.add(key)
+
+
+def unkey_chunks(apps, schema_editor):
+    Document = apps.get_model('core', 'Document')
+    DocumentChunk = apps.get_model('core', 'DocumentChunk')
+    for document in Document.objects.order_by('id').iterator(chunk_size=200):
+        chunks = DocumentChunk.objects.filter(content_key=content_key(document))
+        if chunks.filter(document__isnull=True).update(document=document):
+            continue
+        DocumentChunk.objects.bulk_create(
+            [
+                DocumentChunk(
+                    document=document,
+                    content_key=f"document-{document.pk}",
+                    index=chunk.index,
+                    page_number=chunk.page_number,
+                    start_offset=chunk.start_offset,
+                    end_offset=chunk.end_offset,
+                    text=chunk.text,
+                )
+                for chunk in chunks.filter(document__isnull=False).iterator(chunk_size=500)
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentchunk',
+            name='content_key',
+            field=models.CharField(default='', max_length=80),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='documentchunk',
+            name='document',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='core.document'),
+        ),
+        migrations.RunPython(key_chunks, unkey_chunks),
+        migrations.AlterUniqueTogether(
+            name='documentchunk',
+            unique_together={('content_key', 'index')},
+        ),
+        migrations.RemoveField(
+            model_name='documentchunk',
+            name='document',
+        ),
+    ]
@@ -1,15 +1,143 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.conf import settings
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .ranking import ranker_path
+from .retrieval import index_path
 
 class Document(models.Model):
+    class Status(models.TextChoices):
+        PROCESSING = 'processing'
+        READY = 'ready'
+        FAILED = 'failed'
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='documents')
     file = models.FileField(upload_to='pdfs/')
+    filename = models.CharField(max_length=255, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True) # SHA-256 of the PDF bytes
+    page_count = models.IntegerField(default=0)
+    file_size = models.BigIntegerField(default=0) # bytes
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.READY)
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    extracted_text = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-uploaded_at'], name='document_user_uploaded_idx')]
 
     def __str__(self):
         return f"{self.file.name} ({self.user.username})"
 
+    @property
+    def content_key(self):
+        """Key for per-content caches; shared by documents with identical bytes."""
+        return self.content_hash or f"document-{self.pk}"
+
+    @property
+    def chunks(self):
+        """Chunks of the extracted text, stored once for all documents with the same content."""
+        return DocumentChunk.objects.filter(content_key=self.content_key)
+
+    def get_text(self, max_chars=None):
+        """Return the extracted text, loading only the chunks needed for ``max_chars``."""
+        chunks = self.chunks.all()
+        if max_chars is not None:
+            chunks = chunks.filter(start_offset__lt=max_chars)
+        text = "".join(chunks.values_list('text', flat=True))
+        return text if max_chars is None else text[:max_chars]
+
+    def get_text_range(self, start, end):
+        """Return characters ``start:end`` of the extracted text, loading only the chunks they span."""
+        chunks = list(
+            self.chunks.filter(end_offset__gt=start, start_offset__lt=end).values_list('start_offset', 'text')
+        )
+        if not chunks:
+            return ""
+        offset = chunks[0][0]
+        return "".join(text for _, text in chunks)[start - offset:end - offset]
+
+class DocumentChunk(models.Model):
+    content_key = models.CharField(max_length=80) # Document.content_key; deleted with the last such document
+    index = models.IntegerField()
+    page_number = models.IntegerField(null=True, blank=True) # null for text backfilled without page info
+    start_offset = models.IntegerField() # character offsets into the full document text
+    end_offset = models.IntegerField()
+    text = models.TextField()
+
+    class Meta:
+        ordering = ['index']
+        unique_together = ('content_key', 'index')
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.content_key}"
+
+@receiver(post_delete, sender=Document)
+def delete_unshared_content(sender, instance, **kwargs):
+    """With the last document of its content, delete the chunks, question bank and search indexes."""
+    if instance.content_hash and Document.objects.filter(content_hash=instance.content_hash).exists():
+        return
+    instance.chunks.delete()
+    BankQuestion.objects.filter(content_key=instance.content_key).delete()
+    paths = [index_path(instance), ranker_path(instance)]
+    # Files go only once the delete is committed; both are rebuilt on demand if it rolls back
+    transaction.on_commit(lambda: [path.unlink(missing_ok=True) for path in paths])
+
+class IngestionJob(models.Model):
+    class State(models.TextChoices):
+        QUEUED = 'queued'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name='ingestion_job')
+    state = models.CharField(max_length=20, choices=State.choices, default=State.QUEUED, db_index=True)
+    pages_done = models.IntegerField(default=0)
+    pages_total = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Job {self.id} for document {self.document_id} ({self.state})"
+
+class UploadSession(models.Model):
+    """A resumable upload: chunks are written into a preallocated file until all have arrived."""
+    class State(models.TextChoices):
+        OPEN = 'open'
+        COMPLETING = 'completing'
+        COMPLETE = 'complete'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField() # bytes
+    chunk_size = models.IntegerField()
+    state = models.CharField(max_length=20, choices=State.choices, default=State.OPEN)
+    document = models.ForeignKey(Document, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.id} of {self.filename} ({self.state})"
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+class UploadChunk(models.Model):
+    """One received chunk of an ``UploadSession``; inserting it is what marks the chunk as stored."""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('session', 'index')
+
 class ChatMessage(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='messages')
     role = models.CharField(max_length=20) # 'user' or 'assistant'
@@ -18,6 +146,83 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [models.Index(fields=['document', 'created_at'], name='chatmessage_document_idx')]
+
+class ChatSummary(models.Model):
+    """Running summary of the chat turns that no longer fit in the prompt verbatim."""
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name='chat_summary')
+    content = models.TextField(blank=True)
+    summarized_until = models.IntegerField(default=0) # id of the last ChatMessage folded into content
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Chat summary for document {self.document_id}"
+
+class BankQuestion(models.Model):
+    """A generated quiz question, shared by all documents with the same content."""
+    content_key = models.CharField(max_length=80, db_index=True) # Document.content_key
+    first_chunk = models.IntegerField() # chunk range of the section it was generated from
+    last_chunk = models.IntegerField()
+    question = models.TextField()
+    options = models.JSONField() # {"A": ..., "B": ..., "C": ..., "D": ...}
+    correct_answer = models.CharField(max_length=1)
+    fingerprint = models.CharField(max_length=40) # SHA-1 of the normalised question text
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('content_key', 'fingerprint')
+        indexes = [models.Index(fields=['content_key', 'first_chunk'])]
+
+    def __str__(self):
+        return self.question[:60]
+
+    def as_dict(self):
+        return {"question": self.question, "options": self.options, "correct_answer": self.correct_answer}
+
+class Quiz(models.Model):
+    """A quiz as served to a user; questions are copied so later bank changes don't alter it."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='quizzes')
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='quizzes')
+    topic = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Quiz {self.id} on document {self.document_id}"
+
+class Question(models.Model):
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='questions')
+    index = models.IntegerField()
+    text = models.TextField()
+    options = models.JSONField() # {"A": ..., "B": ..., "C": ..., "D": ...}
+    correct_answer = models.CharField(max_length=1)
+
+    class Meta:
+        ordering = ['index']
+        unique_together = ('quiz', 'index')
+
+    def __str__(self):
+        return self.text[:60]
+
+class FlashcardDeck(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='flashcard_decks')
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='flashcard_decks')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Deck {self.id} on document {self.document_id}"
+
+class Flashcard(models.Model):
+    deck = models.ForeignKey(FlashcardDeck, on_delete=models.CASCADE, related_name='cards')
+    index = models.IntegerField()
+    front = models.TextField()
+    back = models.TextField()
+
+    class Meta:
+        ordering = ['index']
+        unique_together = ('deck', 'index')
+
+    def __str__(self):
+        return self.front[:60]
 
 class Note(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='notes')
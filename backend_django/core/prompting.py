@@ -0,0 +1,157 @@
+"""Token-budgeted chat prompt assembly.
+
+A chat prompt has four sections: the fixed tutor instructions, passages
+from the document, the conversation so far and the new question. Each is
+measured against ``CHAT_PROMPT_TOKENS`` so prompts stay the same size no
+matter how long the conversation gets. Recent turns are kept verbatim up to
+``CHAT_HISTORY_TOKENS``; older turns are folded into a per-document
+``ChatSummary`` in the background, a few turns at a time, so the summary is
+extended rather than regenerated.
+
+Token counts are estimated from character length; no tokenizer is needed
+for budgeting at this granularity.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .models import ChatSummary, Document
+from .retrieval import retrieve_context
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+SYSTEM_TEXT = """You are a helpful AI tutor assisting a student with a document.
+Use the following passages from the document to answer the student's question.
+If the answer is not in the passages, say so politely.
+Keep answers concise and relevant."""
+
+SUMMARY_PROMPT = """You keep a running summary of a tutoring conversation about a document.
+Update the summary below with the new exchanges. Keep what the student asked,
+what they struggled with and the key answers; drop small talk. Reply with the
+updated summary only, in at most {words} words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{turns}"""
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-summary')
+
+
+def count_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text, tokens):
+    return text[:max(0, tokens) * CHARS_PER_TOKEN]
+
+
+def format_turn(message):
+    role = "Student" if message.role == 'user' else "Tutor"
+    return f"{role}: {message.content}\n"
+
+
+@dataclass
+class ChatPrompt:
+    text: str
+    tokens: dict = field(default_factory=dict)  # estimated tokens per section
+    history_start: int = None  # id of the oldest message kept verbatim
+
+
+def build_chat_prompt(document, message):
+    """Assemble the tutor prompt for ``message`` within the configured token budget.
+
+    Call this before saving ``message`` so it is not repeated in the history.
+    """
+    question = truncate_tokens(message or '', settings.CHAT_QUESTION_TOKENS)
+    summary = ChatSummary.objects.filter(document=document).values_list('content', flat=True).first() or ''
+    summary = truncate_tokens(summary, settings.CHAT_SUMMARY_TOKENS)
+
+    # Newest turns first until the history budget is spent; long answers are
+    # cut rather than crowding out everything before them.
+    history, used, history_start = [], 0, None
+    for turn in document.messages.order_by('-id')[:settings.CHAT_HISTORY_MAX_TURNS]:
+        line = format_turn(turn)
+        if used + count_tokens(line) > settings.CHAT_HISTORY_TOKENS:
+            if history:
+                break
+            line = truncate_tokens(line, settings.CHAT_HISTORY_TOKENS - 1) + "\n"
+        history.append(line)
+        used += count_tokens(line)
+        history_start = turn.id
+    history.reverse()
+
+    tokens = {
+        'system': count_tokens(SYSTEM_TEXT),
+        'summary': count_tokens(summary),
+        'history': used,
+        'question': count_tokens(question),
+    }
+    context_tokens = settings.CHAT_PROMPT_TOKENS - sum(tokens.values()) - 50  # headings and separators
+    context = retrieve_context(document, question, budget_chars=max(context_tokens, 0) * CHARS_PER_TOKEN)
+    tokens['context'] = count_tokens(context)
+
+    text = f"{SYSTEM_TEXT}\n\nRelevant Passages:\n{context}\n\n"
+    if summary:
+        text += f"Earlier in this conversation:\n{summary}\n\n"
+    text += "Chat History:\n" + "".join(history)
+    text += f"\nStudent: {question}\nTutor:"
+    return ChatPrompt(text, tokens, history_start)
+
+
+def pending_turns(document, before_id):
+    """Messages older than ``before_id`` that are not yet in the summary."""
+    summarized_until = ChatSummary.objects.filter(document=document).values_list(
+        'summarized_until', flat=True
+    ).first() or 0
+    return document.messages.filter(id__gt=summarized_until, id__lt=before_id)
+
+
+def update_summary(document, llm, before_id):
+    """Fold turns older than ``before_id`` into the document's running summary.
+
+    Only turns added since the last update are sent to the model. Returns the
+    summary, or None if another worker updated it first.
+    """
+    summary, _ = ChatSummary.objects.get_or_create(document=document)
+    turns = list(document.messages.filter(id__gt=summary.summarized_until, id__lt=before_id))
+    if not turns:
+        return summary
+    prompt = SUMMARY_PROMPT.format(
+        words=settings.CHAT_SUMMARY_TOKENS * 3 // 4,
+        summary=summary.content or "(none yet)",
+        turns="".join(truncate_tokens(format_turn(turn), settings.CHAT_HISTORY_TOKENS) for turn in turns),
+    )
+    content = truncate_tokens(llm.generate(prompt).strip(), settings.CHAT_SUMMARY_TOKENS)
+    # Only apply on top of the summary we read; a concurrent update wins otherwise
+    updated = ChatSummary.objects.filter(pk=summary.pk, summarized_until=summary.summarized_until).update(
+        content=content, summarized_until=turns[-1].id
+    )
+    if not updated:
+        return None
+    summary.refresh_from_db()
+    return summary
+
+
+def schedule_summary(document, llm, prompt):
+    """Queue a summary update once enough turns have dropped out of the prompt."""
+    if prompt.history_start is None:
+        return
+    if pending_turns(document, prompt.history_start).count() < settings.CHAT_SUMMARY_BATCH:
+        return
+    transaction.on_commit(lambda: _executor.submit(_summarize_in_thread, document.pk, llm, prompt.history_start))
+
+
+def _summarize_in_thread(document_id, llm, before_id):
+    try:
+        update_summary(Document.objects.get(pk=document_id), llm, before_id)
+    except Exception:
+        logger.exception("Chat summary update failed for document %s", document_id)
+    finally:
+        connections.close_all()
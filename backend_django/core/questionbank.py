@@ -0,0 +1,324 @@
+"""Per-document bank of generated quiz questions.
+
+Questions are generated a section at a time (the same sections the topic
+ranker uses), validated, de-duplicated by normalised text and stored as
+``BankQuestion`` rows tagged with the section's chunk range. A quiz is a
+random sample from the bank, restricted to the topic's best sections when a
+topic is given. The model is only called when the bank cannot fill the
+request; when it is merely running low it is topped up in the background.
+``asample_quiz`` and ``aiter_quiz`` do the same for the async views without
+holding a thread while the model runs.
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from benchmate_common.structured import QUIZ_SCHEMA, aiter_items, iter_items, parse_items, validate_question
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Q
+
+from .models import BankQuestion, Document
+from .ranking import get_ranker
+from .retrieval import tokenize
+
+logger = logging.getLogger(__name__)
+
+QUESTION_PROMPT = """You are an expert tutor creating a quiz from a course book.
+Generate {count} multiple-choice quiz questions covering the key concepts of the text below.
+Ignore any pricing, publishing info, or preface material.
+Each question should have 4 options (A, B, C, D) with only one correct answer.
+Do NOT mark the correct answer in the option text (e.g., do not write "Option A (Correct)").
+Return the response in JSON format with the following structure:
+{{
+  "questions": [
+    {{
+      "question": "Question text",
+      "options": {{
+        "A": "Option A",
+        "B": "Option B",
+        "C": "Option C",
+        "D": "Option D"
+      }},
+      "correct_answer": "A"
+    }}
+  ]
+}}
+
+Text:
+{text}"""
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='question-bank')
+_pending = set()  # (content_key, topic) refills already queued
+_pending_lock = threading.Lock()
+
+
+def fingerprint(question):
+    return hashlib.sha1(" ".join(tokenize(question)).encode()).hexdigest()
+
+
+def topic_sections(ranker, topic):
+    """Section numbers to draw from: the topic's best matches (none if nothing mentions it), or every section."""
+    if topic:
+        max_sections = max(1, settings.TOPIC_CONTEXT_CHARS // settings.TOPIC_SECTION_CHARS)
+        return [section for section, _ in ranker.rank(topic, k=max_sections)]
+    return list(range(len(ranker.bounds)))
+
+
+def bank_for(document, ranker, sections):
+    if not sections:
+        return BankQuestion.objects.none()
+    query = Q()
+    if len(sections) < len(ranker.bounds):
+        for section in sections:
+            first, last = ranker.bounds[section]
+            query |= Q(first_chunk__lte=int(last), last_chunk__gte=int(first))
+    return BankQuestion.objects.filter(query, content_key=document.content_key)
+
+
+def least_covered(document, ranker, sections):
+    """``sections`` ordered by how few bank questions they have."""
+    counts = dict(
+        BankQuestion.objects.filter(content_key=document.content_key)
+        .values_list('first_chunk')
+        .annotate(count=Count('id'))
+    )
+    return sorted(sections, key=lambda section: counts.get(int(ranker.bounds[section][0]), 0))
+
+
+def section_prompt(document, ranker, section):
+    first, last = ranker.bounds[section]
+    chunks = document.chunks.filter(index__range=(int(first), int(last))).values_list('text', flat=True)
+    return QUESTION_PROMPT.format(count=settings.QUESTION_BANK_PER_SECTION, text="".join(chunks))
+
+
+def bank_row(document, ranker, section, item):
+    first, last = ranker.bounds[section]
+    return BankQuestion(
+        content_key=document.content_key,
+        first_chunk=int(first),
+        last_chunk=int(last),
+        fingerprint=fingerprint(item["question"]),
+        **item,
+    )
+
+
+def plan_fill(document, ranker, sections, needed):
+    """The least-covered of ``sections`` to generate for ``needed`` questions, with their prompts."""
+    per_section = settings.QUESTION_BANK_PER_SECTION
+    batch = least_covered(document, ranker, sections)
+    batch = batch[:min(settings.QUESTION_BANK_FILL_SECTIONS, -(-needed // per_section))]
+    return batch, [section_prompt(document, ranker, section) for section in batch]
+
+
+def parse_batch(document, text):
+    try:
+        return parse_items(text, validate_question)
+    except ValueError:
+        logger.warning("Discarding malformed question batch for %s", document.content_key)
+        return []
+
+
+def store_batches(document, ranker, batch, results):
+    """Store the questions generated for each section of ``batch``; returns how many were new."""
+    rows = {}
+    for section, questions in zip(batch, results):
+        for item in questions:
+            row = bank_row(document, ranker, section, item)
+            rows.setdefault(row.fingerprint, row)
+    before = BankQuestion.objects.filter(content_key=document.content_key).count()
+    BankQuestion.objects.bulk_create(rows.values(), ignore_conflicts=True)
+    return BankQuestion.objects.filter(content_key=document.content_key).count() - before
+
+
+def fill_bank(document, llm, ranker, sections, needed):
+    """Generate questions for the least-covered of ``sections`` until ``needed`` are added.
+
+    Sections are generated in parallel; returns the number of new questions stored.
+    """
+    batch, prompts = plan_fill(document, ranker, sections, needed)
+    if not batch:
+        return 0
+
+    def generate(prompt):
+        return parse_batch(document, llm.generate(prompt, schema=QUIZ_SCHEMA))
+
+    with ThreadPoolExecutor(max_workers=len(batch)) as pool:
+        results = list(pool.map(generate, prompts))
+    return store_batches(document, ranker, batch, results)
+
+
+async def afill_bank(document, llm, ranker, sections, needed):
+    """Async ``fill_bank``: the sections are generated concurrently with ``llm.agenerate``."""
+    batch, prompts = await sync_to_async(plan_fill)(document, ranker, sections, needed)
+    if not batch:
+        return 0
+
+    async def generate(prompt):
+        return parse_batch(document, await llm.agenerate(prompt, schema=QUIZ_SCHEMA))
+
+    results = await asyncio.gather(*(generate(prompt) for prompt in prompts))
+    return await sync_to_async(store_batches)(document, ranker, batch, results)
+
+
+def schedule_fill(document, llm, topic, needed):
+    """Top up the bank in the background, at most one queued refill per document and topic."""
+    key = (document.content_key, topic)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    _executor.submit(_fill_in_thread, document.pk, llm, topic, needed, key)
+
+
+def _fill_in_thread(document_id, llm, topic, needed, key):
+    try:
+        document = Document.objects.get(pk=document_id)
+        ranker = get_ranker(document)
+        fill_bank(document, llm, ranker, topic_sections(ranker, topic), needed)
+    except Exception:
+        logger.exception("Question bank refill failed for document %s", document_id)
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+        connections.close_all()
+
+
+def plan_quiz(document, llm, num_questions, topic, fresh):
+    """``(ranker, sections, bank, needed)`` for a quiz: ``needed`` questions must be generated first.
+
+    A bank that can serve the quiz but is running low is topped up in the background.
+    """
+    ranker = get_ranker(document)
+    sections = topic_sections(ranker, topic)
+    bank = bank_for(document, ranker, sections)
+    available = bank.count()
+    needed = num_questions if fresh else max(num_questions - available, 0)
+    if not needed and available < num_questions * settings.QUESTION_BANK_REFILL_FACTOR:
+        schedule_fill(document, llm, topic, num_questions)
+    return ranker, sections, bank, needed
+
+
+def fill_key(document, sections, fresh):
+    return ('question-bank', document.content_key, tuple(sections), fresh)
+
+
+def pick_questions(bank, num_questions):
+    """Up to ``num_questions`` random rows of ``bank``."""
+    ids = list(bank.values_list('id', flat=True))
+    chosen = random.sample(ids, min(num_questions, len(ids)))
+    questions = BankQuestion.objects.in_bulk(chosen)
+    return [questions[pk] for pk in chosen]
+
+
+def sample_quiz(document, llm, num_questions, topic='', fresh=False, flight=None):
+    """Return ``(questions, generated)`` with up to ``num_questions`` questions from the bank.
+
+    ``generated`` is True if the model had to be called before serving.
+    ``fresh`` forces new questions to be generated first. With a ``flight``,
+    concurrent requests that need the same sections filled share one fill.
+    """
+    ranker, sections, bank, needed = plan_quiz(document, llm, num_questions, topic, fresh)
+    generated = False
+    if needed:
+        def fill():
+            return fill_bank(document, llm, ranker, sections, needed)
+
+        if flight is None:
+            fill()
+            generated = True
+        else:
+            recheck = None if fresh else lambda: bank.count() >= num_questions or None
+            _, shared = flight.do(fill_key(document, sections, fresh), fill, recheck=recheck)
+            generated = not shared
+    return [question.as_dict() for question in pick_questions(bank, num_questions)], generated
+
+
+async def asample_quiz(document, llm, num_questions, topic='', fresh=False, flight=None):
+    """Async ``sample_quiz``, for the async views: the fill awaits ``afill_bank``, the bank is read in a thread."""
+    ranker, sections, bank, needed = await sync_to_async(plan_quiz)(document, llm, num_questions, topic, fresh)
+    generated = False
+    if needed:
+        async def fill():
+            return await afill_bank(document, llm, ranker, sections, needed)
+
+        if flight is None:
+            await fill()
+            generated = True
+        else:
+            recheck = None if fresh else bank_recheck(bank, num_questions)
+            _, shared = await flight.ado(fill_key(document, sections, fresh), fill, recheck=recheck)
+            generated = not shared
+    questions = await sync_to_async(pick_questions)(bank, num_questions)
+    return [question.as_dict() for question in questions], generated
+
+
+def bank_recheck(bank, num_questions):
+    """Recheck for ``SingleFlight.ado``, which runs it on an executor thread."""
+    def recheck():
+        try:
+            return bank.count() >= num_questions or None
+        finally:
+            connections.close_all()  # the executor thread's own connection
+    return recheck
+
+
+def plan_stream(document, num_questions, topic, fresh):
+    """``(ranker, banked, sections)`` for a streamed quiz: bank rows to serve first, then the sections to generate."""
+    ranker = get_ranker(document)
+    sections = topic_sections(ranker, topic)
+    banked = [] if fresh else pick_questions(bank_for(document, ranker, sections), num_questions)
+    return ranker, banked, least_covered(document, ranker, sections)[:settings.QUESTION_BANK_FILL_SECTIONS]
+
+
+def store_streamed(document, ranker, section, item, served):
+    """Store one streamed question in the bank; False if it is already in ``served``."""
+    row = bank_row(document, ranker, section, item)
+    BankQuestion.objects.bulk_create([row], ignore_conflicts=True)
+    if row.fingerprint in served:
+        return False
+    served.add(row.fingerprint)
+    return True
+
+
+def iter_quiz(document, llm, num_questions, topic='', fresh=False):
+    """Yield ``(question, generated)`` for a quiz, streaming new questions as the model writes them.
+
+    Bank questions come first (none when ``fresh``). If they are not enough,
+    the least-covered matching sections are generated one at a time; each
+    validated question is stored in the bank and yielded as soon as it has
+    been parsed. The section in progress is read to the end so its questions
+    all reach the bank, so more than ``num_questions`` may be yielded.
+    """
+    ranker, banked, sections = plan_stream(document, num_questions, topic, fresh)
+    served = {question.fingerprint for question in banked}
+    for question in banked:
+        yield question.as_dict(), False
+
+    for section in sections:
+        if len(served) >= num_questions:
+            return
+        chunks = llm.stream(section_prompt(document, ranker, section), schema=QUIZ_SCHEMA)
+        for item in iter_items(chunks, validate_question):
+            if store_streamed(document, ranker, section, item, served):
+                yield item, True
+
+
+async def aiter_quiz(document, llm, num_questions, topic='', fresh=False):
+    """Async ``iter_quiz``, for the async stream views: sections are read with ``llm.astream``."""
+    ranker, banked, sections = await sync_to_async(plan_stream)(document, num_questions, topic, fresh)
+    served = {question.fingerprint for question in banked}
+    for question in banked:
+        yield question.as_dict(), False
+
+    for section in sections:
+        if len(served) >= num_questions:
+            return
+        prompt = await sync_to_async(section_prompt)(document, ranker, section)
+        async for item in aiter_items(llm.astream(prompt, schema=QUIZ_SCHEMA), validate_question):
+            if await sync_to_async(store_streamed)(document, ranker, section, item, served):
+                yield item, True
@@ -0,0 +1,131 @@
+"""TF-IDF ranking of document sections for topic-scoped generation.
+
+A section is a run of consecutive chunks of up to ``TOPIC_SECTION_CHARS``
+characters. Each document gets a sparse, L2-normalised sections x terms
+TF-IDF matrix, computed once and cached next to the BM25 index. A topic is
+scored against every section with a single sparse matrix-vector product.
+"""
+import os
+import tempfile
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+from .retrieval import tokenize
+
+
+class SectionRanker:
+    def __init__(self, matrix, vocabulary, idf, bounds):
+        self.matrix = matrix  # csr_matrix, one L2-normalised row per section
+        self.vocabulary = vocabulary  # term -> column
+        self.idf = idf
+        self.bounds = bounds  # (first_chunk_index, last_chunk_index) per section
+
+    @classmethod
+    def build(cls, sections, bounds):
+        vocabulary = {}
+        counts = [Counter(tokenize(text)) for text in sections]
+        for section_counts in counts:
+            for term in section_counts:
+                vocabulary.setdefault(term, len(vocabulary))
+
+        indptr = [0]
+        indices, data = [], []
+        for section_counts in counts:
+            indices.extend(vocabulary[term] for term in section_counts)
+            data.extend(section_counts.values())
+            indptr.append(len(indices))
+        shape = (len(sections), len(vocabulary))
+        tf = sparse.csr_matrix((np.asarray(data, dtype=np.float32), indices, indptr), shape=shape)
+
+        df = np.bincount(tf.indices, minlength=shape[1])
+        idf = (np.log((1 + shape[0]) / (1 + df)) + 1).astype(np.float32)
+        tf.data = 1 + np.log(tf.data)  # sublinear term frequency
+        matrix = tf @ sparse.diags(idf)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix = sparse.csr_matrix(sparse.diags(1 / norms) @ matrix, dtype=np.float32)
+        return cls(matrix, vocabulary, idf, np.asarray(bounds, dtype=np.int64).reshape(-1, 2))
+
+    def rank(self, query, k=3):
+        """Return up to ``k`` ``(section, score)`` pairs with a positive score, best first."""
+        columns = [self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary]
+        if not columns or self.matrix.shape[0] == 0:
+            return []
+        query_vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        np.add.at(query_vector, columns, 1)
+        query_vector[columns] = (1 + np.log(query_vector[columns])) * self.idf[columns]
+        scores = self.matrix @ query_vector
+        top = np.argsort(-scores, kind='stable')[:k]
+        return [(int(section), float(scores[section])) for section in top if scores[section] > 0]
+
+    def save(self, path):
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        with tempfile.NamedTemporaryFile(dir=Path(path).parent, suffix=".tmp", delete=False) as tmp:
+            np.savez_compressed(
+                tmp,
+                data=self.matrix.data,
+                indices=self.matrix.indices,
+                indptr=self.matrix.indptr,
+                shape=np.asarray(self.matrix.shape),
+                terms=np.asarray(terms, dtype=str),
+                idf=self.idf,
+                bounds=self.bounds,
+            )
+        os.replace(tmp.name, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            matrix = sparse.csr_matrix(
+                (arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(arrays['shape'])
+            )
+            vocabulary = {term: column for column, term in enumerate(arrays['terms'].tolist())}
+            return cls(matrix, vocabulary, arrays['idf'], arrays['bounds'])
+
+
+def split_sections(chunks, section_chars=None):
+    """Group ``(index, text)`` chunks into sections; return ``(texts, bounds)``."""
+    section_chars = section_chars or settings.TOPIC_SECTION_CHARS
+    texts, bounds = [], []
+    current, first, size = [], None, 0
+    for index, text in chunks:
+        if current and size + len(text) > section_chars:
+            texts.append("".join(current))
+            bounds.append((first, last))
+            current, size = [], 0
+        if not current:
+            first = index
+        current.append(text)
+        size += len(text)
+        last = index
+    if current:
+        texts.append("".join(current))
+        bounds.append((first, last))
+    return texts, bounds
+
+
+def ranker_path(document):
+    return Path(settings.INDEX_ROOT) / f"{document.content_key}.tfidf.npz"
+
+
+@lru_cache(maxsize=32)
+def _load(path, mtime):
+    return SectionRanker.load(path)
+
+
+def get_ranker(document):
+    """Load the document's section ranker, computing and caching it on first use."""
+    path = ranker_path(document)
+    if path.exists():
+        return _load(str(path), path.stat().st_mtime)
+    texts, bounds = split_sections(document.chunks.values_list('index', 'text').iterator(chunk_size=500))
+    ranker = SectionRanker.build(texts, bounds)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ranker.save(path)
+    return ranker
+
@@ -0,0 +1,140 @@
+"""BM25 retrieval over a document's chunks.
+
+Each document gets an inverted index (term -> chunk postings) built at
+ingestion and persisted under ``settings.INDEX_ROOT``, keyed by content hash
+so deduplicated uploads share one index file. Chat turns query it for the
+best-scoring chunks and only those chunks are loaded from the database.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import tempfile
+import zlib
+from collections import Counter, defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in into is it its "
+    "of on or our she so such than that the their them then there these they this to "
+    "was we were what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, postings, lengths, k1=1.5, b=0.75):
+        self.postings = postings  # term -> (chunk indexes, term frequencies)
+        self.lengths = lengths  # tokens per chunk
+        self.k1 = k1
+        self.b = b
+        self.avgdl = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    @classmethod
+    def build(cls, texts, **params):
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for chunk_index, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                ids, tfs = postings[term]
+                ids.append(chunk_index)
+                tfs.append(tf)
+        return cls(dict(postings), lengths, **params)
+
+    def idf(self, term):
+        df = len(self.postings[term][0])
+        return math.log(1 + (len(self.lengths) - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=10):
+        """Return up to ``k`` ``(chunk_index, score)`` pairs, best first."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            idf = self.idf(term)
+            ids, tfs = self.postings[term]
+            for chunk_index, tf in zip(ids, tfs):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_index] / self.avgdl)
+                scores[chunk_index] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def to_bytes(self):
+        payload = {"k1": self.k1, "b": self.b, "lengths": self.lengths, "postings": self.postings}
+        return zlib.compress(json.dumps(payload, separators=(",", ":")).encode())
+
+    @classmethod
+    def from_bytes(cls, data):
+        payload = json.loads(zlib.decompress(data))
+        postings = {term: tuple(entry) for term, entry in payload["postings"].items()}
+        return cls(postings, payload["lengths"], k1=payload["k1"], b=payload["b"])
+
+
+def index_path(document):
+    return Path(settings.INDEX_ROOT) / f"{document.content_key}.bm25"
+
+
+@lru_cache(maxsize=32)
+def _load(path, mtime):
+    return BM25Index.from_bytes(Path(path).read_bytes())
+
+
+def build_index(document, texts=None):
+    """Build and persist the document's index from its chunk texts."""
+    if texts is None:
+        texts = list(document.chunks.values_list('text', flat=True))
+    index = BM25Index.build(texts)
+    path = index_path(document)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write-then-rename so concurrent readers never see a partial file
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as tmp:
+        tmp.write(index.to_bytes())
+    os.replace(tmp.name, path)
+    return index
+
+
+def get_index(document):
+    """Load the document's index, building it first for documents ingested before indexing."""
+    path = index_path(document)
+    if not path.exists():
+        return build_index(document)
+    return _load(str(path), path.stat().st_mtime)
+
+
+def retrieve_context(document, query, budget_chars=None, top_k=None):
+    """Return the chunks most relevant to ``query`` that fit in ``budget_chars``, in reading order."""
+    budget_chars = budget_chars or settings.RETRIEVAL_CONTEXT_CHARS
+    top_k = top_k or settings.RETRIEVAL_TOP_K
+    hits = get_index(document).search(query, k=top_k)
+    if not hits:
+        return document.get_text(max_chars=budget_chars)
+
+    chunks = {
+        chunk.index: chunk
+        for chunk in document.chunks.filter(index__in=[chunk_index for chunk_index, _ in hits])
+    }
+    selected, used = [], 0
+    for chunk_index, _ in hits:
+        chunk = chunks.get(chunk_index)
+        if chunk is None or used + len(chunk.text) > budget_chars:
+            continue
+        selected.append(chunk)
+        used += len(chunk.text)
+
+    if not selected:
+        return document.get_text(max_chars=budget_chars)
+
+    selected.sort(key=lambda chunk: chunk.index)
+    return "\n\n".join(
+        f"[Page {chunk.page_number}]\n{chunk.text.strip()}" if chunk.page_number else chunk.text.strip()
+        for chunk in selected
+    )
@@ -1,10 +1,34 @@
 from rest_framework import serializers
-from .models import Document, ChatMessage, Note
+from .models import Document, ChatMessage, Note, IngestionJob, Quiz, Question, FlashcardDeck, Flashcard
 
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
-        fields = ('id', 'file', 'uploaded_at', 'extracted_text')
+        fields = ('id', 'file', 'filename', 'uploaded_at', 'status')
+
+class DocumentListSerializer(serializers.ModelSerializer):
+    """Metadata only; ``?fields=id,filename`` on the request limits the output to those fields."""
+    pages = serializers.IntegerField(source='page_count', read_only=True)
+    size = serializers.IntegerField(source='file_size', read_only=True)
+
+    # Model fields the serializer reads, for .only()
+    model_fields = ('id', 'filename', 'page_count', 'file_size', 'uploaded_at', 'status', 'updated_at')
+
+    class Meta:
+        model = Document
+        fields = ('id', 'filename', 'pages', 'size', 'uploaded_at', 'status')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request.query_params.get('fields') if request is not None else None
+        if requested:
+            wanted = {name.strip() for name in requested.split(',') if name.strip()}
+            unknown = wanted - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError({"error": f"Unknown fields: {', '.join(sorted(unknown))}"})
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
 
 class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,3 +40,38 @@ class NoteSerializer(serializers.ModelSerializer):
         model = Note
         fields = ('content', 'updated_at')
         read_only_fields = ('extracted_text', 'created_at')
+
+class IngestionJobSerializer(serializers.ModelSerializer):
+    pdf_id = serializers.IntegerField(source='document_id', read_only=True)
+
+    class Meta:
+        model = IngestionJob
+        fields = ('id', 'pdf_id', 'state', 'pages_done', 'pages_total', 'error', 'created_at', 'updated_at')
+
+class QuestionSerializer(serializers.ModelSerializer):
+    question = serializers.CharField(source='text')
+
+    class Meta:
+        model = Question
+        fields = ('id', 'index', 'question', 'options', 'correct_answer')
+
+class QuizSerializer(serializers.ModelSerializer):
+    pdf_id = serializers.IntegerField(source='document_id', read_only=True)
+    questions = QuestionSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Quiz
+        fields = ('id', 'pdf_id', 'topic', 'created_at', 'questions')
+
+class FlashcardSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Flashcard
+        fields = ('id', 'index', 'front', 'back')
+
+class FlashcardDeckSerializer(serializers.ModelSerializer):
+    pdf_id = serializers.IntegerField(source='document_id', read_only=True)
+    flashcards = FlashcardSerializer(source='cards', many=True, read_only=True)
+
+    class Meta:
+        model = FlashcardDeck
+        fields = ('id', 'pdf_id', 'created_at', 'flashcards')
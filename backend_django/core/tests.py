@@ -1,3 +1,883 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from benchmate_common.extraction import extract_pdf
+from benchmate_common.generation_cache import create_cache
+from benchmate_common.llm_client import LLMClient, StubBackend
+from gamification.models import QuizResult
+from users.models import User
+from .chunking import save_chunks
+from .jobs import process_job
+from .models import (
+    BankQuestion, ChatMessage, Document, DocumentChunk, Flashcard, FlashcardDeck, IngestionJob, Quiz, UploadSession,
+)
+from .prompting import build_chat_prompt, count_tokens, pending_turns, update_summary
+from .questionbank import topic_sections
+from .ranking import SectionRanker, get_ranker
+from .retrieval import BM25Index, build_index, retrieve_context
+from .upload_sessions import remove_stale
+from .views import (
+    AsyncChatStreamView, AsyncChatView, AsyncGenerateFlashcardsView, AsyncGenerateQuizView, ChatStreamView,
+    GenerateQuizView,
+)
+
+
+def synthetic_corpus(num_chunks, words_per_chunk=300, seed=0):
+    """Random filler chunks plus one planted 'needle' term set per 100 chunks."""
+    rng = random.Random(seed)
+    vocab = [f"w{n}" for n in range(20000)]
+    chunks = [" ".join(rng.choices(vocab, k=words_per_chunk)) for _ in range(num_chunks)]
+    needles = {}
+    for chunk_index in range(0, num_chunks, 100):
+        terms = [f"needle{chunk_index}a", f"needle{chunk_index}b", rng.choice(vocab)]
+        chunks[chunk_index] += " " + " ".join(terms * 2)
+        needles[chunk_index] = " ".join(terms)
+    return chunks, needles
+
+
+def make_pdf(pages):
+    """A minimal PDF whose page ``n`` (from 1) reads "Page n of the biology notes"."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(1, pages + 1):
+        stream = b"BT /F1 12 Tf 72 720 Td (Page %d of the biology notes) Tj ET" % number
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def authed_post(user, path, data):
+    """A JSON POST request authenticated as ``user``, for calling a view directly."""
+    request = APIRequestFactory().post(path, data, format='json')
+    force_authenticate(request, user=user)
+    return request
+
+
+def sse_events(body):
+    return [line[len("event: "):] for line in body.decode().split("\n") if line.startswith("event:")]
+
+
+async def read_stream(response):
+    return b"".join([part async for part in response.streaming_content])
+
+
+class BM25IndexTests(SimpleTestCase):
+    def test_planted_passages_are_retrieved_from_large_corpus(self):
+        chunks, needles = synthetic_corpus(5000)
+
+        started = time.perf_counter()
+        index = BM25Index.build(chunks)
+        build_seconds = time.perf_counter() - started
+
+        found = sum(
+            chunk_index in [hit for hit, _ in index.search(query, k=3)]
+            for chunk_index, query in needles.items()
+        )
+        self.assertGreaterEqual(found / len(needles), 0.95)
+        # 5000 chunks (~1.5M tokens, a large textbook) must index well within an upload
+        self.assertLess(build_seconds, 15)
+
+    def test_round_trip_preserves_scores(self):
+        chunks, needles = synthetic_corpus(300, seed=1)
+        index = BM25Index.build(chunks)
+        restored = BM25Index.from_bytes(index.to_bytes())
+        query = needles[200]
+        self.assertEqual(index.search(query, k=5), restored.search(query, k=5))
+
+
+class RetrieveContextTests(TestCase):
+    def setUp(self):
+        self.index_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_root)
+        user = User.objects.create_user('student', password='pw')
+        self.document = Document.objects.create(user=user, file='pdfs/book.pdf', content_hash='abc')
+        pages = [f"Filler page {n} about nothing in particular. " * 50 for n in range(40)]
+        pages[27] = "Chapter 12 covers photosynthesis and chlorophyll in plant cells."
+        save_chunks(self.document, pages)
+
+    def test_returns_relevant_page_within_budget(self):
+        with override_settings(INDEX_ROOT=self.index_root):
+            build_index(self.document)
+            context = retrieve_context(self.document, "What is chlorophyll?", budget_chars=500)
+        self.assertIn("[Page 28]", context)
+        self.assertIn("chlorophyll", context)
+        self.assertLessEqual(len(context), 500 + len("[Page 28]\n"))
+
+
+class DocumentChunkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='pw')
+
+    def test_documents_with_the_same_bytes_share_one_chunk_set(self):
+        first = Document.objects.create(user=self.user, file='pdfs/book.pdf', content_hash='same')
+        save_chunks(first, ["Page one.", "Page two."])
+        second = Document.objects.create(user=self.user, file='pdfs/book.pdf', content_hash='same')
+        self.assertEqual(second.get_text(), "Page one.\nPage two.\n")
+        self.assertEqual(DocumentChunk.objects.count(), 2)
+
+        # The second extraction of the same bytes keeps the stored rows
+        ids = list(DocumentChunk.objects.values_list('id', flat=True))
+        self.assertEqual([chunk.id for chunk in save_chunks(second, ["Page one.", "Page two."])], ids)
+
+        first.delete()
+        self.assertEqual(second.get_text(), "Page one.\nPage two.\n")
+        second.delete()
+        self.assertFalse(DocumentChunk.objects.exists())
+
+    def test_last_document_takes_its_bank_and_indexes_along(self):
+        index_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_root)
+        with override_settings(INDEX_ROOT=index_root):
+            documents = [Document.objects.create(user=self.user, file='pdfs/book.pdf', content_hash='gone')
+                         for _ in range(2)]
+            build_index(documents[0], [chunk.text for chunk in save_chunks(documents[0], ["Cells divide."])])
+            get_ranker(documents[0])
+            BankQuestion.objects.create(content_key='gone', first_chunk=0, last_chunk=0, question='Why?',
+                                        options={}, correct_answer='A', fingerprint='f')
+            files = sorted(os.listdir(index_root))
+            self.assertEqual(files, ['gone.bm25', 'gone.tfidf.npz'])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                documents[0].delete()
+            self.assertEqual(sorted(os.listdir(index_root)), files)
+            self.assertTrue(BankQuestion.objects.exists())
+
+            with self.captureOnCommitCallbacks(execute=True):
+                documents[1].delete()
+            self.assertEqual(os.listdir(index_root), [])
+            self.assertFalse(BankQuestion.objects.exists() or DocumentChunk.objects.exists())
+
+    def test_text_is_reassembled_from_chunks(self):
+        document = Document.objects.create(user=self.user, file='pdfs/book.pdf', content_hash='pages')
+        pages = ["Short first page.", "word " * 30, "Last page."]
+        with override_settings(DOCUMENT_CHUNK_SIZE=40):
+            chunks = save_chunks(document, pages)
+        full = "".join(page + "\n" for page in pages)
+        self.assertGreater(len(chunks), len(pages))  # the long page was split
+        self.assertEqual([chunk.page_number for chunk in chunks][-1], 3)
+        self.assertEqual(document.get_text(), full)
+        self.assertEqual(document.get_text(max_chars=25), full[:25])
+        self.assertEqual(document.get_text_range(30, 95), full[30:95])
+        self.assertEqual(document.get_text_range(len(full), len(full) + 10), "")
+
+
+class DocumentChunkMigrationTests(TransactionTestCase):
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def test_extracted_text_is_backfilled_into_chunks(self):
+        self.addCleanup(call_command, 'migrate', verbosity=0)
+        apps = self.migrate(('core', '0005_ingestionjob_document_status'))
+        user = apps.get_model('users', 'User').objects.create(username='student')
+        text = "x" * 4500
+        old_document = apps.get_model('core', 'Document').objects.create(user_id=user.pk, file='pdfs/book.pdf',
+                                                                          extracted_text=text)
+
+        self.migrate(('core', '0006_documentchunk'))
+        self.migrate(('core', '0013_documentchunk_content_key'))
+        document = Document.objects.get(pk=old_document.pk)
+        self.assertEqual(list(document.chunks.values_list('start_offset', 'end_offset', 'page_number')),
+                         [(0, 2000, None), (2000, 4000, None), (4000, 4500, None)])
+        self.assertEqual(document.get_text(), text)
+
+
+class SectionRankerTests(TestCase):
+    def setUp(self):
+        self.index_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_root)
+        user = User.objects.create_user('student', password='pw')
+        self.document = Document.objects.create(user=user, file='pdfs/book.pdf', content_hash='def')
+        pages = [f"Chapter {n}: general revision notes and exercises. " * 60 for n in range(30)]
+        pages[21] = "Chapter 22: electromagnetic induction, Faraday's law and transformers. " * 40
+        save_chunks(self.document, pages)
+
+    def test_topic_selects_matching_chapter(self):
+        with override_settings(INDEX_ROOT=self.index_root, TOPIC_SECTION_CHARS=4000, TOPIC_CONTEXT_CHARS=4000):
+            ranker = get_ranker(self.document)
+            [section] = topic_sections(ranker, "Faraday induction")
+            # Served from the on-disk cache the second time
+            self.assertEqual(topic_sections(get_ranker(self.document), "Faraday induction"), [section])
+        first, last = ranker.bounds[section]
+        text = "".join(self.document.chunks.filter(index__range=(int(first), int(last))).values_list('text', flat=True))
+        self.assertIn("Chapter 22: electromagnetic induction", text)
+
+    def test_unknown_topic_matches_no_section(self):
+        with override_settings(INDEX_ROOT=self.index_root):
+            ranker = get_ranker(self.document)
+            self.assertEqual(topic_sections(ranker, "thermodynamics"), [])
+            self.assertEqual(topic_sections(ranker, ""), list(range(len(ranker.bounds))))
+
+    def test_save_and_load_round_trip(self):
+        ranker = SectionRanker.build(["alpha beta", "gamma delta delta"], [(0, 0), (1, 1)])
+        path = f"{self.index_root}/ranker.npz"
+        ranker.save(path)
+        self.assertEqual(SectionRanker.load(path).rank("delta"), ranker.rank("delta"))
+
+
+class GenerationCacheViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='pw')
+        self.document = Document.objects.create(user=self.user, file='pdfs/book.pdf', content_hash='ghi')
+        save_chunks(self.document, ["Cells are the basic unit of life."])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stub = StubBackend(latency=0, response='```json\n{"flashcards": [{"front": "Cell", "back": "Unit of life"}]}\n```')
+        self.cache = create_cache('memory')
+        patcher = mock.patch.multiple('core.views', llm=LLMClient(self.stub), generation_cache=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_flashcard_request_is_served_from_cache(self):
+        payload = {'pdf_id': self.document.id, 'num_cards': 3}
+        first = self.client.post('/api/core/generate/flashcards/', payload, format='json')
+        second = self.client.post('/api/core/generate/flashcards/', payload, format='json')
+        self.assertEqual(self.stub.calls, 1)
+        self.assertFalse(first.data['cached'])
+        self.assertEqual(first.data['flashcards']['flashcards'][0]['front'], 'Cell')
+        self.assertEqual(second.data['cached'], True)
+        self.assertEqual(FlashcardDeck.objects.filter(document=self.document).count(), 2)
+
+        self.client.post('/api/core/generate/flashcards/', {**payload, 'num_cards': 4}, format='json')
+        self.client.post('/api/core/generate/flashcards/', {**payload, 'fresh': True}, format='json')
+        self.assertEqual(self.stub.calls, 3)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_num_cards_is_validated_and_clamped(self):
+        response = self.client.post('/api/core/generate/flashcards/',
+                                    {'pdf_id': self.document.id, 'num_cards': 'lots'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        prompts = []
+        answer = self.stub.response
+        self.stub.response = lambda prompt: prompts.append(prompt) or answer
+        self.client.post('/api/core/generate/flashcards/', {'pdf_id': self.document.id, 'num_cards': 5000},
+                         format='json')
+        self.assertIn('Generate 50 flashcards', prompts[0])
+
+    async def test_async_streamed_flashcards_fill_and_use_the_cache(self):
+        view = AsyncGenerateFlashcardsView.as_view(stream=True)
+        payload = {'pdf_id': self.document.id, 'num_cards': 3}
+        for cached in (False, True):
+            response = await view(authed_post(self.user, '/api/core/generate/flashcards/stream/', payload))
+            body = await read_stream(response)
+            self.assertEqual(sse_events(body), ["card", "done"])
+            self.assertIn(f'"cached": {json.dumps(cached)}', body.decode())
+        self.assertEqual(self.stub.calls, 1)
+        self.assertEqual(await Flashcard.objects.filter(deck__document=self.document).acount(), 2)
+
+
+def question_batch(prompt):
+    """Stub model answer: eight distinct questions naming the section's subject."""
+    subject = "photosynthesis" if "photosynthesis" in prompt.lower() else "filler"
+    question_batch.calls += 1
+    return "```json\n" + json.dumps({"questions": [
+        {
+            "question": f"{subject} question {question_batch.calls}-{n}",
+            "options": {"A": "a", "B": "b", "C": "c", "D": "d"},
+            "correct_answer": "B",
+        }
+        for n in range(8)
+    ] + [{"question": "Missing options", "correct_answer": "A"}]}) + "\n```"
+
+
+@override_settings(TOPIC_SECTION_CHARS=4000, TOPIC_CONTEXT_CHARS=4000, QUESTION_BANK_PER_SECTION=8)
+class QuestionBankTests(TestCase):
+    def setUp(self):
+        index_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_root)
+        settings_patcher = override_settings(INDEX_ROOT=index_root)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        self.user = User.objects.create_user('student', password='pw')
+        self.document = Document.objects.create(user=self.user, file='pdfs/book.pdf', content_hash='pqr')
+        pages = [f"Filler page {n} about nothing in particular. " * 50 for n in range(20)]
+        pages[12] = "Photosynthesis turns light into chemical energy. " * 20
+        save_chunks(self.document, pages)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        question_batch.calls = 0
+        self.stub = StubBackend(latency=0, response=question_batch)
+        patcher = mock.patch('core.views.llm', LLMClient(self.stub))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        schedule_patcher = mock.patch('core.questionbank.schedule_fill')
+        self.schedule_fill = schedule_patcher.start()
+        self.addCleanup(schedule_patcher.stop)
+
+    def quiz(self, **payload):
+        response = self.client.post(
+            '/api/core/generate/quiz/', {'pdf_id': self.document.id, **payload}, format='json'
+        )
+        return response, response.data['quiz']['questions']
+
+    def test_quizzes_are_sampled_from_the_bank(self):
+        response, questions = self.quiz(num_questions=5)
+        self.assertFalse(response.data['cached'])
+        self.assertEqual(len(questions), 5)
+        calls = self.stub.calls
+        self.assertEqual(BankQuestion.objects.filter(content_key='pqr').count(), 8 * calls)
+
+        for _ in range(3):
+            response, questions = self.quiz(num_questions=5)
+            self.assertTrue(response.data['cached'])
+            self.assertEqual(len(questions), 5)
+        self.assertEqual(self.stub.calls, calls)
+
+    def test_running_low_schedules_a_background_refill(self):
+        self.quiz(num_questions=5)
+        self.quiz(num_questions=5)
+        self.schedule_fill.assert_called_once()
+
+    def test_topic_quiz_draws_from_matching_section(self):
+        self.quiz(num_questions=20)
+        response, questions = self.quiz(num_questions=3, topic='photosynthesis')
+        self.assertEqual(len(questions), 3)
+        self.assertTrue(all(q['question'].startswith('photosynthesis') for q in questions))
+
+    def test_topic_matching_nothing_is_rejected(self):
+        response = self.client.post('/api/core/generate/quiz/',
+                                    {'pdf_id': self.document.id, 'topic': 'thermodynamics'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        response = GenerateQuizView.as_view(stream=True)(authed_post(
+            self.user, '/api/core/generate/quiz/stream/', {'pdf_id': self.document.id, 'topic': 'thermodynamics'}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.stub.calls, 0)
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_quiz_is_persisted(self):
+        response, questions = self.quiz(num_questions=4)
+        quiz = Quiz.objects.get(pk=response.data['quiz']['id'])
+        self.assertEqual([q.text for q in quiz.questions.all()], [q['question'] for q in questions])
+
+    def stream_request(self):
+        return authed_post(self.user, '/api/core/generate/quiz/stream/', {'pdf_id': self.document.id, 'num_questions': 3})
+
+    def test_streamed_quiz_sends_questions_as_they_are_parsed(self):
+        response = GenerateQuizView.as_view(stream=True)(self.stream_request())
+        self.assertEqual(sse_events(b"".join(response.streaming_content)), ["question"] * 3 + ["done"])
+        self.assertEqual(Quiz.objects.get().questions.count(), 3)
+        # The whole section went into the bank, not just the three questions served
+        self.assertEqual(BankQuestion.objects.filter(content_key='pqr').count(), 8)
+
+    async def test_async_streamed_quiz_sends_questions_as_they_are_parsed(self):
+        response = await AsyncGenerateQuizView.as_view(stream=True)(self.stream_request())
+        self.assertTrue(response.is_async)
+        self.assertEqual(sse_events(await read_stream(response)), ["question"] * 3 + ["done"])
+        quiz = await Quiz.objects.aget()
+        self.assertEqual(await quiz.questions.acount(), 3)
+        self.assertEqual(await BankQuestion.objects.filter(content_key='pqr').acount(), 8)
+
+    def test_duplicate_questions_are_stored_once(self):
+        answer = question_batch("filler")
+        self.stub.response = lambda prompt: answer
+        self.quiz(num_questions=5, fresh=True)
+        self.quiz(num_questions=5, fresh=True)
+        self.assertEqual(BankQuestion.objects.filter(content_key='pqr').count(), 8)
+
+
+class ChatStreamTests(TestCase):
+    def setUp(self):
+        index_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_root)
+        settings_patcher = override_settings(INDEX_ROOT=index_root, CHAT_STREAM_CHECKPOINT_SECONDS=0)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        self.user = User.objects.create_user('student', password='pw')
+        self.document = Document.objects.create(user=self.user, file='pdfs/book.pdf', content_hash='jkl')
+        save_chunks(self.document, ["Mitochondria produce energy for the cell."])
+        self.stub = StubBackend(latency=0, response='Mitochondria are the powerhouse of the cell.')
+        patcher = mock.patch('core.views.llm', LLMClient(self.stub))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self):
+        return authed_post(
+            self.user, '/api/core/chat/stream/', {'pdf_id': self.document.id, 'message': 'What do mitochondria do?'}
+        )
+
+    def post(self):
+        return ChatStreamView.as_view()(self.request())
+
+    def test_streams_tokens_and_saves_the_answer(self):
+        response = self.post()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual(body.count("event: token"), 7)
+        self.assertIn("event: done", body)
+        answer = ChatMessage.objects.get(document=self.document, role='assistant')
+        self.assertEqual(answer.content, 'Mitochondria are the powerhouse of the cell.')
+
+    def test_disconnect_keeps_partial_answer(self):
+        response = self.post()
+        stream = iter(response.streaming_content)
+        next(stream)
+        next(stream)
+        response.close()  # what the server does when the client goes away
+        answer = ChatMessage.objects.get(document=self.document, role='assistant')
+        self.assertEqual(answer.content, 'Mitochondria are')
+
+    async def test_async_view_streams_tokens_and_saves_the_answer(self):
+        response = await AsyncChatStreamView.as_view()(self.request())
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.is_async)
+        events = sse_events(await read_stream(response))
+        self.assertEqual(events, ["token"] * 7 + ["done"])
+        answer = await ChatMessage.objects.aget(document=self.document, role='assistant')
+        self.assertEqual(answer.content, 'Mitochondria are the powerhouse of the cell.')
+
+    async def test_async_disconnect_keeps_partial_answer(self):
+        self.stub.token_delay = 0.05
+        response = await AsyncChatStreamView.as_view()(self.request())
+        parts = []
+        received = asyncio.Event()
+
+        async def consume():
+            async for part in response.streaming_content:
+                parts.append(part)
+                if len(parts) == 2:
+                    received.set()
+
+        task = asyncio.create_task(consume())
+        await received.wait()
+        task.cancel()  # what the ASGI handler does when the client goes away
+        await asyncio.gather(task, return_exceptions=True)
+        answer = await ChatMessage.objects.aget(document=self.document, role='assistant')
+        self.assertEqual(answer.content, 'Mitochondria are')
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        index_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_root)
+        settings_patcher = override_settings(INDEX_ROOT=index_root)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        self.user = User.objects.create_user('student', password='pw')
+        self.document = Document.objects.create(user=self.user, file='pdfs/book.pdf', content_hash='async')
+        save_chunks(self.document, ["Mitochondria make ATP. " * 40])
+        self.llm = LLMClient(StubBackend(latency=0.3, response='They make ATP.'), max_concurrency=2,
+                             async_concurrency=64)
+        patcher = mock.patch('core.views.llm', self.llm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_dispatch_runs_drf_permissions_and_exception_handler(self):
+        view = AsyncChatView.as_view()
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+
+        def request(**headers):
+            return RequestFactory().post('/api/core/chat/', {'pdf_id': self.document.id, 'message': 'Hi'},
+                                         content_type='application/json', **headers)
+
+        response = await view(request())
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+        with mock.patch.object(AsyncChatView, 'permission_classes', [permissions.IsAdminUser]):
+            response = await view(request(HTTP_AUTHORIZATION=f'Bearer {token}'))
+        self.assertEqual(response.status_code, 403)
+
+        def handler(exc, context):
+            return Response({"handled": type(exc).__name__}, status=418)
+
+        with mock.patch.object(AsyncChatView, 'get_exception_handler', return_value=handler), \
+                mock.patch.object(self.llm, 'agenerate', side_effect=LookupError):
+            response = await view(request(HTTP_AUTHORIZATION=f'Bearer {token}'))
+        self.assertEqual(response.status_code, 500)  # generation errors are the view's own
+        with mock.patch.object(AsyncChatView, 'get_exception_handler', return_value=handler), \
+                mock.patch('core.views.build_chat_prompt', side_effect=PermissionError):
+            response = await view(request(HTTP_AUTHORIZATION=f'Bearer {token}'))
+        self.assertEqual((response.status_code, response.data), (418, {"handled": "PermissionError"}))
+
+    def test_asgi_entry_point_routes_to_the_async_views(self):
+        env = {key: value for key, value in os.environ.items() if key != 'LLM_VIEWS'}
+        code = ("import werter_backend.{}; from django.urls import resolve; "
+                "print(*(resolve(path).func.view_class.__name__ for path in {!r}))")
+        paths = ['/api/core/generate/quiz/stream/', '/api/core/generate/flashcards/stream/', '/api/core/chat/stream/']
+        expected = {
+            'asgi': 'AsyncGenerateQuizView AsyncGenerateFlashcardsView AsyncChatStreamView',
+            'wsgi': 'GenerateQuizView GenerateFlashcardsView ChatStreamView',  # runserver buffers async streams
+        }
+        for module, views in expected.items():
+            result = subprocess.run([sys.executable, '-c', code.format(module, paths)], env=env,
+                                    cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+            self.assertEqual(result.stdout.strip(), views)
+
+    async def test_generations_overlap_on_one_thread(self):
+        view = AsyncChatView.as_view()
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.user).access_token))()
+        factory = RequestFactory()
+        requests = [
+            factory.post('/api/core/chat/', {'pdf_id': self.document.id, 'message': f'Question {n}?'},
+                         content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token}')
+            for n in range(20)
+        ]
+        started = time.monotonic()
+        responses = await asyncio.gather(*(view(request) for request in requests))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertEqual(responses[0].data, {'response': 'They make ATP.'})
+        # Twenty 0.3 s calls at once, far beyond the two-thread sync cap
+        self.assertEqual(self.llm.stats['peak_in_flight'], 20)
+        self.assertLess(elapsed, 3)
+        self.assertEqual(await ChatMessage.objects.filter(document=self.document).acount(), 40)
+
+
+@override_settings(CHAT_PROMPT_TOKENS=2000, CHAT_HISTORY_TOKENS=400, CHAT_SUMMARY_TOKENS=100, CHAT_SUMMARY_BATCH=4)
+class ChatPromptTests(TestCase):
+    def setUp(self):
+        index_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_root)
+        settings_patcher = override_settings(INDEX_ROOT=index_root)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        user = User.objects.create_user('student', password='pw')
+        self.document = Document.objects.create(user=user, file='pdfs/book.pdf', content_hash='mno')
+        save_chunks(self.document, [f"Page {n} on enzymes and catalysis. " * 60 for n in range(30)])
+        for n in range(30):
+            ChatMessage.objects.create(document=self.document, role='user', content=f"Question {n}?")
+            ChatMessage.objects.create(document=self.document, role='assistant', content="A long answer. " * 80)
+
+    def test_prompt_stays_within_budget(self):
+        prompt = build_chat_prompt(self.document, "How do enzymes work?")
+        self.assertLessEqual(count_tokens(prompt.text), 2000)
+        self.assertLessEqual(prompt.tokens['history'], 400)
+        self.assertIn("Student: How do enzymes work?\nTutor:", prompt.text)
+        self.assertIn("enzymes", prompt.text)
+
+    def test_summary_is_extended_with_new_turns_only(self):
+        prompts = []
+        llm = LLMClient(StubBackend(latency=0, response=lambda p: prompts.append(p) or f"summary {len(prompts)}"))
+        first = build_chat_prompt(self.document, "next")
+        update_summary(self.document, llm, first.history_start)
+        self.assertEqual(pending_turns(self.document, first.history_start).count(), 0)
+        self.assertIn("Question 0?", prompts[0])
+
+        ChatMessage.objects.create(document=self.document, role='user', content="Question 30?")
+        ChatMessage.objects.create(document=self.document, role='assistant', content="A long answer. " * 80)
+        second = build_chat_prompt(self.document, "next")
+        summary = update_summary(self.document, llm, second.history_start)
+        self.assertEqual(summary.content, "summary 2")
+        self.assertIn("summary 1", prompts[1])
+        self.assertNotIn("Question 0?", prompts[1])
+        self.assertIn("summary 2", build_chat_prompt(self.document, "next").text)
+
+
+class DocumentListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='student')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.documents = [
+            Document.objects.create(user=self.user, file=f'pdfs/{n}.pdf', filename=f'{n}.pdf', file_size=n * 1000)
+            for n in range(25)
+        ]
+        save_chunks(self.documents[0], ["alpha " * 500, "beta " * 500])
+
+    def test_list_is_slim_and_paginated(self):
+        response = self.client.get('/api/core/documents/')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'filename', 'pages', 'size', 'uploaded_at', 'status'})
+        self.assertEqual([doc['filename'] for doc in response.data['results'][:2]], ['24.pdf', '23.pdf'])
+        rest = self.client.get(response.data['next']).data
+        self.assertEqual(len(response.data['results']) + len(rest['results']), 25)
+
+        response = self.client.get('/api/core/documents/?fields=id,size')
+        self.assertEqual(response.data['results'][0], {'id': self.documents[-1].id, 'size': 24000})
+        self.assertEqual(self.client.get('/api/core/documents/?fields=extracted_text').status_code, 400)
+
+    def test_upload_endpoint_still_lists_the_first_page(self):
+        response = self.client.get('/api/core/upload/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.client.get('/api/core/documents/').data['results'])
+
+    def test_unchanged_list_returns_304(self):
+        response = self.client.get('/api/core/documents/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get('/api/core/documents/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/core/documents/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get('/api/core/documents/?page_size=5', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.client.delete(f'/api/core/documents/{self.documents[3].id}/')
+        self.assertEqual(self.client.get('/api/core/documents/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_text_is_served_by_range(self):
+        url = f'/api/core/documents/{self.documents[0].id}/text/'
+        text = self.documents[0].get_text()
+        first = self.client.get(url, {'start': 2990, 'length': 20}).data
+        self.assertEqual(first['text'], text[2990:3010])
+        self.assertEqual((first['end'], first['next_start'], first['text_length']), (3010, 3010, len(text)))
+        last = self.client.get(url, {'start': len(text) - 5}).data
+        self.assertEqual((last['text'], last['next_start']), (text[-5:], None))
+        self.assertEqual(self.client.get(url, {'start': -1}).status_code, 400)
+        detail = self.client.get(f'/api/core/documents/{self.documents[0].id}/').data
+        self.assertNotIn('text', detail)
+
+
+@override_settings(MAX_UPLOAD_BYTES=256 * 1024)
+class UploadGuardTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def parse(self, content, name='book.pdf'):
+        request = self.factory.post('/api/core/upload/', {'file': SimpleUploadedFile(name, content)})
+        return request, request.FILES.get('file')
+
+    def test_pdf_is_spooled_to_disk(self):
+        request, upload = self.parse(b"%PDF-1.7\n" + b"x" * 100_000)
+        self.assertIsNone(request.upload_rejection)
+        self.assertIsInstance(upload, TemporaryUploadedFile)
+        self.assertEqual(len(request.upload_digests['file']), 64)
+
+    def test_oversized_upload_is_stopped(self):
+        request, upload = self.parse(b"%PDF-1.7\n" + b"x" * 400_000)
+        self.assertIsNone(upload)
+        self.assertEqual(request.upload_rejection[0], 413)
+
+    def test_non_pdf_is_rejected_from_its_first_bytes(self):
+        request, upload = self.parse(b"MZ" + b"\0" * 100_000)
+        self.assertIsNone(upload)
+        self.assertEqual(request.upload_rejection, (400, "File is not a PDF"))
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='student'))
+        response = client.post('/api/core/upload/', {'file': SimpleUploadedFile('x.pdf', b"<html>" * 100)})
+        self.assertEqual((response.status_code, response.data['error']), (400, "File is not a PDF"))
+        self.assertFalse(Document.objects.exists())
+
+
+class UploadDedupTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_patcher = override_settings(MEDIA_ROOT=f"{root}/media", INDEX_ROOT=f"{root}/indexes",
+                                             DOCUMENT_INGESTION_MODE='sync')
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        self.content = make_pdf(3)
+
+    def upload(self, username, content, name='notes.pdf'):
+        client = APIClient()
+        client.force_authenticate(User.objects.get_or_create(username=username)[0])
+        return client.post('/api/core/upload/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_same_bytes_reuse_the_stored_file_and_text(self):
+        with mock.patch('core.views.extract_pdf', wraps=extract_pdf) as extract:
+            first = self.upload('alice', self.content)
+            second = self.upload('bob', self.content, name='copy.pdf')
+        self.assertEqual((first.status_code, first.data['reused']), (201, False))
+        self.assertEqual((second.status_code, second.data['reused']), (201, True))
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual((second.data['pages'], second.data['text_length']), (3, first.data['text_length']))
+
+        original, copy = Document.objects.get(pk=first.data['pdf_id']), Document.objects.get(pk=second.data['pdf_id'])
+        self.assertEqual(copy.file.name, original.file.name)
+        self.assertEqual(copy.filename, 'copy.pdf')
+        self.assertEqual(copy.get_text(), original.get_text())
+        self.assertEqual(DocumentChunk.objects.count(), 3)
+
+    def test_different_bytes_are_extracted(self):
+        self.upload('alice', self.content)
+        response = self.upload('alice', make_pdf(4))
+        self.assertEqual((response.data['reused'], response.data['pages']), (False, 4))
+        self.assertEqual(Document.objects.values('file').distinct().count(), 2)
+
+
+class IngestionJobTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_patcher = override_settings(MEDIA_ROOT=f"{root}/media", INDEX_ROOT=f"{root}/indexes")
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='student'))
+
+    def upload(self, content):
+        # The job is handed to the worker pool on commit; the test runs it itself
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/core/upload/?mode=async',
+                                        {'file': SimpleUploadedFile('notes.pdf', content)}, format='multipart')
+        self.assertEqual((response.status_code, len(callbacks)), (202, 1))
+        return response.data['pdf_id'], response.data['job_id']
+
+    def test_job_lifecycle(self):
+        pdf_id, job_id = self.upload(make_pdf(3))
+        job = self.client.get(f'/api/core/jobs/{job_id}/').data
+        self.assertEqual((job['state'], job['pdf_id']), ('queued', pdf_id))
+
+        response = self.client.post('/api/core/generate/quiz/', {'pdf_id': pdf_id}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.data['status'], response.data['job_id']), ('processing', job_id))
+        response = self.client.post('/api/core/chat/', {'pdf_id': pdf_id, 'message': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+        process_job(job_id)
+        job = self.client.get(f'/api/core/jobs/{job_id}/').data
+        self.assertEqual((job['state'], job['pages_done'], job['pages_total'], job['error']), ('done', 3, 3, ''))
+        document = Document.objects.get(pk=pdf_id)
+        self.assertEqual((document.status, document.page_count), (Document.Status.READY, 3))
+        self.assertTrue(document.get_text().startswith("Page 1 of the biology notes\n"))
+
+    def test_failed_extraction_marks_job_and_document(self):
+        pdf_id, job_id = self.upload(b"%PDF-1.4\nnot really a pdf")
+        with self.assertLogs('core.jobs', 'ERROR'):
+            process_job(job_id)
+        job = IngestionJob.objects.get(pk=job_id)
+        self.assertEqual(job.state, IngestionJob.State.FAILED)
+        self.assertTrue(job.error)
+        response = self.client.post('/api/core/generate/quiz/', {'pdf_id': pdf_id}, format='json')
+        self.assertEqual((response.status_code, response.data['status']), (409, 'failed'))
+
+    def test_failed_save_marks_job_and_document(self):
+        pdf_id, job_id = self.upload(make_pdf(2))
+        with mock.patch('core.jobs.save_chunks', side_effect=RuntimeError("disk full")), \
+                self.assertLogs('core.jobs', 'ERROR'):
+            process_job(job_id)
+        job = IngestionJob.objects.get(pk=job_id)
+        self.assertEqual((job.state, job.error), (IngestionJob.State.FAILED, "disk full"))
+        self.assertEqual(Document.objects.get(pk=pdf_id).status, Document.Status.FAILED)
+
+    def test_jobs_are_private(self):
+        _, job_id = self.upload(make_pdf(1))
+        other = APIClient()
+        other.force_authenticate(User.objects.create(username='someone_else'))
+        self.assertEqual(other.get(f'/api/core/jobs/{job_id}/').status_code, 404)
+
+
+class UploadSessionTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_patcher = override_settings(UPLOAD_SESSION_ROOT=f"{root}/sessions", MEDIA_ROOT=f"{root}/media",
+                                             UPLOAD_CHUNK_MIN=1024)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='student'))
+        self.content = b"%PDF-1.7\n" + bytes(range(256)) * 40  # 10249 bytes: four 3000-byte chunks
+        response = self.client.post('/api/core/uploads/', {'filename': 'book.pdf', 'size': len(self.content),
+                                                           'chunk_size': 3000}, format='json')
+        self.assertEqual((response.status_code, response.data['chunk_count']), (201, 4))
+        self.url = f"/api/core/uploads/{response.data['upload_id']}/"
+
+    def put(self, index, data=None):
+        data = self.content[index * 3000:(index + 1) * 3000] if data is None else data
+        return self.client.put(f"{self.url}chunks/{index}/", data, content_type='application/octet-stream')
+
+    def test_chunks_in_any_order_with_retries(self):
+        for index in (3, 1, 1):
+            self.assertEqual(self.put(index).status_code, 200)
+        state = self.client.get(self.url).data
+        self.assertEqual((state['missing'], state['received']), ([0, 2], [[3000, 6000], [9000, 10249]]))
+        self.assertEqual(self.client.post(f"{self.url}complete/").status_code, 409)
+
+        for index in (0, 2):
+            self.put(index)
+        response = self.client.post(f"{self.url}complete/?mode=async")
+        self.assertEqual(response.status_code, 202)
+        document = Document.objects.get(pk=response.data['pdf_id'])
+        with document.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(UploadSession.objects.get().state, UploadSession.State.COMPLETE)
+        self.assertEqual(self.put(0).status_code, 409)
+
+    def test_bad_chunks_are_refused(self):
+        self.assertEqual(self.put(1, b"x" * 2999).status_code, 400)
+        self.assertEqual(self.put(3, b"x" * 1250).status_code, 400)
+        self.assertEqual(self.put(4, b"x").status_code, 400)
+        response = self.put(0, b"<html>" * 500)
+        self.assertEqual((response.status_code, response.data['error']), (400, "File is not a PDF"))
+        response = self.client.put(f"{self.url}chunks/1/", self.content[3000:6000],
+                                   content_type='application/octet-stream', CONTENT_LENGTH='lots')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).data['received'], [])
+
+    def test_limits_on_new_sessions(self):
+        for body in ({'filename': 'book.exe', 'size': 10}, {'filename': 'book.pdf', 'size': 0},
+                     {'filename': 'book.pdf', 'size': 10, 'chunk_size': 10}):
+            self.assertEqual(self.client.post('/api/core/uploads/', body, format='json').status_code, 400)
+
+    @override_settings(MAX_OPEN_UPLOAD_SESSIONS=2)
+    def test_unfinished_sessions_are_capped_and_expire(self):
+        body = {'filename': 'other.pdf', 'size': 5000, 'chunk_size': 5000}
+        self.assertEqual(self.client.post('/api/core/uploads/', body, format='json').status_code, 201)
+        self.assertEqual(self.client.post('/api/core/uploads/', body, format='json').status_code, 429)
+
+        stale = timezone.now() - timedelta(hours=49)
+        UploadSession.objects.filter(filename='book.pdf').update(updated_at=stale)
+        self.assertEqual(self.client.post('/api/core/uploads/', body, format='json').status_code, 201)
+        self.assertFalse(UploadSession.objects.filter(filename='book.pdf').exists())
+
+    def test_sessions_receiving_chunks_are_not_stale(self):
+        UploadSession.objects.update(updated_at=timezone.now() - timedelta(hours=49))
+        self.assertEqual(self.put(0).status_code, 200)
+        self.assertEqual(remove_stale(UploadSession.objects.all()), 0)
+        self.assertEqual(self.client.get(self.url).data['received'], [[0, 3000]])
+
+    def test_failed_completion_reopens_the_session(self):
+        for index in range(4):
+            self.put(index)
+        with mock.patch('core.views.ingest_upload', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.client.post(f"{self.url}complete/")
+        self.assertEqual(self.client.get(self.url).data['state'], UploadSession.State.OPEN)
+        self.assertEqual(self.client.post(f"{self.url}complete/?mode=async").status_code, 202)
+
+
+@skipUnless(connection.vendor == 'sqlite', "plans are checked against SQLite's EXPLAIN QUERY PLAN output")
+class QueryPlanTests(TestCase):
+    """The hot list queries are served by an index, including their ordering."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='student')
+        self.document = Document.objects.create(user=self.user, file='pdfs/book.pdf')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f"INDEX {index}", plan)
+        self.assertNotIn("TEMP B-TREE", plan)  # no sort after the lookup
+
+    def test_hot_queries_use_composite_indexes(self):
+        self.assertUsesIndex(
+            Document.objects.filter(user=self.user).order_by('-uploaded_at'), 'document_user_uploaded_idx'
+        )
+        self.assertUsesIndex(self.document.messages.all(), 'chatmessage_document_idx')
+        self.assertUsesIndex(
+            QuizResult.objects.filter(user=self.user).order_by('-created_at', '-id'), 'quizresult_history_idx'
+        )
@@ -0,0 +1,129 @@
+"""Resumable chunked uploads.
+
+A session reserves a file of the final size under ``UPLOAD_SESSION_ROOT``.
+Each numbered chunk is streamed from the request straight to its offset
+with ``os.pwrite``, so chunks can arrive in any order, in parallel, and be
+retried; an ``UploadChunk`` row is added only once the chunk's bytes are on
+disk. Sessions live in the database and the partial files on disk, so an
+upload continues after a server restart. A user has at most
+``MAX_OPEN_UPLOAD_SESSIONS`` unfinished sessions; ones idle for
+``UPLOAD_SESSION_TTL_HOURS`` are removed when the user starts another and
+by the ``clean_upload_sessions`` command. When every chunk is present the
+file is moved into storage and ingested like a regular upload.
+"""
+import hashlib
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import UploadChunk, UploadSession
+from .uploadhandlers import PDF_MAGIC, PDF_MAGIC_WINDOW
+
+READ_SIZE = 64 * 1024
+
+
+class ChunkError(ValueError):
+    pass
+
+
+class SessionFile(File):
+    """The assembled upload; storage moves it into place instead of copying it."""
+
+    def __init__(self, session):
+        super().__init__(open(part_path(session), 'rb'), name=session.filename)
+        self.size = session.size
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(session):
+    return Path(settings.UPLOAD_SESSION_ROOT) / f"{session.id}.part"
+
+
+def preallocate(session):
+    root = Path(settings.UPLOAD_SESSION_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(part_path(session), 'wb') as f:
+        f.truncate(session.size)
+
+
+def write_chunk(session, index, stream):
+    """Copy chunk ``index`` from ``stream`` to its offset; raises ``ChunkError`` if it is the wrong size."""
+    if not 0 <= index < session.chunk_count:
+        raise ChunkError(f"Chunk index must be between 0 and {session.chunk_count - 1}")
+    expected = session.chunk_length(index)
+    offset = index * session.chunk_size
+    written = 0
+    fd = os.open(part_path(session), os.O_WRONLY)
+    try:
+        while True:
+            # One byte past the expected length is enough to tell the chunk is too long
+            data = stream.read(min(READ_SIZE, expected + 1 - written)) if stream is not None else b''
+            if not data:
+                break
+            if written + len(data) > expected:
+                raise ChunkError(f"Chunk {index} must be exactly {expected} bytes")
+            if index == 0 and written == 0 and PDF_MAGIC not in data[:PDF_MAGIC_WINDOW]:
+                raise ChunkError("File is not a PDF")
+            os.pwrite(fd, data, offset + written)
+            written += len(data)
+        if written != expected:
+            raise ChunkError(f"Chunk {index} must be exactly {expected} bytes")
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    UploadChunk.objects.bulk_create([UploadChunk(session=session, index=index)], ignore_conflicts=True)
+    # A session still receiving chunks is not idle; remove_stale goes by updated_at
+    UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+    return written
+
+
+def received_chunks(session):
+    return list(session.chunks.order_by('index').values_list('index', flat=True))
+
+
+def received_ranges(session, chunks):
+    """Received byte ranges as ``[start, end)`` pairs, adjacent chunks merged."""
+    ranges = []
+    for index in chunks:
+        start, end = index * session.chunk_size, index * session.chunk_size + session.chunk_length(index)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+def sha256_part(session):
+    sha256 = hashlib.sha256()
+    with open(part_path(session), 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def discard(session):
+    try:
+        os.unlink(part_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def remove_stale(sessions, hours=None):
+    """Delete the sessions idle for ``hours`` (default ``UPLOAD_SESSION_TTL_HOURS``) and their files."""
+    hours = settings.UPLOAD_SESSION_TTL_HOURS if hours is None else hours
+    count = 0
+    for session in sessions.filter(updated_at__lt=timezone.now() - timedelta(hours=hours)).iterator():
+        discard(session)
+        session.delete()
+        count += 1
+    return count
+
+
+def unfinished(user):
+    return UploadSession.objects.filter(user=user).exclude(state=UploadSession.State.COMPLETE)
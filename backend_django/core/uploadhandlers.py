@@ -0,0 +1,90 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+PDF_MAGIC = b"%PDF-"
+# The PDF header may follow a little junk; readers look this far for it
+PDF_MAGIC_WINDOW = 1024
+# Room for multipart boundaries and the other form fields in Content-Length
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def sha256_file(file_obj):
+    """Hash an already-received upload (used when the handler did not run)."""
+    sha256 = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        sha256.update(chunk)
+    file_obj.seek(0)
+    return sha256.hexdigest()
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Computes the SHA-256 of each uploaded file while it streams in.
+
+    Chunks are passed through untouched to the next handler, which stores the
+    file as usual. Digests are exposed as ``request.upload_digests``, keyed by
+    form field name.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request.upload_digests = {}
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.request.upload_digests[self.field_name] = self.sha256.hexdigest()
+        return None
+
+
+class PdfGuardUploadHandler(FileUploadHandler):
+    """
+    Rejects uploads that are too large or are not PDFs while they stream in.
+
+    A request whose Content-Length already exceeds ``MAX_UPLOAD_BYTES`` is
+    refused before any of the body is read; otherwise the file is stopped as
+    soon as it passes the limit, or when its first bytes do not contain the
+    ``%PDF-`` header. The reason is left in ``request.upload_rejection`` as
+    ``(status_code, message)`` for the view to return.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request.upload_rejection = None
+        if content_length and content_length > settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+            self.reject(413, f"File is larger than {settings.MAX_UPLOAD_BYTES} bytes")
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.request.upload_rejection:
+            raise StopUpload(connection_reset=True)
+        self.head = b""
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.MAX_UPLOAD_BYTES:
+            self.reject(413, f"File is larger than {settings.MAX_UPLOAD_BYTES} bytes")
+            raise StopUpload(connection_reset=True)
+        if self.head is not None:
+            self.head += raw_data[:PDF_MAGIC_WINDOW]
+            if PDF_MAGIC in self.head[:PDF_MAGIC_WINDOW]:
+                self.head = None
+            elif len(self.head) >= PDF_MAGIC_WINDOW:
+                self.reject(400, "File is not a PDF")
+                raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.head is not None:
+            # Ended before the header was seen
+            self.reject(400, "File is not a PDF")
+        return None
+
+    def reject(self, status_code, message):
+        if not self.request.upload_rejection:
+            self.request.upload_rejection = (status_code, message)
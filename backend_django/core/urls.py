@@ -1,12 +1,34 @@
+from django.conf import settings
 from django.urls import path
-from .views import UploadView, GenerateQuizView, GenerateFlashcardsView, SubmitQuizView, ChatView, NoteView, DocumentDeleteView
+from .views import AsyncGenerateQuizView, AsyncGenerateFlashcardsView, AsyncChatView, AsyncChatStreamView, UploadView, UploadSessionsView, UploadSessionView, UploadChunkView, UploadSessionCompleteView, GenerateQuizView, GenerateFlashcardsView, SubmitQuizView, ChatView, ChatStreamView, NoteView, DocumentListView, DocumentDetailView, DocumentTextView, IngestionJobView, GenerationCacheStatsView
+
+# Under ASGI (LLM_VIEWS='async', set by werter_backend.asgi) the LLM-bound endpoints are async and
+# hold no thread while the model runs, and their event streams are async generators that ASGI
+# servers send unbuffered; WSGI servers get the sync views, whose streams they send unbuffered
+if settings.LLM_VIEWS == 'async':
+    QuizView, FlashcardsView, ChatPdfView = AsyncGenerateQuizView, AsyncGenerateFlashcardsView, AsyncChatView
+    ChatPdfStreamView = AsyncChatStreamView
+else:
+    QuizView, FlashcardsView, ChatPdfView = GenerateQuizView, GenerateFlashcardsView, ChatView
+    ChatPdfStreamView = ChatStreamView
 
 urlpatterns = [
     path('upload/', UploadView.as_view(), name='upload_pdf'),
-    path('generate/quiz/', GenerateQuizView.as_view(), name='generate_quiz'),
-    path('generate/flashcards/', GenerateFlashcardsView.as_view(), name='generate_flashcards'),
+    path('uploads/', UploadSessionsView.as_view(), name='upload_sessions'),
+    path('uploads/<uuid:pk>/', UploadSessionView.as_view(), name='upload_session'),
+    path('uploads/<uuid:pk>/chunks/<int:index>/', UploadChunkView.as_view(), name='upload_chunk'),
+    path('uploads/<uuid:pk>/complete/', UploadSessionCompleteView.as_view(), name='upload_session_complete'),
+    path('generate/quiz/', QuizView.as_view(), name='generate_quiz'),
+    path('generate/quiz/stream/', QuizView.as_view(stream=True), name='generate_quiz_stream'),
+    path('generate/flashcards/', FlashcardsView.as_view(), name='generate_flashcards'),
+    path('generate/flashcards/stream/', FlashcardsView.as_view(stream=True), name='generate_flashcards_stream'),
     path('submit/quiz/', SubmitQuizView.as_view(), name='submit_quiz'),
-    path('chat/', ChatView.as_view(), name='chat_pdf'),
+    path('chat/', ChatPdfView.as_view(), name='chat_pdf'),
+    path('chat/stream/', ChatPdfStreamView.as_view(), name='chat_pdf_stream'),
     path('notes/', NoteView.as_view(), name='notes'),
-    path('documents/<int:pk>/', DocumentDeleteView.as_view(), name='delete_document'),
+    path('documents/', DocumentListView.as_view(), name='document_list'),
+    path('documents/<int:pk>/', DocumentDetailView.as_view(), name='document_detail'),
+    path('documents/<int:pk>/text/', DocumentTextView.as_view(), name='document_text'),
+    path('jobs/<int:pk>/', IngestionJobView.as_view(), name='ingestion_job'),
+    path('cache/stats/', GenerationCacheStatsView.as_view(), name='generation_cache_stats'),
 ]
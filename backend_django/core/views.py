@@ -1,162 +1,694 @@
-from rest_framework import views, status, parsers, permissions
+from rest_framework import generics, views, status, parsers, permissions
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
-from .models import Document, ChatMessage, Note
-from .serializers import DocumentSerializer, ChatMessageSerializer, NoteSerializer
-from gamification.services import award_xp
-from gamification.models import QuizResult
-from pypdf import PdfReader
-import io
-import google.generativeai as genai
+from .models import (
+    Document, ChatMessage, Note, IngestionJob, Quiz, Question, FlashcardDeck, Flashcard, UploadSession,
+)
+from .serializers import (
+    DocumentSerializer, DocumentListSerializer, ChatMessageSerializer, NoteSerializer, IngestionJobSerializer,
+    QuizSerializer, QuestionSerializer, FlashcardDeckSerializer, FlashcardSerializer,
+)
+from .jobs import enqueue
+from gamification.services import record_quiz
+from .chunking import save_chunks, text_length
+from .prompting import build_chat_prompt, schedule_summary
+from .questionbank import aiter_quiz, asample_quiz, iter_quiz, sample_quiz, topic_sections
+from .ranking import get_ranker
+from .retrieval import build_index
+from .upload_sessions import (
+    ChunkError, SessionFile, discard, part_path, preallocate, received_chunks, received_ranges, remove_stale,
+    sha256_part, unfinished, write_chunk,
+)
+from .uploadhandlers import sha256_file
+from benchmate_common.extraction import extract_pdf
+from benchmate_common.generation_cache import create_cache
+from benchmate_common.llm_client import LLMTimeout, create_client
+from benchmate_common.singleflight import create_flight
+from benchmate_common.structured import (
+    FLASHCARD_SCHEMA, MalformedOutput, aiter_items, iter_items, parse_items, validate_card,
+)
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from types import SimpleNamespace
+import asyncio
+import hashlib
+import json
+import time
 
 # Configure Gemini
-genai.configure(api_key=settings.GEMINI_API_KEY)
-model = genai.GenerativeModel("models/gemini-2.5-flash")
+llm = create_client(**settings.LLM)
+
+# Identical concurrent generations (cache misses, question bank top-ups) run once
+single_flight = create_flight(**settings.SINGLE_FLIGHT)
+generation_cache = create_cache(flight=single_flight, **settings.GENERATION_CACHE)
+
+def wants_fresh(request):
+    """True if the client asked to bypass the generation cache."""
+    return str(request.data.get('fresh', '')).lower() in ('1', 'true', 'yes')
+
+def not_ready_body(document, job):
+    body = {
+        "error": "Document is still processing" if document.status == Document.Status.PROCESSING else "Document processing failed",
+        "status": document.status,
+    }
+    if job:
+        body.update(job_id=job.id, pages_done=job.pages_done, pages_total=job.pages_total)
+    return body
+
+def processing_response(document):
+    """Return a 409 response if the document's text is not ready to use, else None."""
+    if document.status == Document.Status.READY:
+        return None
+    job = IngestionJob.objects.filter(document=document).first()
+    return Response(not_ready_body(document, job), status=status.HTTP_409_CONFLICT)
+
+def ingest_upload(request, file_obj, content_hash):
+    """Create a Document for a received PDF and extract it (or queue extraction); returns the response.
+
+    Shared by multipart uploads and completed upload sessions.
+    """
+    # Same bytes already extracted: point at the stored blob; the chunks are keyed by the hash
+    existing = Document.objects.filter(content_hash=content_hash, status=Document.Status.READY).first()
+    if existing:
+        document = Document.objects.create(
+            user=request.user,
+            file=existing.file.name,
+            filename=file_obj.name,
+            file_size=file_obj.size,
+            content_hash=content_hash,
+            page_count=existing.page_count,
+        )
+        return created_response(document, reused=True)
+
+    mode = request.query_params.get('mode') or request.data.get('mode') or settings.DOCUMENT_INGESTION_MODE
+    if mode == 'async':
+        with transaction.atomic():
+            document = Document.objects.create(
+                user=request.user,
+                file=file_obj,
+                filename=file_obj.name,
+                file_size=file_obj.size,
+                content_hash=content_hash,
+                status=Document.Status.PROCESSING,
+            )
+            job = IngestionJob.objects.create(document=document)
+            enqueue(job)
+        serializer = DocumentSerializer(document)
+        return Response({
+            "pdf_id": document.id,
+            "job_id": job.id,
+            **serializer.data
+        }, status=status.HTTP_202_ACCEPTED)
+
+    document = None
+    try:
+        # Save Document first so the extraction workers can read it from disk
+        document = Document.objects.create(
+            user=request.user, file=file_obj, filename=file_obj.name, file_size=file_obj.size
+        )
+
+        result = extract_pdf(document.file.path)
+        with transaction.atomic():
+            # Only saved once extraction succeeded, so lookups never match a partial document
+            document.content_hash = content_hash
+            chunks = save_chunks(document, result.pages)
+            document.page_count = result.page_count
+            document.save(update_fields=['page_count', 'content_hash', 'updated_at'])
+        build_index(document, [chunk.text for chunk in chunks])
+        
+        return created_response(document, reused=False)
+
+    except Exception as e:
+        if document is not None:
+            document.file.delete(save=False)
+            document.delete()
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def created_response(document, reused):
+    serializer = DocumentSerializer(document)
+    return Response({
+        "pdf_id": document.id,
+        "pages": document.page_count,
+        "text_length": text_length(document),
+        "reused": reused,
+        **serializer.data
+    }, status=status.HTTP_201_CREATED)
 
 class UploadView(views.APIView):
     parser_classes = (parsers.MultiPartParser, parsers.FormParser)
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        documents = Document.objects.filter(user=request.user).order_by('-uploaded_at')
-        serializer = DocumentSerializer(documents, many=True)
-        return Response(serializer.data)
+        # Kept for older clients: the first page of documents/ as the plain list this endpoint returned
+        documents = Document.objects.filter(user=request.user).only(*DocumentListSerializer.model_fields)
+        documents = documents.order_by(*DocumentPagination.ordering)[:DocumentPagination.page_size]
+        return Response(DocumentListSerializer(documents, many=True, context={'request': request}).data)
 
     def post(self, request, *args, **kwargs):
         file_obj = request.FILES.get('file')
+        rejection = getattr(request, 'upload_rejection', None)
+        if rejection:
+            status_code, message = rejection
+            return Response({"error": message}, status=status_code)
         if not file_obj:
             return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
         
         if not file_obj.name.endswith('.pdf'):
             return Response({"error": "Only PDF files are allowed"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            # Read PDF
-            pdf_reader = PdfReader(file_obj)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            
-            # Save Document
-            document = Document.objects.create(
-                user=request.user,
-                file=file_obj,
-                extracted_text=text
-            )
-            
-            serializer = DocumentSerializer(document)
-            return Response({
-                "pdf_id": document.id,
-                "filename": file_obj.name,
-                "pages": len(pdf_reader.pages),
-                "text_length": len(text),
-                **serializer.data
-            }, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-class GenerateQuizView(views.APIView):
-    permission_classes = [permissions.IsAuthenticated]
+        content_hash = getattr(request, 'upload_digests', {}).get('file') or sha256_file(file_obj)
+        return ingest_upload(request, file_obj, content_hash)
 
-    def post(self, request):
-        pdf_id = request.data.get('pdf_id')
-        num_questions = request.data.get('num_questions', 5)
-        topic = request.data.get('topic', '')
-        
-        try:
-            document = Document.objects.get(id=pdf_id, user=request.user)
-        except Document.DoesNotExist:
-            return Response({"error": "PDF not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        text = document.extracted_text
-        
-        topic_instruction = f"Focus specifically on the topic: '{topic}'." if topic else "Cover key concepts from the text."
-        
-        prompt = f"""You are an expert tutor creating a quiz from a course book.
-{topic_instruction}
-Generate {num_questions} multiple-choice quiz questions.
-Start from the beginning of the relevant section.
+def flashcard_prompt(document, num_cards):
+    text = document.get_text(max_chars=30000)
+    return f"""You are an expert tutor creating flashcards from a course book.
+Generate {num_cards} flashcards for studying.
+Focus on key definitions, concepts, and important facts.
 Ignore any pricing, publishing info, or preface material.
-Each question should have 4 options (A, B, C, D) with only one correct answer.
-Do NOT mark the correct answer in the option text (e.g., do not write "Option A (Correct)").
+Each flashcard should have a front (question or concept) and back (answer or explanation).
 Return the response in JSON format with the following structure:
 {{
-  "questions": [
+  "flashcards": [
     {{
-      "question": "Question text",
-      "options": {{
-        "A": "Option A",
-        "B": "Option B",
-        "C": "Option C",
-        "D": "Option D"
-      }},
-      "correct_answer": "A"
+      "front": "Question or concept",
+      "back": "Answer or explanation"
     }}
   ]
 }}
 
 Text:
-{text[:30000]}"""
+{text}"""
+
+def save_question(quiz, index, item):
+    return Question.objects.create(
+        quiz=quiz, index=index, text=item['question'], options=item['options'], correct_answer=item['correct_answer']
+    )
+
+@transaction.atomic
+def create_quiz(user, document, topic, questions):
+    """Save a quiz with its questions and return it serialized."""
+    quiz = Quiz.objects.create(user=user, document=document, topic=topic)
+    for index, item in enumerate(questions):
+        save_question(quiz, index, item)
+    return QuizSerializer(quiz).data
+
+@transaction.atomic
+def create_deck(user, document, cards):
+    """Save a flashcard deck and return it serialized."""
+    deck = FlashcardDeck.objects.create(user=user, document=document)
+    Flashcard.objects.bulk_create([Flashcard(deck=deck, index=index, **card) for index, card in enumerate(cards)])
+    return FlashcardDeckSerializer(deck).data
+
+def sse(event, data):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def error_status(exc):
+    """HTTP status for a generation that failed with ``exc``."""
+    if isinstance(exc, LLMTimeout):
+        return status.HTTP_504_GATEWAY_TIMEOUT
+    if isinstance(exc, MalformedOutput):
+        return status.HTTP_502_BAD_GATEWAY
+    return status.HTTP_500_INTERNAL_SERVER_ERROR
+
+def error_response(exc):
+    return Response({"error": str(exc)}, status=error_status(exc))
+
+def relay(source, events):
+    """SSE body that feeds each item of ``source`` to ``events`` and sends the events it returns.
 
+    ``events.add(item)`` and ``events.finish()`` return lists of SSE events;
+    ``events.close()`` runs on GeneratorExit too, when the client goes away
+    mid-stream.
+    """
+    try:
+        for item in source:
+            yield from events.add(item)
+        yield from events.finish()
+    except Exception as e:
+        yield sse("error", {"error": str(e), "status": error_status(e)})
+    finally:
+        events.close()
+
+async def arelay(source, events):
+    """``relay`` over an async ``source``: under ASGI each event is sent as it is produced.
+
+    ``events`` runs in a thread, since it writes to the database. A client
+    that goes away cancels the stream, which still closes ``events``.
+    """
+    try:
+        async for item in source:
+            for event in await sync_to_async(events.add)(item):
+                yield event
+        for event in await sync_to_async(events.finish)():
+            yield event
+    except Exception as e:
+        yield sse("error", {"error": str(e), "status": error_status(e)})
+    finally:
+        await sync_to_async(events.close)()
+
+async def aiter_list(items):
+    for item in items:
+        yield item
+
+class QuizEvents:
+    """A streamed quiz: each question is saved as soon as it is served from the bank or parsed."""
+
+    def __init__(self, user, document, topic, num_questions):
+        self.quiz = Quiz.objects.create(user=user, document=document, topic=topic)
+        self.num_questions = num_questions
+        self.count = 0
+
+    def add(self, item):
+        question, generated = item
+        if self.count == self.num_questions:
+            return []  # the rest of the section is only going into the bank
+        self.count += 1
+        events = [sse("question", QuestionSerializer(save_question(self.quiz, self.count - 1, question)).data)]
+        if self.count == self.num_questions:
+            events.append(self.done())
+        return events
+
+    def finish(self):
+        if self.count == 0:
+            raise MalformedOutput("no usable questions in model output")
+        return [self.done()] if self.count < self.num_questions else []
+
+    def done(self):
+        return sse("done", {"quiz_id": self.quiz.id, "count": self.count})
+
+    def close(self):
+        if self.count == 0:
+            self.quiz.delete()
+
+class FlashcardEvents:
+    """A streamed deck: each card is saved as soon as it is parsed.
+
+    ``cached`` holds the cards of a cached deck to replay; otherwise
+    ``prompt`` is sent to the model and the finished deck is cached.
+    """
+
+    def __init__(self, user, document, num_cards, fresh):
+        self.params = {'num_cards': num_cards}
+        cached = None if fresh else generation_cache.get(document.content_key, 'flashcard_deck', self.params)
+        self.cached = json.loads(cached) if cached is not None else None
+        self.prompt = flashcard_prompt(document, num_cards) if cached is None else None
+        self.deck = FlashcardDeck.objects.create(user=user, document=document)
+        self.cards = []
+
+    def add(self, card):
+        row = Flashcard.objects.create(deck=self.deck, index=len(self.cards), **card)
+        self.cards.append(card)
+        return [sse("card", FlashcardSerializer(row).data)]
+
+    def finish(self):
+        if not self.cards:
+            raise MalformedOutput("no usable flashcards in model output")
+        if self.cached is None:
+            generation_cache.set(self.deck.document.content_key, 'flashcard_deck', self.params, json.dumps(self.cards))
+        return [sse("done", {"deck_id": self.deck.id, "count": len(self.cards), "cached": self.cached is not None})]
+
+    def close(self):
+        if not self.cards:
+            self.deck.delete()
+
+class ChatEvents:
+    """A streamed chat reply: tokens are relayed while the assistant message is saved as it grows.
+
+    The message is written at the first checkpoint and updated every
+    CHAT_STREAM_CHECKPOINT_SECONDS, so a disconnect or failure mid-answer
+    still leaves the partial reply in the chat history.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.parts = []
+        self.message_id = None
+        self.saved_length = 0
+        self.last_checkpoint = time.monotonic()
+
+    def add(self, chunk):
+        self.parts.append(chunk)
+        if time.monotonic() - self.last_checkpoint >= settings.CHAT_STREAM_CHECKPOINT_SECONDS:
+            self.checkpoint()
+        return [sse("token", {"text": chunk})]
+
+    def finish(self):
+        self.checkpoint()
+        return [sse("done", {"message_id": self.message_id})]
+
+    def close(self):
+        self.checkpoint()
+
+    def checkpoint(self):
+        content = "".join(self.parts)
+        if len(content) == self.saved_length:
+            return
+        if self.message_id is None:
+            self.message_id = ChatMessage.objects.create(document=self.document, role='assistant', content=content).id
+        else:
+            ChatMessage.objects.filter(id=self.message_id).update(content=content)
+        self.saved_length = len(content)
+        self.last_checkpoint = time.monotonic()
+
+def event_stream(events):
+    """SSE response for ``events``; an async generator is streamed without a thread under ASGI."""
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx-style proxies from buffering the stream
+    return response
+
+def session_state(session):
+    chunks = received_chunks(session)
+    return {
+        "upload_id": str(session.id),
+        "filename": session.filename,
+        "size": session.size,
+        "chunk_size": session.chunk_size,
+        "chunk_count": session.chunk_count,
+        "state": session.state,
+        "received": received_ranges(session, chunks),
+        "missing": sorted(set(range(session.chunk_count)) - set(chunks)),
+        "pdf_id": session.document_id,
+    }
+
+def get_session(request, pk):
+    try:
+        return UploadSession.objects.get(pk=pk, user=request.user)
+    except UploadSession.DoesNotExist:
+        return None
+
+class UploadSessionsView(views.APIView):
+    """Start a resumable upload: ``{"filename", "size", "chunk_size"?}``."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        filename = str(request.data.get('filename', ''))
+        if not filename.endswith('.pdf'):
+            return Response({"error": "Only PDF files are allowed"}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            response = model.generate_content(prompt)
-            result_text = response.text
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
-            
-            return Response({"quiz": result_text})
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            size = int(request.data.get('size'))
+            chunk_size = int(request.data.get('chunk_size') or settings.UPLOAD_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            return Response({"error": "size and chunk_size must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < size <= settings.MAX_SESSION_UPLOAD_BYTES:
+            return Response(
+                {"error": f"size must be between 1 and {settings.MAX_SESSION_UPLOAD_BYTES} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE if size > 0 else status.HTTP_400_BAD_REQUEST,
+            )
+        if not settings.UPLOAD_CHUNK_MIN <= chunk_size <= settings.UPLOAD_CHUNK_MAX:
+            return Response(
+                {"error": f"chunk_size must be between {settings.UPLOAD_CHUNK_MIN} and {settings.UPLOAD_CHUNK_MAX}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Each session reserves its full size on disk; abandoned ones stop counting once stale
+        remove_stale(unfinished(request.user))
+        if unfinished(request.user).count() >= settings.MAX_OPEN_UPLOAD_SESSIONS:
+            return Response(
+                {"error": f"At most {settings.MAX_OPEN_UPLOAD_SESSIONS} unfinished uploads; finish or delete one"},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+
+        session = UploadSession.objects.create(
+            user=request.user, filename=filename[:255], size=size, chunk_size=chunk_size
+        )
+        preallocate(session)
+        return Response(session_state(session), status=status.HTTP_201_CREATED)
+
+class UploadSessionView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        session = get_session(request, pk)
+        if session is None:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(session_state(session))
+
+    def delete(self, request, pk):
+        session = get_session(request, pk)
+        if session is None:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        discard(session)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class UploadChunkView(views.APIView):
+    """PUT the raw bytes of chunk ``index``; safe to retry."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, pk, index):
+        session = get_session(request, pk)
+        if session is None:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        if session.state != UploadSession.State.OPEN:
+            return Response({"error": "Upload is already complete"}, status=status.HTTP_409_CONFLICT)
+        if 0 <= index < session.chunk_count:
+            # Refuse a wrong-sized chunk before reading its body
+            declared = request.META.get('CONTENT_LENGTH')
+            try:
+                declared = int(declared) if declared else None
+            except ValueError:
+                return Response({"error": "Content-Length must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+            if declared is not None and declared != session.chunk_length(index):
+                return Response(
+                    {"error": f"Chunk {index} must be exactly {session.chunk_length(index)} bytes"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        try:
+            write_chunk(session, index, request.stream)
+        except ChunkError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"index": index, "stored": True})
+
+class UploadSessionCompleteView(views.APIView):
+    """Finish an upload once every chunk is stored and ingest it like a regular upload."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        session = get_session(request, pk)
+        if session is None:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        if session.state == UploadSession.State.COMPLETE:
+            return Response(session_state(session))
+        state = session_state(session)
+        if state["missing"]:
+            return Response({"error": "Upload is missing chunks", **state}, status=status.HTTP_409_CONFLICT)
+        # Only one request gets to ingest the file
+        if not UploadSession.objects.filter(pk=session.pk, state=UploadSession.State.OPEN).update(
+            state=UploadSession.State.COMPLETING
+        ):
+            return Response({"error": "Upload is already being completed"}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            file_obj = SessionFile(session)
+            try:
+                response = ingest_upload(request, file_obj, sha256_part(session))
+            finally:
+                file_obj.close()
+        except Exception:
+            # Not left in COMPLETING: reopen it for another try while the bytes are still there
+            if part_path(session).exists():
+                session.state = UploadSession.State.OPEN
+                session.save(update_fields=['state', 'updated_at'])
+            else:
+                session.delete()
+            raise
+        discard(session)  # already moved into storage unless the blob was reused
+        if response.status_code >= 400:
+            # The bytes are gone with the failed document; the client has to start over
+            session.delete()
+            return response
+        session.state = UploadSession.State.COMPLETE
+        session.document_id = response.data["pdf_id"]
+        session.save(update_fields=['state', 'document', 'updated_at'])
+        return response
+
+def load_document(request):
+    """``(document, error response)`` for ``pdf_id``; the error is None once the document is ready."""
+    try:
+        document = Document.objects.get(id=request.data.get('pdf_id'), user=request.user)
+    except Document.DoesNotExist:
+        return None, Response({"error": "PDF not found"}, status=status.HTTP_404_NOT_FOUND)
+    return document, processing_response(document)
+
+def bounded_count(request, name, default):
+    """``(count, error response)`` for a count parameter, clamped to 1..50."""
+    try:
+        return min(max(int(request.data.get(name, default)), 1), 50), None
+    except (TypeError, ValueError):
+        return None, Response({"error": f"{name} must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+class GenerationView(views.APIView):
+    """An LLM-bound endpoint, written once for its sync and async views.
 
-class GenerateFlashcardsView(views.APIView):
+    ``prepare`` validates the request and returns what the generation needs;
+    ``generate`` (``agenerate`` in the async view) calls the model and
+    ``respond`` saves and returns the result. With ``stream`` the result is
+    sent as SSE instead: ``start_stream`` returns the events object and
+    ``source`` (``asource``) the model output to ``relay`` through it.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    stream = False
 
     def post(self, request):
-        pdf_id = request.data.get('pdf_id')
-        num_cards = request.data.get('num_cards', 10)
-        
+        params, error = self.prepare(request)
+        if error:
+            return error
+        if self.stream:
+            events = self.start_stream(params)
+            return event_stream(relay(self.source(params, events), events))
         try:
-            document = Document.objects.get(id=pdf_id, user=request.user)
-        except Document.DoesNotExist:
-            return Response({"error": "PDF not found"}, status=status.HTTP_404_NOT_FOUND)
-        
-        text = document.extracted_text
-        prompt = f"""You are an expert tutor creating flashcards from a course book.
-Generate {num_cards} flashcards for studying.
-Focus on key definitions, concepts, and important facts.
-Ignore any pricing, publishing info, or preface material.
-Each flashcard should have a front (question or concept) and back (answer or explanation).
-Return the response in JSON format with the following structure:
-{{
-  "flashcards": [
-    {{
-      "front": "Question or concept",
-      "back": "Answer or explanation"
-    }}
-  ]
-}}
+            result = self.generate(params)
+        except Exception as e:
+            return error_response(e)
+        return self.respond(params, result)
 
-Text:
-{text[:30000]}"""
+class AsyncAPIView(views.APIView):
+    """``APIView`` that awaits ``async def`` handlers, for the LLM-bound endpoints under ASGI.
 
+    DRF only runs synchronous handlers, so under ASGI every generation would
+    hold a worker thread until the model answers. This follows
+    ``APIView.dispatch`` step for step (authentication, permissions,
+    throttling, the exception handler and content negotiation are DRF's
+    own) but awaits the handler; the steps that may query the database run
+    in a thread. A handler may also return an event stream over an async
+    generator, which is sent as it is produced.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
         try:
-            response = model.generate_content(prompt)
-            result_text = response.text
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
-            
-            return Response({"flashcards": result_text})
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):  # OPTIONS is APIView's own sync handler
+                response = await response
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+class AsyncGenerationView(AsyncAPIView):
+    """``GenerationView.post`` awaiting the model; ``prepare``, ``respond`` and the stream events run in a thread."""
+
+    async def post(self, request):
+        params, error = await sync_to_async(self.prepare)(request)
+        if error:
+            return error
+        if self.stream:
+            events = await sync_to_async(self.start_stream)(params)
+            return event_stream(arelay(self.asource(params, events), events))
+        try:
+            result = await self.agenerate(params)
         except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return error_response(e)
+        return await sync_to_async(self.respond)(params, result)
 
-class ChatView(views.APIView):
-    permission_classes = [permissions.IsAuthenticated]
+class GenerateQuizView(GenerationView):
+    def prepare(self, request):
+        document, error = load_document(request)
+        if error:
+            return None, error
+        num_questions, error = bounded_count(request, 'num_questions', 5)
+        if error:
+            return None, error
+        topic = request.data.get('topic', '')
+        if topic and not topic_sections(get_ranker(document), topic):
+            return None, Response({"error": "No part of this document matches the topic"}, status=status.HTTP_404_NOT_FOUND)
+        return SimpleNamespace(
+            user=request.user, document=document, num_questions=num_questions, topic=topic, fresh=wants_fresh(request),
+        ), None
 
+    def generate(self, params):
+        # Served from the question bank; the model only runs when the bank is short
+        return sample_quiz(params.document, llm, params.num_questions, params.topic, fresh=params.fresh,
+                           flight=single_flight)
+
+    async def agenerate(self, params):
+        return await asample_quiz(params.document, llm, params.num_questions, params.topic, fresh=params.fresh,
+                                  flight=single_flight)
+
+    def respond(self, params, result):
+        questions, generated = result
+        if not questions:
+            return Response({"error": "Could not generate questions for this document"}, status=status.HTTP_502_BAD_GATEWAY)
+        quiz = create_quiz(params.user, params.document, params.topic, questions)
+        return Response({"quiz": quiz, "cached": not generated})
+
+    def start_stream(self, params):
+        return QuizEvents(params.user, params.document, params.topic, params.num_questions)
+
+    def source(self, params, events):
+        return iter_quiz(params.document, llm, params.num_questions, params.topic, fresh=params.fresh)
+
+    def asource(self, params, events):
+        return aiter_quiz(params.document, llm, params.num_questions, params.topic, fresh=params.fresh)
+
+class GenerateFlashcardsView(GenerationView):
+    def prepare(self, request):
+        document, error = load_document(request)
+        if error:
+            return None, error
+        num_cards, error = bounded_count(request, 'num_cards', 10)
+        if error:
+            return None, error
+        return SimpleNamespace(user=request.user, document=document, num_cards=num_cards, fresh=wants_fresh(request)), None
+
+    def generate(self, params):
+        def generate():
+            # Only a cache miss needs the document text
+            prompt = flashcard_prompt(params.document, params.num_cards)
+            return json.dumps(parse_items(llm.generate(prompt, schema=FLASHCARD_SCHEMA), validate_card))
+
+        return generation_cache.get_or_generate(
+            params.document.content_key, 'flashcard_deck', {'num_cards': params.num_cards}, generate,
+            fresh=params.fresh,
+        )
+
+    async def agenerate(self, params):
+        async def generate():
+            prompt = await sync_to_async(flashcard_prompt)(params.document, params.num_cards)
+            return json.dumps(parse_items(await llm.agenerate(prompt, schema=FLASHCARD_SCHEMA), validate_card))
+
+        return await generation_cache.aget_or_generate(
+            params.document.content_key, 'flashcard_deck', {'num_cards': params.num_cards}, generate,
+            fresh=params.fresh,
+        )
+
+    def respond(self, params, result):
+        result_text, cached = result
+        cards = json.loads(result_text)
+        if not cards:
+            return Response({"error": "Could not generate flashcards for this document"}, status=status.HTTP_502_BAD_GATEWAY)
+        return Response({"flashcards": create_deck(params.user, params.document, cards), "cached": cached})
+
+    def start_stream(self, params):
+        return FlashcardEvents(params.user, params.document, params.num_cards, params.fresh)
+
+    def source(self, params, events):
+        if events.cached is not None:
+            return events.cached
+        return iter_items(llm.stream(events.prompt, schema=FLASHCARD_SCHEMA), validate_card)
+
+    def asource(self, params, events):
+        if events.cached is not None:
+            return aiter_list(events.cached)
+        return aiter_items(llm.astream(events.prompt, schema=FLASHCARD_SCHEMA), validate_card)
+
+class ChatView(GenerationView):
     def get(self, request):
         pdf_id = request.query_params.get('pdf_id')
         if not pdf_id:
@@ -171,55 +703,54 @@ class ChatView(views.APIView):
         serializer = ChatMessageSerializer(messages, many=True)
         return Response(serializer.data)
 
-    def post(self, request):
-        pdf_id = request.data.get('pdf_id')
+    def prepare(self, request):
+        document, error = load_document(request)
+        if error:
+            return None, error
         message = request.data.get('message')
-        # history is now fetched from DB, but we can still accept it if needed for context window optimization
-        
-        try:
-            document = Document.objects.get(id=pdf_id, user=request.user)
-        except Document.DoesNotExist:
-            return Response({"error": "PDF not found"}, status=status.HTTP_404_NOT_FOUND)
-        
+        prompt = build_chat_prompt(document, message)
+
         # Save user message
         ChatMessage.objects.create(document=document, role='user', content=message)
-        
-        text = document.extracted_text
-        
-        # Construct prompt with context and history from DB
-        context_prompt = f"""You are a helpful AI tutor assisting a student with a document.
-Use the following document text to answer the student's question.
-If the answer is not in the text, say so politely.
-Keep answers concise and relevant.
-
-Document Text (excerpt):
-{text[:30000]}...
-
-Chat History:
-"""
-        # Fetch last 10 messages for context
-        recent_messages = document.messages.order_by('-created_at')[:10:-1] 
-        # Note: slicing with negative step might not work on queryset directly depending on DB, 
-        # safer to slice normally then reverse in python or use order_by
-        recent_messages = document.messages.order_by('-created_at')[:10]
-        recent_messages = reversed(recent_messages)
-
-        for msg in recent_messages:
-            role = "Student" if msg.role == 'user' else "Tutor"
-            context_prompt += f"{role}: {msg.content}\n"
-            
-        context_prompt += f"\nStudent: {message}\nTutor:"""
-        
-        try:
-            response = model.generate_content(context_prompt)
-            ai_response = response.text
-            
-            # Save AI response
-            ChatMessage.objects.create(document=document, role='assistant', content=ai_response)
-            
-            return Response({"response": ai_response})
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        schedule_summary(document, llm, prompt)
+        return SimpleNamespace(document=document, prompt=prompt.text), None
+
+    def generate(self, params):
+        return llm.generate(params.prompt)
+
+    async def agenerate(self, params):
+        return await llm.agenerate(params.prompt)
+
+    def respond(self, params, ai_response):
+        ChatMessage.objects.create(document=params.document, role='assistant', content=ai_response)
+        return Response({"response": ai_response})
+
+    def start_stream(self, params):
+        return ChatEvents(params.document)
+
+    def source(self, params, events):
+        return llm.stream(params.prompt)
+
+    def asource(self, params, events):
+        return llm.astream(params.prompt)
+
+class ChatStreamView(ChatView):
+    stream = True
+    http_method_names = ['post', 'options']
+
+class AsyncGenerateQuizView(AsyncGenerationView, GenerateQuizView):
+    pass
+
+class AsyncGenerateFlashcardsView(AsyncGenerationView, GenerateFlashcardsView):
+    pass
+
+class AsyncChatView(AsyncGenerationView, ChatView):
+    async def get(self, request):
+        return await sync_to_async(ChatView.get)(self, request)
+
+class AsyncChatStreamView(AsyncChatView):
+    stream = True
+    http_method_names = ['post', 'options']
 
 class NoteView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -255,8 +786,55 @@ class NoteView(views.APIView):
         
         return Response({"status": "saved", "updated_at": note.updated_at})
 
-class DocumentDeleteView(views.APIView):
+class DocumentPagination(CursorPagination):
+    ordering = ('-uploaded_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+def list_validators(request, documents):
+    """``(etag, last_modified)`` for a page of the user's document list.
+
+    One aggregate query: any upload, status change or deletion changes the
+    count or the latest ``updated_at``, and so the ETag. A deletion can
+    leave ``Last-Modified`` unchanged, which is why the ETag (checked first
+    when clients send both) also covers the count.
+    """
+    state = documents.aggregate(count=Count('id'), changed=Max('updated_at'))
+    changed = state['changed']
+    key = f"{request.user.pk}|{request.get_full_path()}|{state['count']}|{changed.isoformat() if changed else ''}"
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest()), int(changed.timestamp()) if changed else None
+
+class DocumentListView(generics.ListAPIView):
+    """Document metadata for the library, newest first; supports ``?fields=`` and conditional GET."""
     permission_classes = [permissions.IsAuthenticated]
+    serializer_class = DocumentListSerializer
+    pagination_class = DocumentPagination
+
+    def get_queryset(self):
+        return Document.objects.filter(user=self.request.user).only(*DocumentListSerializer.model_fields)
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = list_validators(request, Document.objects.filter(user=request.user))
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+class DocumentDetailView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            document = Document.objects.only(*DocumentListSerializer.model_fields).get(pk=pk, user=request.user)
+        except Document.DoesNotExist:
+            return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(DocumentListSerializer(document, context={'request': request}).data)
 
     def delete(self, request, pk):
         try:
@@ -265,6 +843,60 @@ class DocumentDeleteView(views.APIView):
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Document.DoesNotExist:
             return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+
+class DocumentTextView(views.APIView):
+    """Extracted text by character range: ``?start=`` (default 0) and ``?length=``."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            document = Document.objects.get(pk=pk, user=request.user)
+        except Document.DoesNotExist:
+            return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+        not_ready = processing_response(document)
+        if not_ready:
+            return not_ready
+
+        try:
+            start = int(request.query_params.get('start', 0))
+            length = int(request.query_params.get('length', settings.DOCUMENT_TEXT_PAGE_CHARS))
+        except ValueError:
+            return Response({"error": "start and length must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if start < 0 or length < 1:
+            return Response({"error": "start must be >= 0 and length >= 1"}, status=status.HTTP_400_BAD_REQUEST)
+        length = min(length, settings.DOCUMENT_TEXT_MAX_CHARS)
+
+        total = text_length(document)
+        end = min(start + length, total)
+        return Response({
+            "pdf_id": document.id,
+            "start": start,
+            "end": max(end, start),
+            "text_length": total,
+            "next_start": end if end < total else None,
+            "text": document.get_text_range(start, end) if start < total else "",
+        })
+
+class IngestionJobView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            job = IngestionJob.objects.get(pk=pk, document__user=request.user)
+        except IngestionJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        serializer = IngestionJobSerializer(job)
+        return Response(serializer.data)
+
+class GenerationCacheStatsView(views.APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            **generation_cache.stats(),
+            "single_flight": single_flight.stats if single_flight else None,
+        })
+
 class SubmitQuizView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -278,18 +910,11 @@ class SubmitQuizView(views.APIView):
         # Calculate XP: 10 XP per correct answer
         xp_earned = score * 10
         
-        QuizResult.objects.create(
-            user=request.user,
-            score=score,
-            total_questions=total_questions,
-            xp_earned=xp_earned
-        )
-        
-        award_xp(request.user, xp_earned)
+        profile = record_quiz(request.user, score, total_questions, xp_earned)
         
         return Response({
             "message": "Quiz submitted successfully",
             "xp_earned": xp_earned,
-            "new_xp": request.user.profile.xp,
-            "new_rank": request.user.profile.rank
+            "new_xp": profile.xp,
+            "new_rank": profile.rank
         })
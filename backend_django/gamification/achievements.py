@@ -0,0 +1,115 @@
+"""Achievement engine driven by ``Achievement.condition_type``.
+
+Achievements are indexed per condition type as sorted threshold arrays and
+kept in memory (reloaded when an achievement changes, or after
+``ACHIEVEMENT_CACHE_SECONDS``). A batch of XP events only has to look at
+the thresholds between each user's value before and after the batch, found
+with two bisections. Users are re-checked in full only by the
+``backfill_achievements`` command, which is also how a newly added
+achievement reaches users who were already past its threshold.
+
+Supported conditions are ``xp`` (profile XP) and ``quiz_count`` (quiz
+results submitted).
+"""
+import threading
+import time
+from bisect import bisect_right
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Achievement, QuizResult, UserAchievement, UserProfile, XpEvent
+
+_index = None
+_loaded_at = 0.0
+_index_lock = threading.Lock()
+
+
+class ThresholdIndex:
+    """Achievement ids per condition type, sorted by ``condition_value``."""
+
+    def __init__(self, rows):
+        self.values, self.ids = {}, {}
+        for achievement_id, condition_type, condition_value in sorted(rows, key=lambda row: row[2]):
+            self.values.setdefault(condition_type, []).append(condition_value)
+            self.ids.setdefault(condition_type, []).append(achievement_id)
+
+    def reached(self, condition_type, value, since=None):
+        """Ids with a threshold of at most ``value`` (and above ``since`` when given)."""
+        values = self.values.get(condition_type)
+        if not values:
+            return []
+        start = 0 if since is None else bisect_right(values, since)
+        return self.ids[condition_type][start:bisect_right(values, value)]
+
+
+def get_index():
+    global _index, _loaded_at
+    with _index_lock:
+        if _index is None or time.monotonic() - _loaded_at > settings.ACHIEVEMENT_CACHE_SECONDS:
+            _index = ThresholdIndex(Achievement.objects.values_list('id', 'condition_type', 'condition_value'))
+            _loaded_at = time.monotonic()
+        return _index
+
+
+@receiver([post_save, post_delete], sender=Achievement)
+def reset_index(**kwargs):
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def grant(earned):
+    """Store ``(user_id, achievement_id)`` pairs, skipping ones already held."""
+    rows = [UserAchievement(user_id=user_id, achievement_id=achievement_id) for user_id, achievement_id in earned]
+    UserAchievement.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def progress_for(user_ids):
+    """``{user_id: {condition_type: value}}`` with the current values for ``user_ids``."""
+    progress = {user_id: {'xp': 0, 'quiz_count': 0} for user_id in user_ids}
+    for user_id, xp in UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'xp'):
+        progress[user_id]['xp'] = xp
+    counts = QuizResult.objects.filter(user_id__in=user_ids).values_list('user_id').annotate(count=Count('id'))
+    for user_id, count in counts:
+        progress[user_id]['quiz_count'] = count
+    return progress
+
+
+def check_events(user_ids):
+    """Grant what ``user_ids`` crossed through their pending (unprocessed) XP events.
+
+    Current values already include every pending event, so the values
+    before them are the current ones minus the pending totals; only
+    thresholds in between are looked at.
+    """
+    index = get_index()
+    if not index.values or not user_ids:
+        return
+    pending = {
+        row['user_id']: row
+        for row in XpEvent.objects.filter(user_id__in=user_ids, processed_at__isnull=True)
+        .values('user_id').annotate(xp=Sum('amount'), quiz_count=Count('id', filter=Q(source='quiz')))
+    }
+    earned = []
+    for user_id, values in progress_for(user_ids).items():
+        delta = pending.get(user_id, {})
+        for condition_type, value in values.items():
+            since = value - (delta.get(condition_type) or 0)
+            earned.extend((user_id, achievement_id) for achievement_id in index.reached(condition_type, value, since))
+    grant(earned)
+
+
+def check_users(user_ids):
+    """Evaluate ``user_ids`` against every achievement."""
+    index = get_index()
+    if not index.values or not user_ids:
+        return
+    grant(
+        (user_id, achievement_id)
+        for user_id, values in progress_for(user_ids).items()
+        for condition_type, value in values.items()
+        for achievement_id in index.reached(condition_type, value)
+    )
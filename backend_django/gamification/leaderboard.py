@@ -0,0 +1,89 @@
+"""Leaderboard queries and the cached top-N snapshot.
+
+The first leaderboard page is served from the cache and dropped by
+``award_xp`` only when the change could affect it; with more than one
+worker the cache must be a shared backend (``CACHE_BACKEND``) so every
+worker sees the invalidation. Positions are counted on the (-xp, id)
+index, but at most ``LEADERBOARD_EXACT_POSITIONS`` rows a request; further
+down they are estimated from a cached histogram of XP.
+"""
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+
+from .models import UserProfile, XpRollup
+from .rollups import period_key
+
+TOP_KEY = 'gamification:leaderboard:top'
+HISTOGRAM_KEY = 'gamification:leaderboard:histogram'
+# Width of the XP buckets positions are estimated from
+HISTOGRAM_BUCKET_XP = 100
+
+
+def ranked_profiles():
+    return UserProfile.objects.select_related('user').only(
+        'xp', 'level', 'rank', 'user__username'
+    ).order_by('-xp', 'id')
+
+
+def period_profiles(kind):
+    """Rollups for the current week or month, best first."""
+    return XpRollup.objects.filter(period=period_key(kind)).select_related('user').only(
+        'xp', 'period', 'user__username'
+    ).order_by('-xp', 'id')
+
+
+def top_snapshot(build):
+    """Return the cached first page, calling ``build()`` to compute it on a miss."""
+    snapshot = cache.get(TOP_KEY)
+    if snapshot is None:
+        snapshot = build()
+        cache.set(TOP_KEY, snapshot, settings.LEADERBOARD_CACHE_SECONDS)
+    return snapshot
+
+
+def position(profile):
+    """``(position, exact)``: 1-based leaderboard position of ``profile``; ties are broken by join order."""
+    snapshot = cache.get(TOP_KEY)
+    if snapshot is not None:
+        for index, entry in enumerate(snapshot['results']):
+            if entry['username'] == profile.user.username:
+                return index + 1, True
+    cap = settings.LEADERBOARD_EXACT_POSITIONS
+    ahead = UserProfile.objects.filter(Q(xp__gt=profile.xp) | Q(xp=profile.xp, id__lt=profile.id))
+    # COUNT over a LIMIT subquery: stops after ``cap`` index entries
+    counted = ahead.values('id')[:cap].count()
+    if counted < cap:
+        return counted + 1, True
+    return max(estimated_ahead(profile.xp), cap) + 1, False
+
+
+def estimated_ahead(xp):
+    """Profiles in higher XP buckets than ``xp``, from a histogram cached like the top page."""
+    histogram = cache.get(HISTOGRAM_KEY)
+    if histogram is None:
+        rows = (UserProfile.objects.values(bucket=F('xp') / HISTOGRAM_BUCKET_XP)
+                .annotate(profiles=Count('id')).order_by('-bucket'))
+        buckets, above, total = [], [], 0
+        for row in rows:
+            buckets.append(row['bucket'])
+            above.append(total)
+            total += row['profiles']
+        # Ascending, for bisect; above[i] counts the profiles in buckets higher than buckets[i]
+        histogram = {'buckets': buckets[::-1], 'above': above[::-1], 'total': total}
+        cache.set(HISTOGRAM_KEY, histogram, settings.LEADERBOARD_CACHE_SECONDS)
+    index = bisect_right(histogram['buckets'], xp // HISTOGRAM_BUCKET_XP) - 1
+    return histogram['above'][index] if index >= 0 else histogram['total']
+
+
+def on_xp_change(username, xp):
+    """Drop the snapshot if a user with ``xp`` now belongs on it or is already on it."""
+    snapshot = cache.get(TOP_KEY)
+    if snapshot is None:
+        return
+    results = snapshot['results']
+    full = snapshot.get('next') is not None
+    if not full or xp >= results[-1]['xp'] or any(entry['username'] == username for entry in results):
+        cache.delete(TOP_KEY)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from gamification.achievements import check_users
+from gamification.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Grant every achievement users already qualify for, evaluating users in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        last_id, total = 0, 0
+        while True:
+            user_ids = list(
+                UserProfile.objects.filter(user_id__gt=last_id).order_by('user_id')
+                .values_list('user_id', flat=True)[:options['batch_size']]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            check_users(user_ids)
+            total += len(user_ids)
+            self.stdout.write(f"{total} users evaluated")
@@ -0,0 +1,108 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from gamification import achievements
+from gamification.models import QuizResult, XpEvent, XpRollup
+from gamification.rollups import periods_for
+
+
+class Command(BaseCommand):
+    help = ("Rebuild weekly and monthly XP rollups from XpEvent rows, and from QuizResult rows older "
+            "than the first event, in batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--keep', action='store_true', help="Add to existing rollups instead of clearing them first")
+
+    def handle(self, *args, **options):
+        history = self.history()  # checked before anything is cleared or claimed
+        stamp = self.claim_pending(clear=not options['keep'])
+        total = self.rebuild(history, 'xp_earned', options['batch_size'])
+        self.stdout.write(f"{total} quiz results without events processed")
+
+        # Events the outbox drains after the claim are added by it, not here
+        total = self.rebuild(XpEvent.objects.filter(processed_at__lte=stamp), 'amount', options['batch_size'])
+        self.stdout.write(f"{total} XP events processed")
+
+    def history(self):
+        """Quiz results from before the outbox existed, which have no event of their own.
+
+        record_quiz writes every result with a 'quiz' event in the same
+        transaction, so the results after the first event must match the
+        quiz events one for one. If they do not, the split is unknown and
+        this raises CommandError rather than write approximate rollups.
+        """
+        first_event = XpEvent.objects.order_by('id').first()
+        if first_event is None:
+            return QuizResult.objects.all()
+        history = QuizResult.objects.filter(created_at__lte=first_event.created_at)
+        if first_event.source == 'quiz':
+            # record_quiz saved that event's result just before it
+            own = history.filter(user_id=first_event.user_id).order_by('-created_at', '-id').first()
+            if own is None or own.xp_earned != first_event.amount:
+                raise CommandError(f"Cannot find the quiz result of the first XP event ({first_event.id})")
+            history = history.exclude(id=own.id)
+        with_events = QuizResult.objects.count() - history.count()
+        quiz_events = XpEvent.objects.filter(source='quiz').count()
+        if with_events != quiz_events:
+            raise CommandError(
+                f"{with_events} quiz results are not history but there are {quiz_events} quiz XP events; "
+                "cannot tell which results predate the outbox"
+            )
+        return history
+
+    @transaction.atomic
+    def claim_pending(self, clear):
+        """Clear the rollups and mark pending events processed in one transaction; returns the mark.
+
+        Otherwise the next outbox drain would add the events this command folds in a second time.
+        """
+        if clear:
+            deleted, _ = XpRollup.objects.all().delete()
+            self.stdout.write(f"Cleared {deleted} rollups")
+        pending = XpEvent.objects.select_for_update().filter(processed_at__isnull=True)
+        achievements.check_events(set(pending.values_list('user_id', flat=True)))
+        stamp = timezone.now()
+        claimed = pending.update(processed_at=stamp)
+        self.stdout.write(f"Claimed {claimed} pending XP events")
+        return stamp
+
+    def rebuild(self, queryset, amount_field, batch_size):
+        last_id, total = 0, 0
+        while True:
+            batch = list(
+                queryset.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'user_id', amount_field, 'created_at')[:batch_size]
+            )
+            if not batch:
+                return total
+            last_id = batch[-1][0]
+            totals = defaultdict(int)
+            for _, user_id, xp, created_at in batch:
+                for period in periods_for(created_at):
+                    totals[user_id, period] += xp
+            self.apply(totals)
+            total += len(batch)
+
+    @transaction.atomic
+    def apply(self, totals):
+        user_ids = {user_id for user_id, _ in totals}
+        periods = {period for _, period in totals}
+        existing = {
+            (rollup.user_id, rollup.period): rollup
+            # Locked so a concurrent outbox drain adding to the same rows waits for this batch
+            for rollup in XpRollup.objects.select_for_update().filter(user_id__in=user_ids, period__in=periods)
+        }
+        updated, created = [], []
+        for (user_id, period), xp in totals.items():
+            rollup = existing.get((user_id, period))
+            if rollup is None:
+                created.append(XpRollup(user_id=user_id, period=period, xp=xp))
+            else:
+                rollup.xp += xp
+                updated.append(rollup)
+        XpRollup.objects.bulk_update(updated, ['xp'], batch_size=500)
+        XpRollup.objects.bulk_create(created, batch_size=500)
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gamification.outbox import process_events
+
+
+class Command(BaseCommand):
+    help = "Apply pending XP events to rollups and achievements, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep draining every INTERVAL seconds instead of exiting when empty")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_events(options['batch_size'])
+            if processed:
+                self.stdout.write(f"{processed} XP events processed")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
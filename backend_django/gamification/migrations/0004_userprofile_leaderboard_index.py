@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0003_achievement_userprofile_weekly_xp_userachievement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['-xp', 'id'], name='profile_leaderboard_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:08
+
+from django.conf import settings
+from datetime import timedelta, timezone
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_counters(apps, schema_editor):
+    UserProfile = apps.get_model('gamification', 'UserProfile')
+    QuizResult = apps.get_model('gamification', 'QuizResult')
+    totals = QuizResult.objects.values('user_id').annotate(
+        quizzes=Count('id'), correct=Sum('score'), answered=Sum('total_questions')
+    )
+    for row in totals.iterator():
+        days = sorted({
+            created_at.astimezone(timezone.utc).date()
+            for created_at in QuizResult.objects.filter(user_id=row['user_id']).values_list('created_at', flat=True)
+        })
+        streak = 1
+        while streak < len(days) and days[-streak - 1] == days[-streak] - timedelta(days=1):
+            streak += 1
+        UserProfile.objects.filter(user_id=row['user_id']).update(
+            total_quizzes=row['quizzes'], correct_answers=row['correct'], questions_answered=row['answered'],
+            current_streak=streak, last_quiz_date=days[-1],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0006_xpevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='correct_answers',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='current_streak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='last_quiz_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='questions_answered',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_quizzes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='quizresult',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='quizresult_history_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -6,9 +6,17 @@ from django.dispatch import receiver
 class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
     xp = models.IntegerField(default=0)
-    weekly_xp = models.IntegerField(default=0)
     level = models.IntegerField(default=1)
     rank = models.CharField(max_length=50, default='Novice')
+    # Quiz counters, kept up to date by record_quiz
+    total_quizzes = models.IntegerField(default=0)
+    correct_answers = models.IntegerField(default=0)
+    questions_answered = models.IntegerField(default=0)
+    current_streak = models.IntegerField(default=0) # consecutive UTC days with a quiz, up to last_quiz_date
+    last_quiz_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-xp', 'id'], name='profile_leaderboard_idx')]
 
     def __str__(self):
         return f"{self.user.username} - Level {self.level}"
@@ -38,14 +46,40 @@ class QuizResult(models.Model):
     xp_earned = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['user', '-created_at', '-id'], name='quizresult_history_idx')]
+
     def __str__(self):
         return f"{self.user.username} - {self.score}/{self.total_questions}"
 
+class XpRollup(models.Model):
+    """XP earned by a user in one UTC period: an ISO week ("2026-W42") or a month ("2026-10")."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='xp_rollups')
+    period = models.CharField(max_length=8)
+    xp = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'period')
+        indexes = [models.Index(fields=['period', '-xp', 'id'], name='rollup_leaderboard_idx')]
+
+    def __str__(self):
+        return f"{self.user_id} {self.period}: {self.xp} XP"
+
+class XpEvent(models.Model):
+    """Append-only outbox of XP awards, drained by ``gamification.outbox.process_events``."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='xp_events')
+    amount = models.IntegerField()
+    source = models.CharField(max_length=20) # e.g. 'quiz'
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['processed_at', 'id'], name='xpevent_pending_idx')]
+
+    def __str__(self):
+        return f"{self.user_id} +{self.amount} XP ({self.source})"
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
@@ -0,0 +1,80 @@
+"""Draining of the ``XpEvent`` outbox.
+
+``award_xp`` only bumps the profile and appends an event; everything that
+can lag a little behind (weekly and monthly rollups, achievements) is
+applied here in batches. Events are claimed with ``SELECT ... FOR UPDATE
+SKIP LOCKED`` where the database supports it, so several drainers can run
+at once; on SQLite the write lock serializes them.
+"""
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import achievements, rollups
+from .models import XpEvent
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='xp-outbox')
+_queued = False
+_queued_lock = threading.Lock()
+
+
+@transaction.atomic
+def process_batch(batch_size=None):
+    """Apply one batch of pending events; returns how many were processed."""
+    events = list(
+        XpEvent.objects.select_for_update(skip_locked=True)
+        .filter(processed_at__isnull=True).order_by('id')
+        .values_list('id', 'user_id', 'amount', 'created_at')[:batch_size or settings.XP_EVENT_BATCH_SIZE]
+    )
+    if not events:
+        return 0
+    totals = defaultdict(int)
+    for _, user_id, amount, created_at in events:
+        for period in rollups.periods_for(created_at):
+            totals[user_id, period] += amount
+    rollups.add_totals(totals)
+    achievements.check_events({user_id for _, user_id, _, _ in events})
+    XpEvent.objects.filter(id__in=[event[0] for event in events]).update(processed_at=timezone.now())
+    return len(events)
+
+
+def process_events(batch_size=None):
+    """Drain the outbox; returns the number of events processed."""
+    total = 0
+    while True:
+        count = process_batch(batch_size)
+        total += count
+        if not count:
+            return total
+
+
+def schedule_drain():
+    """Queue a background drain unless one is already waiting to start."""
+    global _queued
+    if settings.XP_EVENT_DRAIN != 'background':
+        return
+    with _queued_lock:
+        if _queued:
+            return
+        _queued = True
+    _executor.submit(_drain_in_thread)
+
+
+def _drain_in_thread():
+    global _queued
+    # Cleared before reading so events committed during the drain queue another one
+    with _queued_lock:
+        _queued = False
+    try:
+        process_events()
+    except Exception:
+        logger.exception("XP outbox drain failed")
+    finally:
+        connections.close_all()
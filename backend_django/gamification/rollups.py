@@ -0,0 +1,48 @@
+"""Per-user XP totals for the current ISO week and month (UTC).
+
+The XP outbox adds each batch of events to the rollup rows of the periods
+they happened in, so weekly and monthly leaderboards read a handful of
+indexed rows instead of summing ``QuizResult``. Periods roll over by themselves: a new week is simply a new
+``period`` value.
+"""
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import XpRollup
+
+PERIOD_KINDS = ('week', 'month')
+
+
+def period_key(kind, moment=None):
+    moment = (moment or timezone.now()).astimezone(dt_timezone.utc)
+    if kind == 'week':
+        year, week, _ = moment.isocalendar()
+        return f"{year}-W{week:02d}"
+    if kind == 'month':
+        return f"{moment.year}-{moment.month:02d}"
+    raise ValueError(f"Unknown period kind: {kind}")
+
+
+def periods_for(moment=None):
+    return [period_key(kind, moment) for kind in PERIOD_KINDS]
+
+
+def add_totals(totals):
+    """Add ``{(user_id, period): xp}`` to the rollups, creating missing rows."""
+    for (user_id, period), amount in totals.items():
+        if XpRollup.objects.filter(user_id=user_id, period=period).update(xp=F('xp') + amount):
+            continue
+        try:
+            with transaction.atomic():
+                XpRollup.objects.create(user_id=user_id, period=period, xp=amount)
+        except IntegrityError:
+            # Another drainer created the row first
+            XpRollup.objects.filter(user_id=user_id, period=period).update(xp=F('xp') + amount)
+
+
+def period_xp(user, kind):
+    period = period_key(kind)
+    return XpRollup.objects.filter(user=user, period=period).values_list('xp', flat=True).first() or 0
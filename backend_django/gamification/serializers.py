@@ -1,5 +1,9 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import UserProfile, UserAchievement, QuizResult
+from .models import UserProfile, UserAchievement, QuizResult, XpRollup
+from .rollups import period_xp
 
 class AchievementSerializer(serializers.ModelSerializer):
     name = serializers.CharField(source='achievement.name')
@@ -18,8 +22,45 @@ class QuizResultSerializer(serializers.ModelSerializer):
 class UserProfileSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     achievements = AchievementSerializer(source='user.achievements', many=True, read_only=True)
-    quiz_history = QuizResultSerializer(source='user.quiz_results', many=True, read_only=True)
+    weekly_xp = serializers.SerializerMethodField()
+    monthly_xp = serializers.SerializerMethodField()
+    accuracy = serializers.SerializerMethodField()
+    current_streak = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserProfile
+        fields = ('username', 'xp', 'weekly_xp', 'monthly_xp', 'level', 'rank', 'total_quizzes', 'accuracy',
+                  'current_streak', 'achievements')
+
+    def get_accuracy(self, obj):
+        """Percentage of answers correct over all quizzes, or None before the first quiz."""
+        if not obj.questions_answered:
+            return None
+        return round(100 * obj.correct_answers / obj.questions_answered, 1)
+
+    def get_current_streak(self, obj):
+        # The stored streak is broken once a whole UTC day passes without a quiz
+        today = timezone.now().astimezone(dt_timezone.utc).date()
+        if obj.last_quiz_date is None or obj.last_quiz_date < today - timedelta(days=1):
+            return 0
+        return obj.current_streak
+
+    def get_weekly_xp(self, obj):
+        return period_xp(obj.user, 'week')
+
+    def get_monthly_xp(self, obj):
+        return period_xp(obj.user, 'month')
+
+class LeaderboardEntrySerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
 
     class Meta:
         model = UserProfile
-        fields = ('username', 'xp', 'weekly_xp', 'level', 'rank', 'achievements', 'quiz_history')
+        fields = ('username', 'xp', 'level', 'rank')
+
+class PeriodLeaderboardEntrySerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = XpRollup
+        fields = ('username', 'xp', 'period')
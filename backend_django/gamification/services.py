@@ -1,4 +1,14 @@
-from .models import UserProfile
+from bisect import bisect_right
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import connections, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
+
+from . import leaderboard, outbox
+from .models import QuizResult, UserProfile, XpEvent
 
 RANK_THRESHOLDS = {
     'Novice': 0,
@@ -8,20 +18,89 @@ RANK_THRESHOLDS = {
     'Grandmaster': 5000,
 }
 
+RANK_LEVELS = sorted(RANK_THRESHOLDS.items(), key=lambda item: item[1])
+RANK_VALUES = [threshold for _, threshold in RANK_LEVELS]
+
 def calculate_rank(xp):
-    current_rank = 'Novice'
-    for rank, threshold in RANK_THRESHOLDS.items():
-        if xp >= threshold:
-            current_rank = rank
-    return current_rank
-
-def award_xp(user, amount):
-    profile = user.profile
-    profile.xp += amount
-    profile.weekly_xp += amount
-    
+    position = bisect_right(RANK_VALUES, xp)
+    return RANK_LEVELS[position - 1][0] if position else 'Novice'
+
+def rank_case(xp):
+    """SQL expression for the rank of a profile whose XP becomes ``xp``."""
+    return Case(
+        *[When(GreaterThanOrEqual(xp, threshold), then=Value(rank)) for rank, threshold in reversed(RANK_LEVELS)],
+        default=Value('Novice'),
+    )
+
+def award_xp(user, amount, source='quiz', changes=None):
+    """Add ``amount`` XP to ``user`` and return the updated profile.
+
+    XP, level and rank change in one ``UPDATE`` computed by the database, so
+    concurrent awards cannot overwrite each other; ``changes`` adds more
+    profile fields to the same statement, which also returns the new row.
+    The award is also appended to the ``XpEvent`` outbox, which updates
+    rollups and achievements later.
+    """
+    with transaction.atomic():
+        return _award(user, amount, source, changes)
+
+def _award(user, amount, source, changes):
+    # Callers hold the transaction; a nested atomic block would only add savepoints
+    new_xp = F('xp') + amount
+    profiles = UserProfile.objects.filter(user_id=user.pk)
     # Simple level calculation: 1 level per 100 XP
-    profile.level = (profile.xp // 100) + 1
-    
-    profile.rank = calculate_rank(profile.xp)
-    profile.save()
+    changes = {'xp': new_xp, 'level': new_xp / 100 + 1, 'rank': rank_case(new_xp), **(changes or {})}
+    profile = _update_returning(profiles, changes)
+    if profile is None:
+        UserProfile.objects.get_or_create(user_id=user.pk)
+        profile = _update_returning(profiles, changes)
+    XpEvent.objects.create(user_id=user.pk, amount=amount, source=source)
+    transaction.on_commit(lambda: leaderboard.on_xp_change(user.username, profile.xp))
+    transaction.on_commit(outbox.schedule_drain)
+    return profile
+
+def _update_returning(profiles, changes):
+    """``profiles.update(**changes)`` for one profile, returning it as updated, or None if there is none.
+
+    On PostgreSQL and SQLite 3.35+ this is a single ``UPDATE ... RETURNING``
+    statement; elsewhere the row is read back after the update.
+    """
+    connection = connections[profiles.db]
+    if connection.vendor not in ('postgresql', 'sqlite') or not connection.features.can_return_columns_from_insert:
+        return profiles.get() if profiles.update(**changes) else None
+    query = profiles.query.chain(UpdateQuery)
+    query.add_update_values(changes)
+    sql, params = query.get_compiler(profiles.db).as_sql()
+    fields = UserProfile._meta.concrete_fields
+    returning = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} RETURNING {returning}", params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    values = []
+    for field, value in zip(fields, row):
+        # The conversions a SELECT through the ORM applies, e.g. SQLite's text dates
+        column = field.get_col(UserProfile._meta.db_table)
+        for converter in connection.ops.get_db_converters(column) + field.get_db_converters(connection):
+            value = converter(value, column, connection)
+        values.append(value)
+    return UserProfile.from_db(profiles.db, [field.attname for field in fields], values)
+
+def record_quiz(user, score, total_questions, xp_earned):
+    """Store a quiz result and update the profile's XP and quiz counters; returns the profile."""
+    today = timezone.now().astimezone(dt_timezone.utc).date()
+    counters = {
+        'total_quizzes': F('total_quizzes') + 1,
+        'correct_answers': F('correct_answers') + score,
+        'questions_answered': F('questions_answered') + total_questions,
+        'current_streak': Case(
+            When(last_quiz_date=today, then=F('current_streak')),
+            When(last_quiz_date=today - timedelta(days=1), then=F('current_streak') + 1),
+            default=Value(1),
+        ),
+        'last_quiz_date': Value(today),
+    }
+    with transaction.atomic():
+        QuizResult.objects.create(user=user, score=score, total_questions=total_questions, xp_earned=xp_earned)
+        return _award(user, xp_earned, 'quiz', counters)
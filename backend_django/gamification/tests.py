@@ -1,3 +1,298 @@
-from django.test import TestCase
+import threading
+from datetime import date, datetime, timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from users.models import User
+from .models import Achievement, QuizResult, UserAchievement, UserProfile, XpEvent, XpRollup
+from .achievements import ThresholdIndex
+from .outbox import process_events
+from .rollups import period_key
+from .services import award_xp, calculate_rank, record_quiz
+
+
+@override_settings(XP_EVENT_DRAIN='command')
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.me = User.objects.create(username='me')
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+    def add_users(self, count, start=0):
+        for n in range(start, start + count):
+            user = User.objects.create(username=f'user{n}')
+            UserProfile.objects.filter(user=user).update(xp=n * 10)
+
+    def test_query_count_does_not_grow_with_users(self):
+        self.add_users(5)
+        with self.assertNumQueries(1):
+            self.client.get('/api/gamification/leaderboard/')
+        cache.clear()
+        self.add_users(50, start=5)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/gamification/leaderboard/')
+        self.assertEqual([entry['xp'] for entry in response.data['results']], [n * 10 for n in range(54, 44, -1)])
+        with self.assertNumQueries(0):
+            self.client.get('/api/gamification/leaderboard/')
+
+    def test_cursor_pages_cover_everyone_once(self):
+        self.add_users(25)
+        seen = []
+        url = '/api/gamification/leaderboard/?page_size=7'
+        while url:
+            response = self.client.get(url)
+            seen.extend(entry['username'] for entry in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 26)
+        self.assertEqual(len(set(seen)), 26)
+
+    def test_award_xp_refreshes_the_cached_top(self):
+        self.add_users(20)
+        self.client.get('/api/gamification/leaderboard/')
+        with self.captureOnCommitCallbacks(execute=True):
+            award_xp(self.me, 1000)
+        response = self.client.get('/api/gamification/leaderboard/')
+        self.assertEqual(response.data['results'][0]['username'], 'me')
+
+    def test_my_position(self):
+        self.add_users(20)
+        UserProfile.objects.filter(user=self.me).update(xp=55)
+        response = self.client.get('/api/gamification/leaderboard/me/')
+        self.assertEqual(response.data['position'], 15)  # 14 users have 60 XP or more
+        self.client.get('/api/gamification/leaderboard/')
+        with self.captureOnCommitCallbacks(execute=True):
+            award_xp(self.me, 1000)
+        self.assertEqual(self.client.get('/api/gamification/leaderboard/me/').data['position'], 1)
+
+    def test_position_far_down_is_estimated(self):
+        self.add_users(20)
+        UserProfile.objects.filter(user=self.me).update(xp=55)
+        with override_settings(LEADERBOARD_EXACT_POSITIONS=5):
+            with self.assertNumQueries(3):  # profile, capped count, histogram
+                response = self.client.get('/api/gamification/leaderboard/me/')
+            # 10 users are in higher 100-XP buckets; the 4 others with 60-90 XP share mine
+            self.assertEqual((response.data['position'], response.data['position_exact']), (11, False))
+            with self.assertNumQueries(2):
+                self.client.get('/api/gamification/leaderboard/me/')
+
+
+class XpRollupTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=f'user{n}') for n in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_period_keys_use_iso_weeks_in_utc(self):
+        new_year = datetime(2027, 1, 1, 12, tzinfo=timezone.utc)
+        self.assertEqual(period_key('week', new_year), '2026-W53')
+        self.assertEqual(period_key('month', new_year), '2027-01')
+
+    def test_award_xp_updates_current_week_and_month(self):
+        award_xp(self.users[1], 30)
+        award_xp(self.users[1], 20)
+        award_xp(self.users[2], 40)
+        self.assertFalse(XpRollup.objects.exists())  # applied by the outbox
+        self.assertEqual(process_events(batch_size=2), 3)
+        week = XpRollup.objects.get(user=self.users[1], period=period_key('week'))
+        self.assertEqual(week.xp, 50)
+        self.assertEqual(XpRollup.objects.get(user=self.users[1], period=period_key('month')).xp, 50)
+
+        response = self.client.get('/api/gamification/leaderboard/?period=week')
+        self.assertEqual([(e['username'], e['xp']) for e in response.data['results']], [('user1', 50), ('user2', 40)])
+        self.assertEqual(self.client.get('/api/gamification/leaderboard/?period=year').status_code, 400)
+
+    def test_backfill_rebuilds_rollups_from_quiz_results(self):
+        moments = [datetime(2026, 9, 28, tzinfo=timezone.utc), datetime(2026, 10, 4, tzinfo=timezone.utc),
+                   datetime(2026, 10, 5, tzinfo=timezone.utc)]
+        for moment in moments:
+            result = QuizResult.objects.create(user=self.users[0], score=2, total_questions=5, xp_earned=20)
+            QuizResult.objects.filter(pk=result.pk).update(created_at=moment)
+        XpRollup.objects.create(user=self.users[0], period='2026-W40', xp=999)
+
+        call_command('backfill_xp_rollups', batch_size=2, stdout=StringIO())
+        rollups = dict(XpRollup.objects.filter(user=self.users[0]).values_list('period', 'xp'))
+        self.assertEqual(rollups, {'2026-W40': 40, '2026-W41': 20, '2026-09': 20, '2026-10': 40})
+
+    def test_backfill_refuses_results_it_cannot_place(self):
+        QuizResult.objects.create(user=self.users[1], score=1, total_questions=5, xp_earned=10)  # history
+        record_quiz(self.users[0], 3, 5, 30)
+        QuizResult.objects.create(user=self.users[2], score=1, total_questions=5, xp_earned=10)  # no event
+        with self.assertRaisesMessage(CommandError, "cannot tell which results predate the outbox"):
+            call_command('backfill_xp_rollups', stdout=StringIO())
+        self.assertFalse(XpEvent.objects.filter(processed_at__isnull=False).exists())  # nothing claimed
+
+        XpEvent.objects.all().delete()
+        award_xp(self.users[0], 25)  # a quiz event without its result
+        with self.assertRaisesMessage(CommandError, "Cannot find the quiz result"):
+            call_command('backfill_xp_rollups', stdout=StringIO())
+
+    def test_backfill_claims_pending_events(self):
+        record_quiz(self.users[0], 3, 5, 30)
+        process_events()
+        record_quiz(self.users[0], 2, 5, 20)  # still pending when the backfill runs
+        call_command('backfill_xp_rollups', stdout=StringIO())
+        self.assertEqual(process_events(), 0)
+        award_xp(self.users[0], 5)
+        self.assertEqual(process_events(), 1)
+        self.assertEqual(XpRollup.objects.get(user=self.users[0], period=period_key('week')).xp, 55)
+
+
+class AwardXpTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='learner')
+
+    def test_submit_is_one_update_plus_inserts(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        # quiz result insert, profile update returning the new row, outbox insert
+        with self.assertNumQueries(3 + 2):  # the savepoint TestCase puts around the atomic block
+            response = client.post('/api/core/submit/quiz/', {'score': 52, 'total_questions': 60}, format='json')
+        self.assertEqual((response.data['new_xp'], response.data['new_rank']), (520, 'Scholar'))
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual((profile.xp, profile.level, profile.rank), (520, 6, 'Scholar'))
+        self.assertEqual(list(XpEvent.objects.values_list('amount', 'processed_at')), [(520, None)])
+
+    def test_returned_profile_matches_the_stored_row(self):
+        returned = record_quiz(self.user, 4, 5, 40)
+        stored = UserProfile.objects.get(user=self.user)
+        fields = [field.attname for field in UserProfile._meta.concrete_fields]
+        self.assertEqual([getattr(returned, name) for name in fields], [getattr(stored, name) for name in fields])
+        self.assertIsInstance(returned.last_quiz_date, date)
+
+
+
+@override_settings(XP_EVENT_DRAIN='command')
+class ConcurrentAwardTests(TransactionTestCase):
+    def test_no_xp_is_lost_under_concurrent_awards(self):
+        user = User.objects.create(username='racer')
+        threads, per_thread = 8, 25
+
+        def award_many():
+            try:
+                for _ in range(per_thread):
+                    while True:
+                        try:
+                            award_xp(user, 10)
+                            break
+                        except OperationalError:
+                            pass  # the test database is locked by another writer; try again
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=award_many) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        profile = UserProfile.objects.get(user=user)
+        self.assertEqual(profile.xp, threads * per_thread * 10)
+        self.assertEqual(profile.level, profile.xp // 100 + 1)
+        self.assertEqual(XpEvent.objects.filter(user=user).count(), threads * per_thread)
+
+
+class AchievementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='learner')
+        for name, condition_type, value in [('First steps', 'xp', 100), ('Centurion', 'xp', 1000),
+                                            ('Regular', 'quiz_count', 2), ('Veteran', 'quiz_count', 50)]:
+            Achievement.objects.create(name=name, description='', icon='star',
+                                       condition_type=condition_type, condition_value=value)
+
+    def earned(self, user):
+        return set(UserAchievement.objects.filter(user=user).values_list('achievement__name', flat=True))
+
+    def submit(self, user, xp):
+        QuizResult.objects.create(user=user, score=xp // 10, total_questions=10, xp_earned=xp)
+        award_xp(user, xp)
+
+    def test_threshold_index_only_returns_crossed_values(self):
+        index = ThresholdIndex([(1, 'xp', 500), (2, 'xp', 100), (3, 'quiz_count', 1), (4, 'xp', 1000)])
+        self.assertEqual(index.values['xp'], [100, 500, 1000])
+        self.assertEqual(index.reached('xp', 600, since=100), [1])
+        self.assertEqual(index.reached('xp', 1000), [2, 1, 4])
+        self.assertEqual(index.reached('streak', 10), [])
+        self.assertEqual([calculate_rank(xp) for xp in (0, 99, 100, 5000)], ['Novice', 'Novice', 'Apprentice', 'Grandmaster'])
+
+    def test_outbox_grants_crossed_achievements(self):
+        self.submit(self.user, 150)
+        process_events()
+        self.assertEqual(self.earned(self.user), {'First steps'})
+        self.submit(self.user, 10)
+        self.submit(self.user, 10)  # drained later, already counted in the current values
+        process_events(batch_size=1)
+        self.assertEqual(self.earned(self.user), {'First steps', 'Regular'})
+        self.assertFalse(XpEvent.objects.filter(processed_at__isnull=True).exists())
+
+    def test_new_achievements_reload_the_cache(self):
+        self.submit(self.user, 150)
+        process_events()
+        Achievement.objects.create(name='Second try', description='', icon='star', condition_type='xp',
+                                   condition_value=160)
+        self.submit(self.user, 10)
+        process_events()
+        self.assertIn('Second try', self.earned(self.user))
+
+    def test_backfill_evaluates_everyone(self):
+        users = [self.user] + [User.objects.create(username=f'user{n}') for n in range(4)]
+        for n, user in enumerate(users):
+            UserProfile.objects.filter(user=user).update(xp=n * 400)
+        call_command('backfill_achievements', batch_size=2, stdout=StringIO())
+        self.assertEqual(self.earned(users[0]), set())
+        self.assertEqual(self.earned(users[1]), {'First steps'})
+        self.assertEqual(self.earned(users[3]), {'First steps', 'Centurion'})
+
+
+@override_settings(XP_EVENT_DRAIN='command')
+class ProfileStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='learner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def submit_on(self, day, score, total=10):
+        moment = datetime(2026, 10, day, 12, tzinfo=timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            record_quiz(self.user, score, total, score * 10)
+
+    def test_counters_and_streak(self):
+        for day, score in [(10, 5), (12, 7), (13, 8), (13, 10), (14, 10)]:
+            self.submit_on(day, score)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual((profile.total_quizzes, profile.correct_answers, profile.questions_answered), (5, 40, 50))
+        self.assertEqual((profile.current_streak, str(profile.last_quiz_date)), (3, '2026-10-14'))
+
+        for today, streak in [(15, 3), (16, 0)]:
+            with mock.patch('django.utils.timezone.now', return_value=datetime(2026, 10, today, tzinfo=timezone.utc)):
+                data = self.client.get('/api/gamification/profile/').data
+            self.assertEqual((data['total_quizzes'], data['accuracy'], data['current_streak']), (5, 80.0, streak))
+        self.assertNotIn('quiz_history', data)
+
+    def test_profile_queries_do_not_grow_with_history(self):
+        for n in range(30):
+            self.submit_on(10, 5)
+            achievement = Achievement.objects.create(name=f'A{n}', description='', icon='star',
+                                                     condition_type='xp', condition_value=n)
+            UserAchievement.objects.create(user=self.user, achievement=achievement)
+        with self.assertNumQueries(6):  # get_or_create, profile, achievements (two), weekly and monthly XP
+            response = self.client.get('/api/gamification/profile/')
+        self.assertEqual(len(response.data['achievements']), 30)
+
+    def test_quiz_history_is_cursor_paginated_newest_first(self):
+        for day in range(1, 26):
+            self.submit_on(day, day % 10)
+        pages, url = [], '/api/gamification/quiz-history/?page_size=10'
+        while url:
+            response = self.client.get(url)
+            pages.append([entry['score'] for entry in response.data['results']])
+            url = response.data['next']
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(pages[0][:3], [5, 4, 3])  # days 25, 24, 23
@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import ProfileView, LeaderboardView
+from .views import ProfileView, QuizHistoryView, LeaderboardView, LeaderboardPositionView
 
 urlpatterns = [
     path('profile/', ProfileView.as_view(), name='user_profile'),
+    path('quiz-history/', QuizHistoryView.as_view(), name='quiz_history'),
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', LeaderboardPositionView.as_view(), name='leaderboard_position'),
 ]
@@ -1,16 +1,77 @@
-from rest_framework import generics, permissions
-from .models import UserProfile
-from .serializers import UserProfileSerializer
+from rest_framework import generics, permissions, views
+from rest_framework.pagination import CursorPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from . import leaderboard
+from .models import QuizResult, UserProfile
+from .serializers import (
+    UserProfileSerializer, QuizResultSerializer, LeaderboardEntrySerializer, PeriodLeaderboardEntrySerializer
+)
 
 class ProfileView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UserProfileSerializer
 
     def get_object(self):
-        profile, created = UserProfile.objects.get_or_create(user=self.request.user)
-        return profile
+        UserProfile.objects.get_or_create(user=self.request.user)
+        return UserProfile.objects.select_related('user').prefetch_related(
+            'user__achievements__achievement'
+        ).get(user=self.request.user)
+
+class QuizHistoryPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+class QuizHistoryView(generics.ListAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = QuizResultSerializer
+    pagination_class = QuizHistoryPagination
+
+    def get_queryset(self):
+        return QuizResult.objects.filter(user=self.request.user).only(
+            'score', 'total_questions', 'xp_earned', 'created_at'
+        )
+
+class LeaderboardPagination(CursorPagination):
+    ordering = ('-xp', 'id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
 
 class LeaderboardView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
-    serializer_class = UserProfileSerializer
-    queryset = UserProfile.objects.order_by('-xp')[:10]
+    serializer_class = LeaderboardEntrySerializer
+    pagination_class = LeaderboardPagination
+
+    def get_period(self):
+        period = self.request.query_params.get('period', 'all')
+        if period not in ('all', 'week', 'month'):
+            raise ValidationError({"error": "period must be one of all, week, month"})
+        return period
+
+    def get_queryset(self):
+        period = self.get_period()
+        if period == 'all':
+            return leaderboard.ranked_profiles()
+        return leaderboard.period_profiles(period)
+
+    def get_serializer_class(self):
+        if self.get_period() == 'all':
+            return LeaderboardEntrySerializer
+        return PeriodLeaderboardEntrySerializer
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        # The default first page is shared by everyone and served from the cache
+        return Response(leaderboard.top_snapshot(lambda: super(LeaderboardView, self).list(request).data))
+
+class LeaderboardPositionView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        profile, created = UserProfile.objects.select_related('user').get_or_create(user=request.user)
+        position, exact = leaderboard.position(profile)
+        return Response({**LeaderboardEntrySerializer(profile).data, "position": position, "position_exact": exact})
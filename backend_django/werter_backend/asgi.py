@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'werter_backend.settings')
+# The LLM-bound endpoints only hold no thread while the model runs as async views
+os.environ.setdefault('LLM_VIEWS', 'async')
 
 application = get_asgi_application()
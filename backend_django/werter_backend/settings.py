@@ -87,12 +87,56 @@ WSGI_APPLICATION = 'werter_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_PROFILE picks the configuration:
+# 'sqlite'  - plain SQLite, as for local development
+# 'sqlite-tuned' - SQLite in WAL mode with synchronous=NORMAL, a busy timeout so concurrent
+#           writers wait instead of failing with "database is locked", IMMEDIATE write
+#           transactions and persistent connections
+# 'postgres' - PostgreSQL from the POSTGRES_* variables with a psycopg connection pool
+#           (psycopg[binary,pool] in requirements.txt)
+DATABASE_PROFILE = os.getenv('DATABASE_PROFILE', 'sqlite')
+
+if DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'benchmate'),
+            'USER': os.getenv('POSTGRES_USER', 'benchmate'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('POSTGRES_POOL_MIN', 2)),
+                    'max_size': int(os.getenv('POSTGRES_POOL_MAX', 10)),
+                    'timeout': int(os.getenv('POSTGRES_POOL_TIMEOUT', 10)),
+                },
+            },
+        }
     }
-}
+elif DATABASE_PROFILE == 'sqlite-tuned':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+                'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 20)),  # seconds
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+elif DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+else:
+    raise ValueError(f"Unknown DATABASE_PROFILE: {DATABASE_PROFILE}")
 
 
 # Password validation
@@ -155,6 +199,132 @@ SIMPLE_JWT = {
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+# LLM client: backend is 'gemini' or 'stub' (offline, for load tests); timeout is the
+# deadline per call including retries
+LLM = {
+    'backend': os.getenv('LLM_BACKEND', 'gemini'),
+    'api_key': GEMINI_API_KEY,
+    'model_name': os.getenv('LLM_MODEL', 'models/gemini-2.5-flash'),
+    'max_concurrency': int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+    # Calls in flight from the async views; they hold no thread while waiting
+    'async_concurrency': int(os.getenv('LLM_ASYNC_CONCURRENCY', 256)),
+    'timeout': float(os.getenv('LLM_TIMEOUT', 60)),
+    'max_retries': int(os.getenv('LLM_MAX_RETRIES', 3)),
+    'stub_latency': float(os.getenv('LLM_STUB_LATENCY', 0.5)),
+    'stub_failure_rate': float(os.getenv('LLM_STUB_FAILURE_RATE', 0)),
+}
+
+# 'async' serves quiz, flashcard and chat generation from async views, for ASGI servers
+# (werter_backend.asgi defaults to it); 'sync' uses the DRF views, which WSGI servers such as
+# runserver need to stream events unbuffered
+LLM_VIEWS = os.getenv('LLM_VIEWS', 'sync')
+
+# Document ingestion: 'sync' extracts during the upload request, 'async' returns 202
+# and extracts on a background worker pool. Clients can override per upload with ?mode=.
+DOCUMENT_INGESTION_MODE = os.getenv('DOCUMENT_INGESTION_MODE', 'sync')
+INGESTION_WORKERS = int(os.getenv('INGESTION_WORKERS', 2))
+# Maximum characters per DocumentChunk; pages are never merged into one chunk
+DOCUMENT_CHUNK_SIZE = int(os.getenv('DOCUMENT_CHUNK_SIZE', 2000))
+# Document text endpoint: characters returned per request by default, and at most
+DOCUMENT_TEXT_PAGE_CHARS = int(os.getenv('DOCUMENT_TEXT_PAGE_CHARS', 20000))
+DOCUMENT_TEXT_MAX_CHARS = int(os.getenv('DOCUMENT_TEXT_MAX_CHARS', 200000))
+
+# Per-document search indexes, keyed by content hash
+INDEX_ROOT = Path(os.getenv('INDEX_ROOT', BASE_DIR / 'indexes'))
+# Chat context: best RETRIEVAL_TOP_K chunks that fit in RETRIEVAL_CONTEXT_CHARS
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', 8))
+RETRIEVAL_CONTEXT_CHARS = int(os.getenv('RETRIEVAL_CONTEXT_CHARS', 12000))
+# Chat prompt budget in estimated tokens; passages get whatever the instructions, summary,
+# history and question leave over. Older turns are summarized CHAT_SUMMARY_BATCH at a time.
+CHAT_PROMPT_TOKENS = int(os.getenv('CHAT_PROMPT_TOKENS', 5000))
+CHAT_HISTORY_TOKENS = int(os.getenv('CHAT_HISTORY_TOKENS', 1200))
+CHAT_HISTORY_MAX_TURNS = int(os.getenv('CHAT_HISTORY_MAX_TURNS', 20))
+CHAT_SUMMARY_TOKENS = int(os.getenv('CHAT_SUMMARY_TOKENS', 400))
+CHAT_SUMMARY_BATCH = int(os.getenv('CHAT_SUMMARY_BATCH', 4))
+CHAT_QUESTION_TOKENS = int(os.getenv('CHAT_QUESTION_TOKENS', 500))
+# Streaming chat: how often the partial assistant message is saved
+CHAT_STREAM_CHECKPOINT_SECONDS = float(os.getenv('CHAT_STREAM_CHECKPOINT_SECONDS', 2))
+# Topic quizzes: TF-IDF over sections of TOPIC_SECTION_CHARS, best sections up to TOPIC_CONTEXT_CHARS
+TOPIC_SECTION_CHARS = int(os.getenv('TOPIC_SECTION_CHARS', 6000))
+TOPIC_CONTEXT_CHARS = int(os.getenv('TOPIC_CONTEXT_CHARS', 18000))
+
+# Question bank: questions are generated QUESTION_BANK_PER_SECTION at a time for up to
+# QUESTION_BANK_FILL_SECTIONS sections per call, and refilled in the background once fewer
+# than QUESTION_BANK_REFILL_FACTOR x the requested count remain
+QUESTION_BANK_PER_SECTION = int(os.getenv('QUESTION_BANK_PER_SECTION', 8))
+QUESTION_BANK_FILL_SECTIONS = int(os.getenv('QUESTION_BANK_FILL_SECTIONS', 4))
+QUESTION_BANK_REFILL_FACTOR = int(os.getenv('QUESTION_BANK_REFILL_FACTOR', 3))
+
+# Coalescing of identical concurrent generations: 'process' (per worker), 'file' (also across
+# workers on this host, via lock files in SINGLE_FLIGHT_LOCK_DIR) or 'off'
+SINGLE_FLIGHT = {
+    'mode': os.getenv('SINGLE_FLIGHT', 'process'),
+    'lock_dir': os.getenv('SINGLE_FLIGHT_LOCK_DIR', BASE_DIR / 'locks'),
+}
+
+# Cache for generated quizzes/flashcards; backend is 'memory' or 'sqlite' (shared across processes)
+GENERATION_CACHE = {
+    'backend': os.getenv('GENERATION_CACHE_BACKEND', 'sqlite'),
+    'path': os.getenv('GENERATION_CACHE_PATH', BASE_DIR / 'generation_cache.sqlite3'),
+    'max_entries': int(os.getenv('GENERATION_CACHE_MAX_ENTRIES', 2048)),
+    'ttl': int(os.getenv('GENERATION_CACHE_TTL', 7 * 24 * 3600)),
+}
+
+# Django cache (holds the leaderboard snapshot). CACHE_BACKEND picks it:
+# 'locmem' - per process, so only for a single worker: another worker would keep serving a
+#            snapshot this one invalidated
+# 'file'   - files under CACHE_DIR, shared by every worker on the host
+# 'db'     - the django_cache table (python manage.py createcachetable), shared by every host
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'locmem':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', BASE_DIR / 'cache'),
+        }
+    }
+elif CACHE_BACKEND == 'db':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'django_cache'}}
+else:
+    raise ValueError(f"Unknown CACHE_BACKEND: {CACHE_BACKEND}")
+
+# Leaderboard: the first page is cached for at most this long
+LEADERBOARD_CACHE_SECONDS = int(os.getenv('LEADERBOARD_CACHE_SECONDS', 60))
+# Positions are counted exactly down to this rank; below it they are estimated from a cached
+# XP histogram, so one request never counts the whole table
+LEADERBOARD_EXACT_POSITIONS = int(os.getenv('LEADERBOARD_EXACT_POSITIONS', 1000))
+
+# XP outbox: events are drained in batches of XP_EVENT_BATCH_SIZE by a background thread after
+# each award ('background'), or only by the process_xp_events command ('command')
+XP_EVENT_DRAIN = os.getenv('XP_EVENT_DRAIN', 'background')
+XP_EVENT_BATCH_SIZE = int(os.getenv('XP_EVENT_BATCH_SIZE', 500))
+
+# Achievement thresholds are cached per process and reloaded at least this often
+ACHIEVEMENT_CACHE_SECONDS = int(os.getenv('ACHIEVEMENT_CACHE_SECONDS', 300))
+
 # Upload Limits
-DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB, form fields other than files
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
+# Largest PDF accepted; checked while the upload streams in
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 100 * 1024 * 1024))
+# Resumable uploads (/api/core/uploads/): partial files live in UPLOAD_SESSION_ROOT until
+# completed; sessions idle for UPLOAD_SESSION_TTL_HOURS are removed by clean_upload_sessions and
+# when their user starts another. A user may have MAX_OPEN_UPLOAD_SESSIONS unfinished at once
+MAX_SESSION_UPLOAD_BYTES = int(os.getenv('MAX_SESSION_UPLOAD_BYTES', 1024 * 1024 * 1024))
+UPLOAD_SESSION_ROOT = Path(os.getenv('UPLOAD_SESSION_ROOT', BASE_DIR / 'upload_sessions'))
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+UPLOAD_CHUNK_MIN = 256 * 1024
+UPLOAD_CHUNK_MAX = 64 * 1024 * 1024
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv('UPLOAD_SESSION_TTL_HOURS', 48))
+MAX_OPEN_UPLOAD_SESSIONS = int(os.getenv('MAX_OPEN_UPLOAD_SESSIONS', 3))
+
+# Upload handlers: reject oversized and non-PDF files early, hash so duplicate uploads can
+# skip extraction, and spool every file to a temp file in 64 KB chunks (never to memory)
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.PdfGuardUploadHandler',
+    'core.uploadhandlers.HashingUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
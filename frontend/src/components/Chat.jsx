@@ -1,5 +1,5 @@
 import { useState, useRef, useEffect } from 'react';
-import api from '../api';
+import api, { streamEvents } from '../api';
 import { motion, AnimatePresence } from 'framer-motion';
 import { MessageSquare, Send, Loader, Bot, User, PlusCircle } from 'lucide-react';
 
@@ -43,14 +43,25 @@ const Chat = ({ pdfId, onAddToNotes }) => {
             const newMessages = [...messages, userMessage];
             setMessages(newMessages);
 
-            const response = await api.post('/core/chat/', {
+            // The reply bubble appears with the first token and grows as the rest stream in
+            let started = false;
+            const appendToReply = (text) => {
+                const first = !started;
+                started = true;
+                setMessages(prev => {
+                    if (first) return [...prev, { role: 'assistant', content: text }];
+                    const last = prev[prev.length - 1];
+                    return [...prev.slice(0, -1), { ...last, content: last.content + text }];
+                });
+            };
+
+            await streamEvents('/core/chat/stream/', {
                 pdf_id: pdfId,
                 message: userMessage.content,
-                // History is handled by backend now
+            }, (event, data) => {
+                if (event === 'token') appendToReply(data.text);
+                if (event === 'error') throw new Error(data.error);
             });
-
-            const botMessage = { role: 'assistant', content: response.data.response };
-            setMessages([...newMessages, botMessage]);
         } catch (error) {
             console.error('Chat failed:', error);
             setMessages(prev => [...prev, { role: 'assistant', content: 'Sorry, I encountered an error. Please try again.' }]);
@@ -109,7 +120,7 @@ const Chat = ({ pdfId, onAddToNotes }) => {
                             )}
                         </motion.div>
                     ))}
-                    {loading && (
+                    {loading && messages[messages.length - 1]?.role !== 'assistant' && (
                         <div className="flex gap-3 justify-start">
                             <div className="w-8 h-8 rounded-full bg-purple-500/20 flex items-center justify-center border border-purple-500/30">
                                 <Bot className="w-5 h-5 text-purple-400" />
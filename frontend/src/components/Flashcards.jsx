@@ -1,5 +1,5 @@
 import { useState } from 'react';
-import api from '../api';
+import { streamEvents } from '../api';
 import { motion, AnimatePresence } from 'framer-motion';
 import { Layers, Loader, ChevronLeft, ChevronRight } from 'lucide-react';
 
@@ -12,16 +12,21 @@ const Flashcards = ({ pdfId }) => {
 
     const generateFlashcards = async () => {
         setLoading(true);
+        setFlashcards(null);
+        setCurrentIndex(0);
+        setIsFlipped(false);
         try {
-            const response = await api.post('/core/generate/flashcards/', {
+            // Cards arrive one at a time; the first one is shown as soon as it is ready
+            await streamEvents('/core/generate/flashcards/stream/', {
                 pdf_id: pdfId,
                 num_cards: numCards,
+            }, (event, data) => {
+                if (event === 'card') {
+                    setFlashcards(prev => ({ flashcards: [...(prev?.flashcards || []), data] }));
+                    setLoading(false);
+                }
+                if (event === 'error') throw new Error(data.error);
             });
-
-            const flashcardsData = JSON.parse(response.data.flashcards);
-            setFlashcards(flashcardsData);
-            setCurrentIndex(0);
-            setIsFlipped(false);
         } catch (error) {
             console.error('Flashcard generation failed:', error);
             alert('Failed to generate flashcards. Please try again.');
@@ -11,7 +11,7 @@ const Leaderboard = () => {
         const fetchLeaderboard = async () => {
             try {
                 const response = await api.get('/gamification/leaderboard/');
-                setUsers(response.data);
+                setUsers(response.data.results);
             } catch (error) {
                 console.error('Failed to fetch leaderboard:', error);
             } finally {
@@ -23,8 +23,7 @@ const Quiz = ({ pdfId, onComplete }) => {
                 topic: topic
             });
 
-            const quizData = JSON.parse(response.data.quiz);
-            setQuiz(quizData);
+            setQuiz(response.data.quiz);
             setAnswers({});
             setShowResults(false);
         } catch (error) {
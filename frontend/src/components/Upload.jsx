@@ -3,6 +3,45 @@ import api from '../api';
 import { motion } from 'framer-motion';
 import { Upload as UploadIcon, FileText, Loader } from 'lucide-react';
 
+// Files above this go through a resumable upload session, one chunk per request
+const RESUMABLE_THRESHOLD = 20 * 1024 * 1024;
+const CHUNK_ATTEMPTS = 5;
+
+const sessionKey = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+const putChunk = async (uploadId, index, blob) => {
+    for (let attempt = 1; ; attempt++) {
+        try {
+            return await api.put(`/core/uploads/${uploadId}/chunks/${index}/`, blob, {
+                headers: { 'Content-Type': 'application/octet-stream' },
+            });
+        } catch (error) {
+            if (error.response?.status < 500 || attempt >= CHUNK_ATTEMPTS) throw error;
+            await new Promise((resolve) => setTimeout(resolve, 1000 * attempt));
+        }
+    }
+};
+
+// Resumes a session left by an interrupted upload of the same file
+const resumableUpload = async (file) => {
+    let session = null;
+    const savedId = localStorage.getItem(sessionKey(file));
+    if (savedId) {
+        session = await api.get(`/core/uploads/${savedId}/`).then((r) => r.data, () => null);
+    }
+    if (!session || session.state !== 'open') {
+        session = (await api.post('/core/uploads/', { filename: file.name, size: file.size })).data;
+        localStorage.setItem(sessionKey(file), session.upload_id);
+    }
+    for (const index of session.missing) {
+        const start = index * session.chunk_size;
+        await putChunk(session.upload_id, index, file.slice(start, start + session.chunk_size));
+    }
+    const response = await api.post(`/core/uploads/${session.upload_id}/complete/`);
+    localStorage.removeItem(sessionKey(file));
+    return response;
+};
+
 const Upload = ({ onUploadSuccess }) => {
     const [file, setFile] = useState(null);
     const [uploading, setUploading] = useState(false);
@@ -53,11 +92,13 @@ const Upload = ({ onUploadSuccess }) => {
         formData.append('file', file);
 
         try {
-            const response = await api.post('/core/upload/', formData, {
-                headers: {
-                    'Content-Type': 'multipart/form-data',
-                },
-            });
+            const response = file.size > RESUMABLE_THRESHOLD
+                ? await resumableUpload(file)
+                : await api.post('/core/upload/', formData, {
+                    headers: {
+                        'Content-Type': 'multipart/form-data',
+                    },
+                });
             onUploadSuccess(response.data);
             setFile(null);
         } catch (error) {
@@ -134,7 +175,7 @@ const Upload = ({ onUploadSuccess }) => {
                                 Drag and drop your PDF here, or click to browse
                             </p>
                             <p className="text-sm text-white/50">
-                                PDF files only, up to 10MB
+                                PDF files only; large files resume if the connection drops
                             </p>
                         </div>
                     )}
@@ -11,6 +11,7 @@ const Dashboard = () => {
     const { user, logout } = useContext(AuthContext);
     const [profile, setProfile] = useState(null);
     const [documents, setDocuments] = useState([]);
+    const [nextDocuments, setNextDocuments] = useState(null);
     const [showUpload, setShowUpload] = useState(false);
     const [error, setError] = useState(null);
 
@@ -29,10 +30,12 @@ const Dashboard = () => {
         }
     };
 
-    const fetchDocuments = async () => {
+    // The first page replaces the list; "Load more" follows the cursor and appends
+    const fetchDocuments = async (url = null) => {
         try {
-            const response = await api.get('/core/upload/');
-            setDocuments(response.data);
+            const response = await api.get(url || '/core/documents/');
+            setDocuments((previous) => (url ? [...previous, ...response.data.results] : response.data.results));
+            setNextDocuments(response.data.next);
         } catch (error) {
             console.error('Error fetching documents:', error);
         }
@@ -118,15 +121,24 @@ const Dashboard = () => {
                                     </span>
                                 </div>
                             </div>
-                            <h3 className="font-bold text-lg mb-2 truncate" title={doc.file.split('/').pop()}>
-                                {doc.file.split('/').pop()}
+                            <h3 className="font-bold text-lg mb-2 truncate" title={doc.filename}>
+                                {doc.filename}
                             </h3>
                             <p className="text-sm text-white/60">
-                                Click to open workspace
+                                {doc.status === 'ready' ? `${doc.pages} pages · Click to open workspace` : doc.status === 'processing' ? 'Processing…' : 'Processing failed'}
                             </p>
                         </Link>
                     ))}
 
+                    {nextDocuments && (
+                        <button
+                            onClick={() => fetchDocuments(nextDocuments)}
+                            className="col-span-full py-2 text-sm text-white/60 bg-white/5 rounded-xl hover:bg-white/10 transition-colors"
+                        >
+                            Load more
+                        </button>
+                    )}
+
                     {documents.length === 0 && !showUpload && (
                         <div className="col-span-full text-center py-20 text-white/40">
                             <p>No documents yet. Upload one to get started!</p>
@@ -1,15 +1,27 @@
 import { useState, useEffect } from 'react';
 import api from '../api';
 import { motion } from 'framer-motion';
-import { Trophy, Star, Calendar, History, ArrowLeft } from 'lucide-react';
+import { Trophy, Star, Calendar, History, ArrowLeft, Target, Flame } from 'lucide-react';
 import { Link } from 'react-router-dom';
 import Header from '../components/Header';
 
 const Profile = () => {
     const [profile, setProfile] = useState(null);
+    const [history, setHistory] = useState([]);
+    const [nextHistory, setNextHistory] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
+    const fetchHistory = async (url = '/gamification/quiz-history/') => {
+        try {
+            const response = await api.get(url);
+            setHistory((previous) => [...previous, ...response.data.results]);
+            setNextHistory(response.data.next);
+        } catch (error) {
+            console.error('Failed to fetch quiz history:', error);
+        }
+    };
+
     useEffect(() => {
         const fetchProfile = async () => {
             try {
@@ -23,6 +35,7 @@ const Profile = () => {
             }
         };
         fetchProfile();
+        fetchHistory();
     }, []);
 
     if (loading) return <div className="text-white text-center mt-20">Loading...</div>;
@@ -67,6 +80,9 @@ const Profile = () => {
                         <StatCard icon={<Star className="text-yellow-400" />} label="Total XP" value={profile.xp} />
                         <StatCard icon={<Calendar className="text-blue-400" />} label="Weekly XP" value={profile.weekly_xp} />
                         <StatCard icon={<Trophy className="text-purple-400" />} label="Level" value={profile.level} />
+                        <StatCard icon={<History className="text-green-400" />} label="Quizzes" value={profile.total_quizzes} />
+                        <StatCard icon={<Target className="text-pink-400" />} label="Accuracy" value={profile.accuracy === null ? '-' : `${profile.accuracy}%`} />
+                        <StatCard icon={<Flame className="text-orange-400" />} label="Streak" value={`${profile.current_streak} days`} />
                     </div>
                 </div>
 
@@ -98,9 +114,9 @@ const Profile = () => {
                         <h2 className="text-xl font-bold mb-4 flex items-center gap-2">
                             <History className="w-5 h-5 text-blue-400" /> Recent Activity
                         </h2>
-                        {profile.quiz_history.length > 0 ? (
+                        {history.length > 0 ? (
                             <div className="space-y-4 max-h-[400px] overflow-y-auto custom-scrollbar">
-                                {profile.quiz_history.slice().reverse().map((quiz, i) => (
+                                {history.map((quiz, i) => (
                                     <div key={i} className="flex justify-between items-center p-3 bg-white/5 rounded-xl">
                                         <div>
                                             <p className="font-semibold">Quiz Completed</p>
@@ -112,6 +128,14 @@ const Profile = () => {
                                         </div>
                                     </div>
                                 ))}
+                                {nextHistory && (
+                                    <button
+                                        onClick={() => fetchHistory(nextHistory)}
+                                        className="w-full py-2 text-sm text-white/60 bg-white/5 rounded-xl hover:bg-white/10 transition-colors"
+                                    >
+                                        Load more
+                                    </button>
+                                )}
                             </div>
                         ) : (
                             <p className="text-white/40 text-center py-8">No quizzes taken yet.</p>
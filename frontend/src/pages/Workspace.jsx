@@ -17,11 +17,8 @@ const Workspace = () => {
     useEffect(() => {
         const fetchDocument = async () => {
             try {
-                // We might need a specific endpoint for single doc or filter list
-                // For now, let's assume we can get it or just use the ID
-                // Ideally we should have an endpoint like /core/documents/:id/
-                // But we can just proceed with the ID for now
-                setDocument({ id: pdfId, name: 'Document' });
+                const response = await api.get(`/core/documents/${pdfId}/?fields=id,filename,status`);
+                setDocument({ id: pdfId, name: response.data.filename, status: response.data.status });
             } catch (error) {
                 console.error('Failed to load document', error);
             }
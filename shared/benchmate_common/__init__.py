@@ -0,0 +1,7 @@
+"""Framework-independent code used by both backends.
+
+The FastAPI app (``backend/``) and the Django project (``backend_django/``)
+both import PDF extraction, the LLM client, structured-output parsing, the
+generation cache and single-flight coalescing from here. Install it next to
+either backend with ``pip install -e ../shared``.
+"""
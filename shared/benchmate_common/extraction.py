@@ -0,0 +1,121 @@
+"""Parallel PDF text extraction.
+
+Pages are split into contiguous ranges and fanned out to a bounded process
+pool; each worker opens the PDF from disk and extracts its range. Results are
+joined back in page order with a single ``str.join``.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from pypdf import PdfReader
+
+# Upper bound on worker processes shared by every upload in this process.
+MAX_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+# Below this many pages the pool overhead outweighs the gain; extract inline.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_EXTRACT_PARALLEL_MIN_PAGES", 16))
+# Each worker gets several ranges so a slow range does not stall the others.
+RANGES_PER_WORKER = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+@dataclass
+class ExtractionResult:
+    pages: list = field(default_factory=list)
+    page_times: list = field(default_factory=list)  # seconds spent per page
+    elapsed: float = 0.0  # wall-clock seconds for the whole document
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+    @property
+    def text(self):
+        return "".join(page + "\n" for page in self.pages)
+
+
+def get_executor():
+    """Return the shared process pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn rather than fork: both backends run threads (and gRPC)
+            # that are not fork-safe.
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def _extract_range(path, start, stop):
+    reader = PdfReader(path)
+    results = []
+    for index in range(start, stop):
+        started = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        results.append((text, time.perf_counter() - started))
+    return results
+
+
+def _page_ranges(page_count, chunks):
+    size = max(1, -(-page_count // chunks))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def extract_pdf(path, max_workers=None, on_progress=None):
+    """Extract the text of every page of the PDF at ``path``.
+
+    ``max_workers`` controls how finely the pages are split across the pool
+    (never beyond ``MAX_WORKERS``); pass 1 to force inline extraction.
+    ``on_progress(pages_done, page_count)`` is called from the calling thread
+    before the first range and after each range finishes.
+    """
+    started = time.perf_counter()
+    workers = min(max_workers or MAX_WORKERS, MAX_WORKERS)
+    page_count = len(PdfReader(path).pages)
+    ranges = _page_ranges(page_count, max(workers, 1) * RANGES_PER_WORKER)
+    batches = [None] * len(ranges)
+    pages_done = 0
+    if on_progress:
+        on_progress(0, page_count)
+
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        for index, (start, stop) in enumerate(ranges):
+            batches[index] = _extract_range(path, start, stop)
+            pages_done += stop - start
+            if on_progress:
+                on_progress(pages_done, page_count)
+    else:
+        executor = get_executor()
+        futures = {
+            executor.submit(_extract_range, path, start, stop): index
+            for index, (start, stop) in enumerate(ranges)
+        }
+        for future in as_completed(futures):
+            batch = future.result()
+            batches[futures[future]] = batch
+            pages_done += len(batch)
+            if on_progress:
+                on_progress(pages_done, page_count)
+
+    result = ExtractionResult()
+    for batch in batches:
+        for text, seconds in batch:
+            result.pages.append(text)
+            result.page_times.append(seconds)
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,229 @@
+"""Cache for LLM-generated quizzes and flashcards.
+
+Entries are keyed by a hash of the document content, the generation kind and
+its parameters, and evicted by TTL and by least-recent use once the backend
+holds ``max_entries``. With a ``SingleFlight``, concurrent misses for the same
+key share one generation. Two backends are provided: an in-process dict and a
+SQLite file that can be shared by several worker processes.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    blocking = False  # reads and writes only take an in-process lock
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    blocking = True  # reads and writes wait on the disk and on other writers
+
+    def __init__(self, path, max_entries=1024):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS generation_cache_accessed "
+                "ON generation_cache (accessed_at)"
+            )
+
+    def _connect(self):
+        # One connection per thread; sqlite3 connections are not thread-safe.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, now):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM generation_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE generation_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value, expires_at):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO generation_cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            conn.execute("DELETE FROM generation_cache WHERE expires_at <= ?", (now,))
+            overflow = conn.execute("SELECT COUNT(*) FROM generation_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM generation_cache WHERE key IN ("
+                    "SELECT key FROM generation_cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM generation_cache").fetchone()[0]
+
+
+class GenerationCache:
+    def __init__(self, backend, ttl=3600, clock=time.time, flight=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.clock = clock
+        self.flight = flight  # optional SingleFlight that coalesces concurrent misses
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(content_hash, kind, params):
+        raw = json.dumps([content_hash, kind, params], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _recheck(self, key, fresh):
+        # What a leader in another process looks at once it holds the key's lock
+        if fresh:
+            return None
+        return lambda: self.backend.get(key, self.clock())
+
+    def get_or_generate(self, content_hash, kind, params, generate, fresh=False):
+        """Return ``(value, cached)``; ``generate()`` runs on a miss or when ``fresh`` is set."""
+        key = self.make_key(content_hash, kind, params)
+        if not fresh:
+            value = self.backend.get(key, self.clock())
+            if value is not None:
+                self._count(hit=True)
+                return value, True
+        self._count(hit=False)
+
+        def generate_and_store():
+            value = generate()
+            self.backend.set(key, value, self.clock() + self.ttl)
+            return value
+
+        if self.flight is None:
+            return generate_and_store(), False
+        return self.flight.do(key, generate_and_store, recheck=self._recheck(key, fresh))
+
+    async def _acall(self, method, *args):
+        # A blocking backend runs in a worker thread so it does not stall the event loop
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def aget_or_generate(self, content_hash, kind, params, generate, fresh=False):
+        """Async variant of ``get_or_generate``; ``generate`` is a coroutine function."""
+        key = self.make_key(content_hash, kind, params)
+        if not fresh:
+            value = await self._acall(self.backend.get, key, self.clock())
+            if value is not None:
+                self._count(hit=True)
+                return value, True
+        self._count(hit=False)
+
+        async def generate_and_store():
+            value = await generate()
+            await self._acall(self.backend.set, key, value, self.clock() + self.ttl)
+            return value
+
+        if self.flight is None:
+            return await generate_and_store(), False
+        return await self.flight.ado(key, generate_and_store, recheck=self._recheck(key, fresh))
+
+    def get(self, content_hash, kind, params):
+        """Cached value or None, counted as a hit or miss (for callers that generate themselves)."""
+        value = self.backend.get(self.make_key(content_hash, kind, params), self.clock())
+        self._count(hit=value is not None)
+        return value
+
+    def set(self, content_hash, kind, params, value):
+        self.backend.set(self.make_key(content_hash, kind, params), value, self.clock() + self.ttl)
+
+    async def aget(self, content_hash, kind, params):
+        value = await self._acall(self.backend.get, self.make_key(content_hash, kind, params), self.clock())
+        self._count(hit=value is not None)
+        return value
+
+    async def aset(self, content_hash, kind, params, value):
+        await self._acall(self.backend.set, self.make_key(content_hash, kind, params), value, self.clock() + self.ttl)
+
+    def invalidate(self, content_hash, kind, params):
+        self.backend.delete(self.make_key(content_hash, kind, params))
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.backend),
+            "evictions": self.backend.evictions,
+            "coalesced": self.flight.stats["coalesced"] if self.flight else 0,
+        }
+
+
+def create_cache(backend="memory", path=None, max_entries=1024, ttl=3600, flight=None):
+    """Build a cache from configuration values (``backend`` is "memory" or "sqlite")."""
+    if backend == "sqlite":
+        return GenerationCache(SQLiteBackend(path, max_entries=max_entries), ttl=ttl, flight=flight)
+    if backend == "memory":
+        return GenerationCache(MemoryBackend(max_entries=max_entries), ttl=ttl, flight=flight)
+    raise ValueError(f"Unknown generation cache backend: {backend}")
@@ -0,0 +1,366 @@
+"""Shared LLM client with concurrency limits, deadlines and retries.
+
+``LLMClient`` wraps a backend (Gemini, or a local stub for tests and
+benchmarks) and offers a sync ``generate`` and ``stream`` and their async
+counterparts ``agenerate`` and ``astream``. The async path awaits the
+backend's own ``agenerate``/``astream`` when it has them, so a waiting call
+holds no thread; otherwise it runs the blocking SDK call on a thread pool
+so the event loop is never blocked. Sync calls are capped at
+``max_concurrency`` in flight and async ones at ``async_concurrency``;
+every call has a deadline covering all of its attempts, and transient errors
+are retried with jittered exponential backoff.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMTimeout(LLMError):
+    pass
+
+
+class TransientLLMError(LLMError):
+    """A failure worth retrying (rate limit, overload, dropped connection)."""
+
+
+class GeminiBackend:
+    def __init__(self, api_key, model_name="models/gemini-2.5-flash"):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def _generation_config(self, schema):
+        if schema is None:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": schema}
+
+    def generate(self, prompt, timeout, schema=None):
+        return self.model.generate_content(
+            prompt, generation_config=self._generation_config(schema), request_options={"timeout": timeout}
+        ).text
+
+    async def agenerate(self, prompt, timeout, schema=None):
+        response = await self.model.generate_content_async(
+            prompt, generation_config=self._generation_config(schema), request_options={"timeout": timeout}
+        )
+        return response.text
+
+    def stream(self, prompt, timeout, schema=None):
+        response = self.model.generate_content(
+            prompt, stream=True, generation_config=self._generation_config(schema),
+            request_options={"timeout": timeout},
+        )
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    async def astream(self, prompt, timeout, schema=None):
+        response = await self.model.generate_content_async(
+            prompt, stream=True, generation_config=self._generation_config(schema),
+            request_options={"timeout": timeout},
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def is_transient(self, exc):
+        from google.api_core import exceptions
+
+        return isinstance(exc, (
+            exceptions.TooManyRequests,
+            exceptions.ResourceExhausted,
+            exceptions.ServiceUnavailable,
+            exceptions.InternalServerError,
+            exceptions.DeadlineExceeded,
+            ConnectionError,
+        ))
+
+
+class StubBackend:
+    """Offline backend with configurable latency and failure rate; ``schema`` is ignored."""
+
+    def __init__(self, latency=0.5, jitter=0.0, failure_rate=0.0, response='{"questions": []}', seed=None,
+                 token_delay=0.0):
+        self.latency = latency  # time to the first token
+        self.token_delay = token_delay  # time between streamed tokens
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.response = response
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _next_call(self):
+        with self._lock:
+            self.calls += 1
+            return self.latency + self._rng.uniform(0, self.jitter), self._rng.random() < self.failure_rate
+
+    def _answer(self, prompt, fail):
+        if fail:
+            raise TransientLLMError("stub backend failure")
+        return self.response(prompt) if callable(self.response) else self.response
+
+    def generate(self, prompt, timeout, schema=None):
+        delay, fail = self._next_call()
+        if delay > timeout:
+            time.sleep(timeout)
+            raise LLMTimeout(f"stub call exceeded {timeout:.2f}s")
+        time.sleep(delay)
+        return self._answer(prompt, fail)
+
+    async def agenerate(self, prompt, timeout, schema=None):
+        delay, fail = self._next_call()
+        if delay > timeout:
+            await asyncio.sleep(timeout)
+            raise LLMTimeout(f"stub call exceeded {timeout:.2f}s")
+        await asyncio.sleep(delay)
+        return self._answer(prompt, fail)
+
+    def stream(self, prompt, timeout, schema=None):
+        deadline = time.monotonic() + timeout
+        text = self.generate(prompt, timeout)
+        for index, token in enumerate(text.split(" ")):
+            if index:
+                if time.monotonic() + self.token_delay > deadline:
+                    raise LLMTimeout("stub stream exceeded its deadline")
+                time.sleep(self.token_delay)
+            yield token if index == 0 else " " + token
+
+    async def astream(self, prompt, timeout, schema=None):
+        deadline = time.monotonic() + timeout
+        text = await self.agenerate(prompt, timeout)
+        for index, token in enumerate(text.split(" ")):
+            if index:
+                if time.monotonic() + self.token_delay > deadline:
+                    raise LLMTimeout("stub stream exceeded its deadline")
+                await asyncio.sleep(self.token_delay)
+            yield token if index == 0 else " " + token
+
+    def is_transient(self, exc):
+        return False
+
+
+class LLMClient:
+    def __init__(self, backend, max_concurrency=8, timeout=60.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, async_concurrency=None):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        # Native async calls cost no thread, so they may have many more in flight
+        self.native_async = hasattr(backend, "agenerate")
+        self.async_concurrency = (async_concurrency or max_concurrency) if self.native_async else max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._async_semaphores = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "timeouts": 0, "failures": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self.stats[name] += delta
+            if name == "in_flight":
+                self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+
+    def _is_transient(self, exc):
+        return isinstance(exc, TransientLLMError) or self.backend.is_transient(exc)
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _call_backend(self, prompt, remaining, schema=None):
+        self._count("in_flight")
+        try:
+            return self.backend.generate(prompt, remaining, schema=schema)
+        finally:
+            self._count("in_flight", -1)
+
+    async def _acall_backend(self, prompt, remaining, schema=None):
+        self._count("in_flight")
+        try:
+            return await self.backend.agenerate(prompt, remaining, schema=schema)
+        finally:
+            self._count("in_flight", -1)
+
+    def generate(self, prompt, timeout=None, schema=None):
+        """Generate a completion, blocking the calling thread.
+
+        ``schema`` asks the backend for JSON matching that response schema.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._semaphore.acquire(timeout=remaining):
+                break
+            try:
+                return self._call_backend(prompt, deadline - time.monotonic(), schema)
+            except LLMTimeout:
+                break
+            except Exception as exc:
+                if not self._is_transient(exc) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+            finally:
+                self._semaphore.release()
+            self._count("retries")
+            time.sleep(max(0, min(self._backoff(attempt), deadline - time.monotonic())))
+        self._count("timeouts")
+        raise LLMTimeout(f"LLM call did not finish within {timeout or self.timeout:.1f}s")
+
+    def stream(self, prompt, timeout=None, schema=None):
+        """Yield text chunks as they arrive, blocking the calling thread.
+
+        Transient errors are retried only until the first chunk has been
+        yielded; after that they propagate to the consumer.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._semaphore.acquire(timeout=remaining):
+                break
+            emitted = False
+            self._count("in_flight")
+            try:
+                for chunk in self.backend.stream(prompt, deadline - time.monotonic(), schema=schema):
+                    emitted = True
+                    yield chunk
+                return
+            except LLMTimeout:
+                break
+            except Exception as exc:
+                if emitted or not self._is_transient(exc) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+            finally:
+                self._count("in_flight", -1)
+                self._semaphore.release()
+            self._count("retries")
+            time.sleep(max(0, min(self._backoff(attempt), deadline - time.monotonic())))
+        self._count("timeouts")
+        raise LLMTimeout(f"LLM call did not finish within {timeout or self.timeout:.1f}s")
+
+    def _async_semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.async_concurrency)
+        return semaphore
+
+    async def agenerate(self, prompt, timeout=None, schema=None):
+        """Generate a completion without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + (timeout or self.timeout)
+        semaphore = self._async_semaphore()
+        self._count("calls")
+
+        async def attempt_call():
+            async with semaphore:
+                remaining = deadline - time.monotonic()
+                if self.native_async:
+                    return await self._acall_backend(prompt, remaining, schema)
+                return await loop.run_in_executor(self._executor, self._call_backend, prompt, remaining, schema)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await asyncio.wait_for(attempt_call(), deadline - time.monotonic())
+            except (asyncio.TimeoutError, LLMTimeout):
+                break
+            except Exception as exc:
+                if not self._is_transient(exc) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+            self._count("retries")
+            await asyncio.sleep(max(0, min(self._backoff(attempt), deadline - time.monotonic())))
+            if deadline - time.monotonic() <= 0:
+                break
+        self._count("timeouts")
+        raise LLMTimeout(f"LLM call did not finish within {timeout or self.timeout:.1f}s")
+
+    async def _abackend_stream(self, prompt, remaining, schema):
+        if hasattr(self.backend, "astream"):
+            async for chunk in self.backend.astream(prompt, remaining, schema=schema):
+                yield chunk
+            return
+        # Each chunk of the blocking stream is pulled on the thread pool
+        loop = asyncio.get_running_loop()
+        chunks = self.backend.stream(prompt, remaining, schema=schema)
+        end = object()
+        pending = None
+        try:
+            while True:
+                pending = loop.run_in_executor(self._executor, next, chunks, end)
+                chunk = await pending
+                if chunk is end:
+                    return
+                yield chunk
+        finally:
+            if pending is None or pending.done():
+                chunks.close()
+            else:
+                # Cancelled mid-chunk: close the generator once its thread lets go of it
+                pending.add_done_callback(lambda _: self._executor.submit(chunks.close))
+
+    async def astream(self, prompt, timeout=None, schema=None):
+        """Async ``stream``: yield text chunks as they arrive without blocking the event loop.
+
+        As with ``stream``, transient errors are retried only until the first
+        chunk has been yielded.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        semaphore = self._async_semaphore()
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            try:
+                await asyncio.wait_for(semaphore.acquire(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            emitted = False
+            self._count("in_flight")
+            chunks = self._abackend_stream(prompt, deadline - time.monotonic(), schema)
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), deadline - time.monotonic())
+                    except StopAsyncIteration:
+                        return
+                    emitted = True
+                    yield chunk
+            except (asyncio.TimeoutError, LLMTimeout):
+                break
+            except Exception as exc:
+                if emitted or not self._is_transient(exc) or attempt == self.max_retries:
+                    self._count("failures")
+                    raise
+            finally:
+                await chunks.aclose()
+                self._count("in_flight", -1)
+                semaphore.release()
+            self._count("retries")
+            await asyncio.sleep(max(0, min(self._backoff(attempt), deadline - time.monotonic())))
+            if deadline - time.monotonic() <= 0:
+                break
+        self._count("timeouts")
+        raise LLMTimeout(f"LLM call did not finish within {timeout or self.timeout:.1f}s")
+
+
+def create_client(backend="gemini", api_key=None, model_name="models/gemini-2.5-flash",
+                  stub_latency=0.5, stub_failure_rate=0.0, **options):
+    """Build a client from configuration values (``backend`` is "gemini" or "stub")."""
+    if backend == "gemini":
+        return LLMClient(GeminiBackend(api_key, model_name), **options)
+    if backend == "stub":
+        return LLMClient(StubBackend(latency=stub_latency, failure_rate=stub_failure_rate), **options)
+    raise ValueError(f"Unknown LLM backend: {backend}")
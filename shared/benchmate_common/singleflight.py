@@ -0,0 +1,160 @@
+"""Single-flight coalescing of identical concurrent calls.
+
+Callers that ask for the same key while a call for it is in flight wait for
+that call and share its result instead of starting their own. With a
+``lock_dir`` the leader additionally holds an exclusive file lock for the
+key, so leaders in other worker processes queue behind it; once they get the
+lock they run ``recheck()`` (typically a lookup in a shared cache) and only
+call ``fn`` if it finds nothing.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import weakref
+from pathlib import Path
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir=None):
+        self.lock_dir = Path(lock_dir) if lock_dir else None
+        if self.lock_dir is not None:
+            self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self._calls = {}
+        self._async_calls = weakref.WeakKeyDictionary()  # event loop -> {key: Future}
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _lock_file(self, key):
+        import fcntl
+
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        fd = os.open(self.lock_dir / f"{name}.lock", os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def _unlock_file(self, fd):
+        import fcntl
+
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _recheck(self, recheck):
+        value = recheck() if recheck is not None else None
+        if value is not None:
+            self._count("coalesced")
+        return value
+
+    def do(self, key, fn, recheck=None):
+        """Call ``fn()`` once for concurrent callers with the same ``key``; return ``(value, shared)``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            self._count("coalesced")
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            fd = self._lock_file(key) if self.lock_dir is not None else None
+            try:
+                value = self._recheck(recheck) if fd is not None else None
+                shared = value is not None
+                if not shared:
+                    self._count("leaders")
+                    value = fn()
+            finally:
+                if fd is not None:
+                    self._unlock_file(fd)
+            call.value = value
+            return value, shared
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn, recheck=None):
+        """Async variant of ``do``; ``fn`` is a coroutine function."""
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.setdefault(loop, {})
+        future = calls.get(key)
+        if future is not None:
+            self._count("coalesced")
+            return await asyncio.shield(future), True
+
+        # The call runs in a task of its own, so cancelling the caller that started it
+        # (a client that disconnected) does not cancel it for the followers
+        future = calls[key] = loop.create_future()
+        task = loop.create_task(self._alead(key, fn, recheck, calls, future))
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.shield(task)
+
+    async def _alead(self, key, fn, recheck, calls, future):
+        loop = asyncio.get_running_loop()
+        fd = None
+        try:
+            if self.lock_dir is not None:
+                fd = await self._alock_file(key)
+            # recheck() usually reads a shared cache or database; keep it off the loop
+            value = await loop.run_in_executor(None, self._recheck, recheck) if fd is not None else None
+            shared = value is not None
+            if not shared:
+                self._count("leaders")
+                value = await fn()
+            future.set_result(value)
+            return value, shared
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            if fd is not None:
+                self._unlock_file(fd)
+            del calls[key]
+
+    async def _alock_file(self, key):
+        acquire = asyncio.get_running_loop().run_in_executor(None, self._lock_file, key)
+        try:
+            return await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The executor thread cannot be interrupted; release the lock once it has it
+            acquire.add_done_callback(
+                lambda done: done.cancelled() or done.exception() or self._unlock_file(done.result())
+            )
+            raise
+
+
+def create_flight(mode="process", lock_dir=None):
+    """Build a coalescer from configuration values (``mode`` is "process", "file" or "off")."""
+    if mode == "process":
+        return SingleFlight()
+    if mode == "file":
+        return SingleFlight(lock_dir=lock_dir)
+    if mode == "off":
+        return None
+    raise ValueError(f"Unknown single-flight mode: {mode}")
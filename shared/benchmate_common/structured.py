@@ -0,0 +1,188 @@
+"""Schemas, validation and incremental parsing for structured model output.
+
+Quiz and flashcard generation asks the model for a JSON object holding one
+array of items (``{"questions": [...]}`` or ``{"flashcards": [...]}``), with
+a response schema when the backend supports one. ``ItemStream`` consumes the
+answer as it streams and hands back each array element as soon as its
+closing brace arrives, so items can be validated, stored and sent to the
+client one by one. Output that is not JSON, or keeps producing invalid
+items, raises ``MalformedOutput`` early instead of after the whole answer.
+"""
+import json
+
+OPTION_KEYS = ("A", "B", "C", "D")
+
+QUIZ_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string"},
+                    "options": {
+                        "type": "object",
+                        "properties": {key: {"type": "string"} for key in OPTION_KEYS},
+                        "required": list(OPTION_KEYS),
+                    },
+                    "correct_answer": {"type": "string", "enum": list(OPTION_KEYS)},
+                },
+                "required": ["question", "options", "correct_answer"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+FLASHCARD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "flashcards": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"front": {"type": "string"}, "back": {"type": "string"}},
+                "required": ["front", "back"],
+            },
+        },
+    },
+    "required": ["flashcards"],
+}
+
+
+class MalformedOutput(ValueError):
+    pass
+
+
+def validate_question(item):
+    """Return a clean question dict, or None if ``item`` is not a usable question."""
+    if not isinstance(item, dict) or not isinstance(item.get("options"), dict):
+        return None
+    question = str(item.get("question", "")).strip()
+    options = {key: str(item["options"].get(key, "")).strip() for key in OPTION_KEYS}
+    answer = str(item.get("correct_answer", "")).strip().upper()[:1]
+    if not question or not all(options.values()) or answer not in OPTION_KEYS:
+        return None
+    return {"question": question, "options": options, "correct_answer": answer}
+
+
+def validate_card(item):
+    """Return a clean flashcard dict, or None if ``item`` is not a usable card."""
+    if not isinstance(item, dict):
+        return None
+    front = str(item.get("front", "")).strip()
+    back = str(item.get("back", "")).strip()
+    if not front or not back:
+        return None
+    return {"front": front, "back": back}
+
+
+class ItemStream:
+    """Incremental parser for ``{"key": [item, item, ...]}``.
+
+    ``feed`` returns the items completed by the new text. Anything before the
+    opening brace (a code fence, a short preamble) is skipped, up to
+    ``max_preamble`` characters.
+    """
+
+    def __init__(self, max_preamble=200):
+        self.max_preamble = max_preamble
+        self._skipped = 0
+        self._stack = []  # open containers, '{' or '['
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._item = None  # characters of the array element being read
+
+    def feed(self, text):
+        items = []
+        for ch in text:
+            if self._done:
+                break
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._stack.append(ch)
+                else:
+                    self._skipped += 1
+                    if self._skipped > self.max_preamble:
+                        raise MalformedOutput("model output does not start with a JSON object")
+                continue
+
+            if self._item is not None:
+                self._item.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if ch == "{" and self._stack == ["{", "["]:
+                    self._item = [ch]
+                self._stack.append(ch)
+            elif ch in "}]":
+                if not self._stack or self._stack.pop() != ("{" if ch == "}" else "["):
+                    raise MalformedOutput("unbalanced brackets in model output")
+                if ch == "}" and self._stack == ["{", "["]:
+                    try:
+                        items.append(json.loads("".join(self._item)))
+                    except ValueError as exc:
+                        raise MalformedOutput(f"invalid item in model output: {exc}") from exc
+                    self._item = None
+                self._done = not self._stack
+        return items
+
+    def close(self):
+        if not self._done:
+            raise MalformedOutput("model output ended before the JSON object was complete")
+
+
+def iter_items(chunks, validate, max_invalid=3):
+    """Yield validated items from an iterable of text chunks as soon as each is complete.
+
+    Items that fail ``validate`` are skipped; ``max_invalid`` of them in a row
+    abort the generation.
+    """
+    stream = ItemStream()
+    invalid = 0
+    for chunk in chunks:
+        for raw in stream.feed(chunk):
+            item = validate(raw)
+            if item is None:
+                invalid += 1
+                if invalid >= max_invalid:
+                    raise MalformedOutput(f"{invalid} invalid items in a row")
+                continue
+            invalid = 0
+            yield item
+    stream.close()
+
+
+async def aiter_items(chunks, validate, max_invalid=3):
+    """``iter_items`` over an async iterable of text chunks, such as ``LLMClient.astream``."""
+    stream = ItemStream()
+    invalid = 0
+    async for chunk in chunks:
+        for raw in stream.feed(chunk):
+            item = validate(raw)
+            if item is None:
+                invalid += 1
+                if invalid >= max_invalid:
+                    raise MalformedOutput(f"{invalid} invalid items in a row")
+                continue
+            invalid = 0
+            yield item
+    stream.close()
+
+
+def parse_items(text, validate, max_invalid=3):
+    """Validated items of a complete model answer."""
+    return list(iter_items([text], validate, max_invalid=max_invalid))
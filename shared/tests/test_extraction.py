@@ -0,0 +1,54 @@
+"""Tests for parallel PDF text extraction."""
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmate_common.extraction import extract_pdf, shutdown_executor
+
+
+def make_pdf(pages):
+    """A minimal PDF whose page ``n`` (from 1) reads "Page n of the biology notes"."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(1, pages + 1):
+        stream = b"BT /F1 12 Tf 72 720 Td (Page %d of the biology notes) Tj ET" % number
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class ExtractionTests(unittest.TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.path = f"{root}/notes.pdf"
+        with open(self.path, 'wb') as f:
+            f.write(make_pdf(12))
+
+    def test_inline_extraction_keeps_page_order_and_reports_progress(self):
+        progress = []
+        result = extract_pdf(self.path, max_workers=1, on_progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(result.page_count, 12)
+        self.assertEqual(result.pages[4], "Page 5 of the biology notes")
+        self.assertEqual(result.text.splitlines()[-1], "Page 12 of the biology notes")
+        self.assertEqual((progress[0], progress[-1]), ((0, 12), (12, 12)))
+        self.assertEqual(len(result.page_times), 12)
+
+    def test_parallel_extraction_matches_inline(self):
+        self.addCleanup(shutdown_executor)
+        with mock.patch('benchmate_common.extraction.PARALLEL_MIN_PAGES', 1), \
+                mock.patch('benchmate_common.extraction.MAX_WORKERS', 2):
+            parallel = extract_pdf(self.path, max_workers=2)
+        self.assertEqual(parallel.pages, extract_pdf(self.path, max_workers=1).pages)
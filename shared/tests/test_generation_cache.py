@@ -0,0 +1,39 @@
+"""Tests for the generation cache backends."""
+import shutil
+import tempfile
+import time
+import unittest
+
+from benchmate_common.generation_cache import GenerationCache, MemoryBackend, SQLiteBackend
+
+
+class GenerationCacheTests(unittest.TestCase):
+    def backends(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        return [MemoryBackend(max_entries=2), SQLiteBackend(f"{tmp}/cache.sqlite3", max_entries=2)]
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                cache = GenerationCache(backend, ttl=60)
+                for doc in ('a', 'b'):
+                    cache.get_or_generate(doc, 'quiz', {}, lambda: doc)
+                time.sleep(0.01)
+                cache.get_or_generate('a', 'quiz', {}, lambda: 'unused')  # touch 'a'
+                time.sleep(0.01)
+                cache.get_or_generate('c', 'quiz', {}, lambda: 'c')
+                self.assertEqual(len(backend), 2)
+                self.assertEqual(backend.evictions, 1)
+                self.assertEqual(cache.get_or_generate('a', 'quiz', {}, lambda: 'new'), ('a', True))
+                self.assertEqual(cache.get_or_generate('b', 'quiz', {}, lambda: 'new'), ('new', False))
+
+    def test_entries_expire_after_ttl(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                now = [1000.0]
+                cache = GenerationCache(backend, ttl=10, clock=lambda: now[0])
+                cache.get_or_generate('a', 'quiz', {'n': 5}, lambda: 'first')
+                now[0] += 11
+                self.assertEqual(cache.get_or_generate('a', 'quiz', {'n': 5}, lambda: 'second'), ('second', False))
+                self.assertEqual(cache.stats()['misses'], 2)
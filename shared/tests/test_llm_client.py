@@ -0,0 +1,75 @@
+"""Tests for the LLM client's retries, deadlines and concurrency limits."""
+import asyncio
+import time
+import unittest
+
+from benchmate_common.llm_client import LLMClient, LLMTimeout, StubBackend, TransientLLMError
+
+
+class FlakyBackend(StubBackend):
+    """Fails the first ``failures`` calls with a transient error."""
+
+    def __init__(self, failures):
+        super().__init__(latency=0, response='ok')
+        self.failures = failures
+
+    def generate(self, prompt, timeout, schema=None):
+        if self.calls < self.failures:
+            self.calls += 1
+            raise TransientLLMError("overloaded")
+        return super().generate(prompt, timeout)
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class LLMClientTests(unittest.TestCase):
+    def test_transient_errors_are_retried(self):
+        client = LLMClient(FlakyBackend(failures=2), backoff_base=0.001)
+        self.assertEqual(client.generate('hi'), 'ok')
+        self.assertEqual(client.stats['retries'], 2)
+
+    def test_non_transient_errors_are_not_retried(self):
+        backend = StubBackend(latency=0, response=lambda prompt: 1 / 0)
+        client = LLMClient(backend)
+        with self.assertRaises(ZeroDivisionError):
+            client.generate('hi')
+        self.assertEqual(backend.calls, 1)
+
+    def test_deadline_raises_timeout(self):
+        client = LLMClient(StubBackend(latency=5), timeout=0.05)
+        with self.assertRaises(LLMTimeout):
+            client.generate('hi')
+        with self.assertRaises(LLMTimeout):
+            asyncio.run(client.agenerate('hi'))
+        with self.assertRaises(LLMTimeout):
+            asyncio.run(collect(client.astream('hi')))
+
+    def test_astream_relays_native_and_blocking_streams(self):
+        client = LLMClient(StubBackend(latency=0, response='one two three'))
+        self.assertEqual(asyncio.run(collect(client.astream('hi'))), ['one', ' two', ' three'])
+
+        class BlockingBackend:
+            def stream(self, prompt, timeout, schema=None):
+                yield from ['one', ' two']
+
+            def is_transient(self, exc):
+                return False
+
+        client = LLMClient(BlockingBackend())
+        self.assertEqual(asyncio.run(collect(client.astream('hi'))), ['one', ' two'])
+        self.assertEqual(client.stats['in_flight'], 0)
+
+    def test_async_calls_are_capped_and_overlap(self):
+        client = LLMClient(StubBackend(latency=0.05), max_concurrency=4)
+
+        async def burst():
+            return await asyncio.gather(*(client.agenerate('hi') for _ in range(16)))
+
+        started = time.perf_counter()
+        self.assertEqual(len(asyncio.run(burst())), 16)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(client.stats['peak_in_flight'], 4)
+        # 16 calls in 4 waves, not 16 sequential calls
+        self.assertLess(elapsed, 16 * 0.05 * 0.75)
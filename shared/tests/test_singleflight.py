@@ -0,0 +1,122 @@
+"""Tests for coalescing identical concurrent generations."""
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from benchmate_common.generation_cache import GenerationCache, MemoryBackend, SQLiteBackend
+from benchmate_common.llm_client import LLMClient, StubBackend, TransientLLMError
+from benchmate_common.singleflight import SingleFlight
+
+
+class SingleFlightTests(unittest.TestCase):
+    def run_concurrently(self, callers, target):
+        start = threading.Barrier(callers)
+        results = []
+
+        def call():
+            start.wait()
+            results.append(target())
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_share_one_generation(self):
+        stub = StubBackend(latency=0.2, response='{"cards": []}')
+        llm = LLMClient(stub)
+        flight = SingleFlight()
+        cache = GenerationCache(MemoryBackend(), flight=flight)
+        results = self.run_concurrently(
+            20, lambda: cache.get_or_generate('abc', 'flashcards', {}, lambda: llm.generate('prompt'))
+        )
+        self.assertEqual(stub.calls, 1)
+        self.assertEqual({value for value, _ in results}, {'{"cards": []}'})
+        self.assertEqual(sum(shared for _, shared in results), 19)
+        self.assertEqual(cache.stats()['coalesced'], 19)
+
+    def test_errors_are_shared_and_not_cached(self):
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise TransientLLMError("overloaded")
+
+        def call():
+            try:
+                flight.do('key', fail)
+            except TransientLLMError as exc:
+                return exc
+
+        results = self.run_concurrently(5, call)
+        self.assertTrue(all(isinstance(result, TransientLLMError) for result in results))
+        self.assertEqual(flight.do('key', lambda: 'ok'), ('ok', False))
+
+    def test_file_lock_coalesces_across_instances(self):
+        # Two flights sharing a lock directory and a SQLite cache stand in for two worker processes
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        stub = StubBackend(latency=0.2, response='quiz')
+        llm = LLMClient(stub)
+        caches = [
+            GenerationCache(SQLiteBackend(f"{root}/cache.sqlite3"), flight=SingleFlight(lock_dir=f"{root}/locks"))
+            for _ in range(2)
+        ]
+        workers = iter(caches * 4)
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                cache = next(workers)
+            return cache.get_or_generate('abc', 'quiz', {}, lambda: llm.generate('prompt'))
+
+        results = self.run_concurrently(8, call)
+        self.assertEqual(stub.calls, 1)
+        self.assertEqual({value for value, _ in results}, {'quiz'})
+
+    def test_async_callers_share_one_generation(self):
+        stub = StubBackend(latency=0.2, response='quiz')
+        llm = LLMClient(stub)
+        cache = GenerationCache(MemoryBackend(), flight=SingleFlight())
+
+        async def main():
+            return await asyncio.gather(*[
+                cache.aget_or_generate('abc', 'quiz', {}, lambda: llm.agenerate('prompt')) for _ in range(10)
+            ])
+
+        results = asyncio.run(main())
+        self.assertEqual(stub.calls, 1)
+        self.assertEqual(sum(shared for _, shared in results), 9)
+
+    def test_cancelling_the_async_leader_does_not_fail_followers(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+
+        async def generate():
+            await asyncio.sleep(0.1)
+            return 'quiz'
+
+        async def main(flight):
+            leader = asyncio.ensure_future(flight.ado('key', generate))
+            await asyncio.sleep(0.01)
+            follower = asyncio.ensure_future(flight.ado('key', generate))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower, leader
+
+        for flight in (SingleFlight(), SingleFlight(lock_dir=f"{root}/locks")):
+            with self.subTest(lock_dir=flight.lock_dir):
+                result, leader = asyncio.run(main(flight))
+                self.assertEqual(result, ('quiz', True))
+                self.assertTrue(leader.cancelled())
+                self.assertEqual(flight.stats['leaders'], 1)
+                # The key's file lock was released: a new leader can take it
+                caller = threading.Thread(target=flight.do, args=('key', lambda: 'again'))
+                caller.start()
+                caller.join(5)
+                self.assertFalse(caller.is_alive())
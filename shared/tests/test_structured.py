@@ -0,0 +1,33 @@
+"""Tests for incremental parsing of structured model output."""
+import unittest
+
+from benchmate_common.structured import ItemStream, MalformedOutput, iter_items, validate_card
+
+
+class StructuredOutputTests(unittest.TestCase):
+    ANSWER = '```json\n{"flashcards": [{"front": "Cell {1}", "back": "Unit \\"of\\" life"}, {"front": "ATP", "back": "Energy"}]}\n```'
+
+    def test_items_are_emitted_as_soon_as_they_close(self):
+        stream = ItemStream()
+        split = self.ANSWER.index('}, {') + 1
+        self.assertEqual(stream.feed(self.ANSWER[:split - 1]), [])
+        self.assertEqual(stream.feed(self.ANSWER[split - 1:split + 3]), [{"front": "Cell {1}", "back": 'Unit "of" life'}])
+        self.assertEqual(stream.feed(self.ANSWER[split + 3:]), [{"front": "ATP", "back": "Energy"}])
+        stream.close()
+
+    def test_token_by_token_matches_whole_parse(self):
+        tokens = [self.ANSWER[i:i + 3] for i in range(0, len(self.ANSWER), 3)]
+        self.assertEqual(len(list(iter_items(tokens, validate_card))), 2)
+
+    def test_prose_fails_fast(self):
+        chunks = iter(["I'm sorry, " * 30, "I can't help with that." * 1000])
+        with self.assertRaises(MalformedOutput):
+            list(iter_items(chunks, validate_card))
+        self.assertEqual(next(chunks, None).startswith("I can't"), True)
+
+    def test_truncated_output_raises_after_complete_items(self):
+        items = []
+        with self.assertRaises(MalformedOutput):
+            for item in iter_items([self.ANSWER[:self.ANSWER.index('"ATP"')]], validate_card):
+                items.append(item)
+        self.assertEqual(len(items), 1)